@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long it takes to import the application in a fresh interpreter.
+
+Each run starts a new Python process with ``-X importtime`` and imports the
+module, so nothing is cached between runs. The report shows the wall time of
+the whole process and the modules with the largest cumulative import time.
+
+    python benchmarks/import_time.py                     # import src.main
+    python benchmarks/import_time.py --module tools.llm_api --runs 10
+    python benchmarks/import_time.py --max-ms 800        # exit 1 above budget
+    python benchmarks/import_time.py --json > import_time.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_importtime(stderr: str):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        Dictionary mapping module names to (self_us, cumulative_us)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(module: str, env: dict):
+    """
+    Import a module once in a fresh interpreter.
+
+    Returns:
+        Tuple of (wall time in ms, parsed importtime output)
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(errors[-20:]))
+    return wall_ms, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import time")
+    parser.add_argument("--module", default="src.main", help="Module to import (default: src.main)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to start (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show (default: 15)")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    # Keep the interpreter quiet and the workspace out of the repository
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("WORKSPACE_DIR", str(Path(os.environ.get("TMPDIR", "/tmp")) / "import_time_runs"))
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+
+    walls = []
+    imports = []
+    modules = {}
+    for _ in range(args.runs):
+        wall_ms, parsed = measure(args.module, env)
+        walls.append(wall_ms)
+        imports.append(parsed.get(args.module, (0, 0))[1] / 1000)
+        modules = parsed
+
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "wall_ms": {"median": round(statistics.median(walls), 1), "min": round(min(walls), 1), "max": round(max(walls), 1)},
+        "import_ms": {"median": round(statistics.median(imports), 1), "min": round(min(imports), 1)},
+        "modules_imported": len(modules),
+        "slowest": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, (self_us, cumulative) in slowest
+        ]
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.module}: median {report['import_ms']['median']} ms import, "
+              f"{report['wall_ms']['median']} ms process wall time over {args.runs} runs "
+              f"({report['modules_imported']} modules)")
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for entry in report["slowest"]:
+            print(f"{entry['cumulative_ms']:>14} {entry['self_ms']:>9}  {entry['module']}")
+
+    if args.max_ms is not None and report["import_ms"]["median"] > args.max_ms:
+        print(f"Import time {report['import_ms']['median']} ms exceeds budget of {args.max_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end load test of the chat API against local stand-ins.
+
+Starts the mock Anthropic server (tools/mock_llm_server.py), the fake search
+provider and static site (benchmarks/stand_ins.py) and the application under
+uvicorn, then runs virtual users through multi-turn agent scenarios. Each
+turn posts to /api/chat, runs every requested tool on the server through the
+execute endpoint and sends the results to /api/tool-results until the model
+stops asking for tools, so the whole agent loop is exercised.
+
+    python benchmarks/load_test.py                               # default scenarios
+    python benchmarks/load_test.py --concurrency 32 --duration 60
+    python benchmarks/load_test.py --llm-latency 0.5 --output run.json
+    python benchmarks/load_test.py --scenarios scenarios.json --app-url http://127.0.0.1:8000
+
+A scenarios file is a JSON list of {"name": ..., "weight": ..., "turns": [...]}.
+Turns are user messages; ``[[tool:NAME {json input}]]`` in a message makes the
+mock model call that tool, and ``{site}`` is replaced by the static site URL.
+The report gives p50/p95/p99 latency per request type, per turn and per
+scenario, throughput, errors, the server's resident memory and how much
+tool result shaping shrank the results added to conversations.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from stand_ins import start_stand_ins
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_SCENARIOS = [
+    {
+        "name": "chat",
+        "weight": 3,
+        "turns": ["Explain in two sentences why caching reduces latency."]
+    },
+    {
+        "name": "multi_turn",
+        "weight": 2,
+        "turns": [
+            "I am planning a small web service. What should I measure first?",
+            "How would you set a latency budget for it?",
+            "And how do I know when to add a cache?",
+            "Summarise the plan in three bullet points."
+        ]
+    },
+    {
+        "name": "search_agent",
+        "weight": 1,
+        "turns": [
+            'Find recent writing on agent latency. [[tool:web_search {"query": "agent latency", "max_results": 5}]]',
+            'Read the top result. [[tool:extract_content {"url": "{site}/pages/1.html"}]]',
+            "Summarise what you found."
+        ]
+    },
+    {
+        "name": "command_agent",
+        "weight": 1,
+        "turns": [
+            'Write a note. [[tool:save_file {"path": "notes.txt", "content": "load test note\\n"}]]',
+            'Count its lines. [[tool:run_command {"command": "wc -l notes.txt"}]]',
+            'Show it to me. [[tool:read_file {"path": "notes.txt"}]]'
+        ]
+    }
+]
+
+# Tool rounds allowed per turn before the turn is counted as an error
+MAX_TOOL_ROUNDS = 8
+
+
+class Stats:
+    """Latency samples and errors collected by all virtual users."""
+
+    def __init__(self):
+        # {request type: [seconds]}
+        self.latencies: Dict[str, List[float]] = {}
+        # {scenario name: [turn seconds]}
+        self.turns: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: List[str] = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+
+    def record_turn(self, scenario: str, seconds: float) -> None:
+        with self.lock:
+            self.turns.setdefault(scenario, []).append(seconds)
+
+    def record_error(self, kind: str, message: str) -> None:
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            if len(self.error_samples) < 20:
+                self.error_samples.append(f"{kind}: {message}")
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """Summarise latency samples in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "max": round(ordered[-1] * 1000, 2)
+    }
+
+
+def post(stats: Stats, kind: str, url: str, payload: Optional[dict], timeout: float) -> dict:
+    """POST JSON, recording the latency under ``kind``; raises on HTTP errors."""
+    data = json.dumps(payload or {}).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"HTTP {e.code}: {e.read()[:200].decode('utf-8', 'replace')}")
+    stats.record(kind, time.perf_counter() - start)
+    return body
+
+
+def run_session(app_url: str, scenario: Dict[str, Any], site_url: str, stats: Stats, timeout: float) -> None:
+    """Run one conversation of a scenario, turn by turn."""
+    api = f"{app_url}/api"
+    conversation_id = None
+    for turn in scenario["turns"]:
+        text = turn.replace("{site}", site_url)
+        start = time.perf_counter()
+        try:
+            response = post(stats, "chat", f"{api}/chat", {
+                "conversation_id": conversation_id,
+                "messages": [{"role": "user", "content": text}]
+            }, timeout)
+            conversation_id = response["conversation_id"]
+
+            rounds = 0
+            while response.get("tool_calls"):
+                rounds += 1
+                if rounds > MAX_TOOL_ROUNDS:
+                    raise RuntimeError(f"more than {MAX_TOOL_ROUNDS} tool rounds in one turn")
+                results = [
+                    post(stats, "execute",
+                         f"{api}/conversations/{conversation_id}/tool-calls/{call['id']}/execute", None, timeout)
+                    for call in response["tool_calls"]
+                ]
+                for result in results:
+                    if result.get("error"):
+                        stats.record_error("tool", result["error"][:200])
+                response = post(stats, "tool_results", f"{api}/tool-results", {
+                    "conversation_id": conversation_id,
+                    "tool_results": results
+                }, timeout)
+        except Exception as e:
+            stats.record_error("turn", str(e)[:200])
+            return
+        stats.record_turn(scenario["name"], time.perf_counter() - start)
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float, process: Optional[subprocess.Popen] = None) -> None:
+    """Poll a URL until it answers, failing early if the process exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before it was ready")
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout}s")
+
+
+def wait_for_port(port: int, timeout: float) -> None:
+    """Wait until something listens on a local port."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def rss_mb(pid: int) -> Dict[str, float]:
+    """Read the current and peak resident memory of a process (Linux only)."""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    name, value = line.split(":")
+                    memory[name] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return {"rss": round(memory.get("VmRSS", 0.0), 1), "peak": round(memory.get("VmHWM", 0.0), 1)}
+
+
+def result_sizes(app_url: str) -> Dict[str, Dict[str, Any]]:
+    """Read the raw and shaped tool result sizes from the server's metrics, by tool."""
+    sizes: Dict[str, Dict[str, Any]] = {}
+    try:
+        with urllib.request.urlopen(f"{app_url}/metrics", timeout=10) as response:
+            text = response.read().decode("utf-8")
+    except (urllib.error.URLError, OSError):
+        return sizes
+    for line in text.splitlines():
+        if not line.startswith("tool_result_chars_total{"):
+            continue
+        labels, value = line[len("tool_result_chars_total{"):].rsplit("} ", 1)
+        fields = dict(part.split("=", 1) for part in labels.split(","))
+        tool = fields["tool"].strip('"')
+        sizes.setdefault(tool, {})[fields["stage"].strip('"') + "_chars"] = int(float(value))
+    for entry in sizes.values():
+        raw, shaped = entry.get("raw_chars", 0), entry.get("shaped_chars", 0)
+        entry["saved_pct"] = round(100 * (raw - shaped) / raw, 1) if raw else 0.0
+    return sizes
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit of the repository, if known."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_servers(args, site_url: str, workspace: str):
+    """Start the mock model server and the application; returns (processes, app URL, app process)."""
+    llm_port = free_port()
+    mock = subprocess.Popen(
+        [sys.executable, str(REPO_ROOT / "tools" / "mock_llm_server.py"), "--port", str(llm_port),
+         "--latency", str(args.llm_latency), "--error-rate", str(args.llm_error_rate)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port(llm_port, 10)
+
+    env = dict(os.environ)
+    env.update({
+        "ANTHROPIC_API_KEY": "load-test",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "WORKSPACE_DIR": workspace,
+        "SEARCH_API_URL": f"{site_url}/search",
+        "LOG_LEVEL": "WARNING",
+        # Measure the server, not the per-tenant limits: every virtual user shares one IP
+        "RATE_LIMIT_REQUESTS_PER_MINUTE": "0",
+        "RATE_LIMIT_TOKENS_PER_MINUTE": "0",
+        "LLM_MAX_CONCURRENCY": str(max(args.concurrency, 8)),
+        "ADMISSION_MAX_QUEUE": str(max(args.concurrency * 4, 64)),
+    })
+    app_port = free_port()
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    app_url = f"http://127.0.0.1:{app_port}"
+    wait_for(f"{app_url}/health", args.startup_timeout, app)
+    return [app, mock], app_url, app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of the chat API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users running at once (default: 8)")
+    parser.add_argument("--sessions", type=int, default=40, help="Conversations to run (default: 40)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Run for this many seconds instead of a fixed number of sessions")
+    parser.add_argument("--scenarios", default=None, help="JSON file of scenarios (default: built-in set)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for picking scenarios (default: 1)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Mock model latency in seconds (default: 0.05)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of mock model calls that fail")
+    parser.add_argument("--site-latency", type=float, default=0.0, help="Latency of the search provider and site")
+    parser.add_argument("--app-url", default=None, help="Test an already running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds (default: 120)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's log output")
+    args = parser.parse_args()
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            scenarios = json.load(f)
+    rng = random.Random(args.seed)
+    weights = [scenario.get("weight", 1) for scenario in scenarios]
+
+    site = start_stand_ins(latency=args.site_latency)
+    site_url = f"http://127.0.0.1:{site.server_address[1]}"
+    processes: List[subprocess.Popen] = []
+    app_pid = None
+    workspace = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        if args.app_url:
+            app_url = args.app_url.rstrip("/")
+            wait_for(f"{app_url}/health", args.startup_timeout)
+        else:
+            processes, app_url, app = start_servers(args, site_url, workspace)
+            app_pid = app.pid
+
+        stats = Stats()
+        memory_start = rss_mb(app_pid) if app_pid else None
+        peak_rss = 0.0
+        stop = threading.Event()
+
+        def sample_memory():
+            nonlocal peak_rss
+            while not stop.wait(0.25):
+                peak_rss = max(peak_rss, rss_mb(app_pid)["rss"])
+
+        if app_pid:
+            threading.Thread(target=sample_memory, daemon=True).start()
+
+        deadline = time.monotonic() + args.duration if args.duration else None
+        counter = iter(range(sys.maxsize if deadline else args.sessions))
+        counter_lock = threading.Lock()
+
+        def next_scenario():
+            with counter_lock:
+                if deadline and time.monotonic() >= deadline:
+                    return None
+                if next(counter, None) is None:
+                    return None
+                return rng.choices(scenarios, weights)[0]
+
+        def virtual_user():
+            while True:
+                scenario = next_scenario()
+                if scenario is None:
+                    return
+                run_session(app_url, scenario, site_url, stats, args.timeout)
+                with stats.lock:
+                    stats.sessions += 1
+
+        print(f"Running {'for %ss' % args.duration if deadline else '%d sessions' % args.sessions} "
+              f"with {args.concurrency} virtual users against {app_url}", file=sys.stderr)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in [pool.submit(virtual_user) for _ in range(args.concurrency)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        stop.set()
+
+        requests = sum(len(samples) for samples in stats.latencies.values())
+        all_turns = [seconds for samples in stats.turns.values() for seconds in samples]
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "platform": sys.platform,
+                "cpus": os.cpu_count(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "args": vars(args)
+            },
+            "summary": {
+                "duration_s": round(elapsed, 2),
+                "sessions": stats.sessions,
+                "turns": len(all_turns),
+                "requests": requests,
+                "requests_per_s": round(requests / elapsed, 2) if elapsed else 0,
+                "turns_per_s": round(len(all_turns) / elapsed, 2) if elapsed else 0,
+                "errors": stats.errors
+            },
+            "latency_ms": {kind: percentiles(samples) for kind, samples in sorted(stats.latencies.items())},
+            "turn_latency_ms": dict(
+                {"all": percentiles(all_turns)},
+                **{name: percentiles(samples) for name, samples in sorted(stats.turns.items())}
+            ),
+            "tool_result_chars": result_sizes(app_url),
+            "error_samples": stats.error_samples
+        }
+        if app_pid:
+            memory_end = rss_mb(app_pid)
+            report["memory_mb"] = {
+                "start": memory_start["rss"],
+                "peak": round(max(peak_rss, memory_end["rss"], memory_end["peak"]), 1),
+                "end": memory_end["rss"]
+            }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        site.shutdown()
+
+    summary = report["summary"]
+    print(f"{summary['sessions']} sessions, {summary['turns']} turns, {summary['requests']} requests "
+          f"in {summary['duration_s']}s ({summary['requests_per_s']} req/s, {summary['turns_per_s']} turns/s)")
+    print(f"{'':>14} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report["latency_ms"].items()) + [(f"turn:{name}", value)
+                                                 for name, value in report["turn_latency_ms"].items()]
+    for name, value in rows:
+        if value["count"]:
+            print(f"{name:>14} {value['count']:>7} {value['p50']:>9} {value['p95']:>9} {value['p99']:>9} {value['max']:>9}")
+    if summary["errors"]:
+        print(f"Errors: {summary['errors']}")
+        for sample in report["error_samples"][:5]:
+            print(f"  {sample}")
+    for tool, sizes in sorted(report["tool_result_chars"].items()):
+        print(f"Tool results {tool}: {sizes.get('raw_chars', 0)} -> {sizes.get('shaped_chars', 0)} chars "
+              f"({sizes['saved_pct']}% saved)")
+    if "memory_mb" in report:
+        memory = report["memory_mb"]
+        print(f"Server RSS: {memory['start']} MB at start, {memory['peak']} MB peak, {memory['end']} MB at end")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Measure what the research tool saves over searching and reading pages one by one.
+
+Runs each question against the local stand-ins (benchmarks/stand_ins.py)
+in two ways:
+
+- manual: web_search, then the full text of each of the top pages, as the
+  agent gets them from extract_content, one model turn per tool call;
+- research: one research call returning the best passages.
+
+and reports the model turns and the characters added to the context by
+each. It also times BM25 over many passages with NumPy against a plain
+Python loop, both including and excluding the one-off encoding of the
+passages (TermMatrix, or a Counter per passage).
+
+    python benchmarks/research_pipeline.py
+    python benchmarks/research_pipeline.py --pages 8 --passages 6 --json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from stand_ins import start_stand_ins  # noqa: E402
+
+QUESTIONS = [
+    "how does the cache affect request latency",
+    "token stream batching",
+    "search index query trace",
+    "agent tool workspace",
+]
+
+
+def python_bm25(query, counts, k1=1.2, b=0.75):
+    """BM25 with a Python loop over the documents' term counts, for comparison."""
+    average_length = sum(sum(count.values()) for count in counts) / max(len(counts), 1)
+    terms = list(dict.fromkeys(query))
+    frequencies = {term: sum(1 for count in counts if term in count) for term in terms}
+    scores = []
+    for count in counts:
+        norm = k1 * (1 - b + b * sum(count.values()) / max(average_length, 1.0))
+        score = 0.0
+        for term in terms:
+            tf = count.get(term, 0)
+            if tf:
+                idf = math.log1p((len(counts) - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def median_ms(function, repeats: int) -> float:
+    """Median time of one call in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def compare(question: str, pages: int, passages: int, workspace: Path) -> dict:
+    """Run one question both ways and count turns and context characters."""
+    from src.utils.search import search_service
+    from src.utils.research import research_pipeline
+    from src.utils.tools.research_tools import ResearchTool
+
+    searched = await search_service.search([question], pages)
+    fetched = await research_pipeline._fetch_all([hit["href"] for hit in searched["results"]])
+    manual_chars = sum(len(f"URL: {hit['href']}\nTitle: {hit['title']}\nSnippet: {hit['body']}\n") for hit in searched["results"])
+    manual_chars += sum(len("\n".join(page.blocks)) for page in fetched if not isinstance(page, str))
+
+    (workspace / "bench").mkdir(parents=True, exist_ok=True)
+    text = await ResearchTool().execute("bench", {"query": question, "max_pages": pages, "max_passages": passages})
+    return {
+        "question": question,
+        "manual_turns": 1 + len(searched["results"]),
+        "manual_chars": manual_chars,
+        "research_turns": 1,
+        "research_chars": len(text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the research tool against search plus page extraction")
+    parser.add_argument("--pages", type=int, default=5, help="Pages read per question (default: 5)")
+    parser.add_argument("--passages", type=int, default=8, help="Passages returned per question (default: 8)")
+    parser.add_argument("--ranked-passages", type=int, default=2000,
+                        help="Passages scored in the BM25 timing (default: 2000)")
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per BM25 timing (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    server = start_stand_ins()
+    workspace = Path(tempfile.mkdtemp(prefix="research-bench-"))
+    os.environ.update(
+        SEARCH_API_URL=f"http://127.0.0.1:{server.server_address[1]}/search", SEARCH_PROVIDERS="api",
+        WORKSPACE_DIR=str(workspace), RESEARCH_RENDER_MIN_WORDS="0", LOG_LEVEL="WARNING"
+    )
+    from stand_ins import page_html
+    from src.utils.research import html_to_blocks
+    from src.utils.ranking import tokenize, split_passages, TermMatrix
+
+    async def run_all():
+        return [await compare(question, args.pages, args.passages, workspace) for question in QUESTIONS]
+    rows = asyncio.run(run_all())
+
+    passages = []
+    number = 0
+    while len(passages) < args.ranked_passages:
+        passages.extend(split_passages(html_to_blocks(page_html(number))[1], 120))
+        number += 1
+    documents = [tokenize(passage) for passage in passages[:args.ranked_passages]]
+    query = tokenize(QUESTIONS[0])
+    matrix = TermMatrix(documents)
+    counts = [Counter(document) for document in documents]
+    assert max(abs(a - b) for a, b in zip(matrix.bm25(query), python_bm25(query, counts))) < 1e-9
+    bm25 = {
+        "passages": len(documents),
+        "numpy_ms": round(median_ms(lambda: TermMatrix(documents).bm25(query), args.repeats), 2),
+        "python_ms": round(median_ms(lambda: python_bm25(query, [Counter(d) for d in documents]), args.repeats), 2),
+        "numpy_score_ms": round(median_ms(lambda: matrix.bm25(query), args.repeats), 3),
+        "python_score_ms": round(median_ms(lambda: python_bm25(query, counts), args.repeats), 3),
+    }
+
+    manual = sum(row["manual_chars"] for row in rows)
+    research = sum(row["research_chars"] for row in rows)
+    report = {
+        "questions": rows,
+        "context_reduction": round(manual / research, 1) if research else None,
+        "turn_reduction": round(sum(row["manual_turns"] for row in rows) / len(rows), 1),
+        "bm25": bm25,
+    }
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'question':<45} {'turns':>11} {'context chars':>21}")
+    for row in rows:
+        print(f"{row['question']:<45} {row['manual_turns']:>5} -> {row['research_turns']:<3} "
+              f"{row['manual_chars']:>9} -> {row['research_chars']:<8}")
+    print(f"Context reduced {report['context_reduction']}x, turns {report['turn_reduction']}x")
+    print(f"BM25 over {bm25['passages']} passages: numpy {bm25['numpy_ms']} ms, python {bm25['python_ms']} ms; "
+          f"scoring only: numpy {bm25['numpy_score_ms']} ms, python {bm25['python_score_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+Measure the cost of building and serializing chat responses with tool calls.
+
+Compares two ways of turning a model response into the JSON body of
+/api/chat for a growing number of tool calls:
+
+- validated: each tool call's definition is built from the tool's
+  parameters and the response models are validated, then serialized the
+  way FastAPI serializes a ``response_model`` (validate, dump to Python,
+  ``json.dumps``);
+- fast: tool calls share the registry's validated definitions, the models
+  are constructed without validation and FastJSONResponse dumps them with a
+  cached TypeAdapter.
+
+    python benchmarks/response_serialization.py
+    python benchmarks/response_serialization.py --tool-calls 1 10 100 --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from pydantic import TypeAdapter  # noqa: E402
+from src.models.chat import ChatResponse, Message, ToolCall  # noqa: E402
+from src.utils.tools.registry import tool_registry  # noqa: E402
+from src.utils.serialization import FastJSONResponse, orjson  # noqa: E402
+
+
+def tool_call_dicts(count: int, fast: bool) -> list:
+    """Tool calls as extract_tool_calls returns them, cycling through the registered tools."""
+    tools = tool_registry.get_all_tools()
+    calls = []
+    for index in range(count):
+        tool = tools[index % len(tools)]
+        if fast:
+            definition = tool.definition()
+        else:
+            definition = {"name": tool.name, "description": tool.description, "parameters": tool.parameters}
+        calls.append({
+            "id": f"toolu_{index:06d}",
+            "type": "tool_call",
+            "tool": definition,
+            "input": {"path": f"notes/file_{index}.txt", "content": "x" * 200, "timeout": 30}
+        })
+    return calls
+
+
+def validated_response(count: int, adapter: TypeAdapter) -> bytes:
+    """Build and serialize a response the way the endpoints did before."""
+    response = ChatResponse(
+        conversation_id="00000000-0000-0000-0000-000000000000",
+        message=Message(role="assistant", content="Running the tools."),
+        tool_calls=[ToolCall(**call) for call in tool_call_dicts(count, fast=False)]
+    )
+    # FastAPI validates the returned value against response_model, dumps it and json.dumps the result
+    value = adapter.validate_python(response.model_dump())
+    return json.dumps(adapter.dump_python(value, mode="json")).encode("utf-8")
+
+
+def fast_response(count: int) -> bytes:
+    """Build and serialize a response the way the endpoints do now."""
+    response = ChatResponse.model_construct(
+        conversation_id="00000000-0000-0000-0000-000000000000",
+        message=Message.model_construct(role="assistant", content="Running the tools."),
+        tool_calls=[ToolCall.model_construct(**call) for call in tool_call_dicts(count, fast=True)]
+    )
+    return FastJSONResponse(response).body
+
+
+def time_per_call(function, repeats: int) -> float:
+    """Median time of one call in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat response serialization")
+    parser.add_argument("--tool-calls", type=int, nargs="+", default=[0, 1, 10, 50, 200],
+                        help="Numbers of tool calls per response (default: 0 1 10 50 200)")
+    parser.add_argument("--repeats", type=int, default=200, help="Responses built per measurement (default: 200)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(ChatResponse)
+    rows = []
+    for count in args.tool_calls:
+        validated = validated_response(count, adapter)
+        fast = fast_response(count)
+        # Both paths must produce the same document
+        assert json.loads(validated) == json.loads(fast), f"responses differ for {count} tool calls"
+        validated_ms = time_per_call(lambda: validated_response(count, adapter), args.repeats)
+        fast_ms = time_per_call(lambda: fast_response(count), args.repeats)
+        rows.append({
+            "tool_calls": count,
+            "bytes": len(fast),
+            "validated_ms": round(validated_ms, 3),
+            "fast_ms": round(fast_ms, 3),
+            "speedup": round(validated_ms / fast_ms, 1) if fast_ms else None
+        })
+
+    report = {"orjson": orjson is not None, "repeats": args.repeats, "responses": rows}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"orjson: {'installed' if report['orjson'] else 'not installed'}")
+    print(f"{'tool calls':>10} {'bytes':>9} {'validated ms':>13} {'fast ms':>9} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['tool_calls']:>10} {row['bytes']:>9} {row['validated_ms']:>13} {row['fast_ms']:>9} "
+              f"{row['speedup']:>7}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Measure how much tool result shaping shrinks conversation history.
+
+Runs the result shaper over typical tool outputs: a package install log,
+test runner output, a polling loop, a scraped page, search results, a
+pretty-printed JSON document and a source file. For each workload it reports
+the raw and shaped size, the estimated tokens saved per model call, and the
+tokens saved over a conversation, since every later turn resends the result.
+
+    python benchmarks/result_shaping.py
+    python benchmarks/result_shaping.py --later-turns 20 --json
+
+Tokens are estimated at 4 characters per token, as admission control does.
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from stand_ins import page_html, search_results  # noqa: E402
+from src.utils.tools.shaping import result_shaper, max_result_chars  # noqa: E402
+
+CHARS_PER_TOKEN = 4
+
+
+def pip_install_log() -> dict:
+    """A run_command result installing packages, with progress bars."""
+    lines = []
+    for number in range(60):
+        package = f"package-{number}"
+        lines.append(f"Collecting {package}>=1.0")
+        lines.append(f"  Downloading {package}-1.{number}.0-py3-none-any.whl (1.{number} MB)")
+        lines.extend(["     |████████████████████████████████| 1.2 MB 12.3 MB/s"] * 8)
+    lines.append("Installing collected packages: " + ", ".join(f"package-{n}" for n in range(60)))
+    lines.append("Successfully installed " + " ".join(f"package-{n}-1.{n}.0" for n in range(60)))
+    return {"exit_code": 0, "stdout": "\n".join(lines), "stderr": ""}
+
+
+def test_run_log() -> dict:
+    """A run_command result of a test suite with a failure at the end."""
+    lines = [f"tests/test_module_{n // 20}.py::test_case_{n} PASSED{' ' * 20}[{n * 100 // 1500:>3}%]" for n in range(1500)]
+    lines += ["", "=" * 30 + " FAILURES " + "=" * 30, "___ test_case_1500 ___", "    assert result == expected",
+              "E   AssertionError: assert 41 == 42", "=" * 20 + " 1 failed, 1500 passed in 48.21s " + "=" * 20]
+    return {"exit_code": 1, "stdout": "\n".join(lines), "stderr": ""}
+
+
+def polling_log() -> str:
+    """A job tail where the same status line repeats."""
+    lines = ["Starting server on port 8000"]
+    lines += ["Waiting for database connection..."] * 400
+    lines += ["Database connected", "Server ready"]
+    return "\n".join(lines)
+
+
+def scraped_page() -> str:
+    """Text extracted from a long web page."""
+    html = page_html(7, paragraphs=120)
+    return re.sub(r"<[^>]+>", "\n", html).replace("\n\n", "\n")
+
+
+def search_output() -> str:
+    """web_search output for ten results, in the format of tools/search_engine.py."""
+    blocks = []
+    for index, result in enumerate(search_results("http://127.0.0.1:8095", "agent latency", 10), 1):
+        blocks.append(f"=== Result {index} ===\nURL: {result['href']}\nTitle: {result['title']}\nSnippet: {result['body']}\n")
+    return "\n".join(blocks)
+
+
+def pretty_json() -> str:
+    """A pretty-printed JSON document returned as text."""
+    records = [{"id": n, "name": f"record {n}", "tags": ["alpha", "beta"], "metrics": {"latency_ms": n * 1.5, "ok": True}}
+               for n in range(150)]
+    return json.dumps({"records": records, "total": len(records)}, indent=4)
+
+
+def source_file() -> str:
+    """The contents of a large source file in this repository."""
+    return (REPO_ROOT / "src" / "utils" / "llm_client.py").read_text(encoding="utf-8")
+
+
+# (workload, tool the result comes from, generator)
+WORKLOADS = [
+    ("pip_install", "run_command", pip_install_log),
+    ("test_run", "run_command", test_run_log),
+    ("polling_job", "job_status", polling_log),
+    ("scraped_page", "extract_content", scraped_page),
+    ("search", "web_search", search_output),
+    ("pretty_json", "read_file", pretty_json),
+    ("source_file", "read_file", source_file),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tool result shaping")
+    parser.add_argument("--later-turns", type=int, default=10,
+                        help="Model calls that resend each result after it is added (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    workspace = Path(tempfile.mkdtemp(prefix="result_shaping_"))
+    rows = []
+    for index, (workload, tool_name, generate) in enumerate(WORKLOADS):
+        result = generate()
+        raw_chars = len(result) if isinstance(result, str) else len(json.dumps(result))
+        limit = max_result_chars(tool_name)
+        start = time.perf_counter()
+        shaped = result_shaper.shape(tool_name, workspace, f"toolu_{index}", result, limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        saved_tokens = (raw_chars - len(shaped)) // CHARS_PER_TOKEN
+        rows.append({
+            "workload": workload,
+            "tool": tool_name,
+            "limit_chars": limit,
+            "raw_tokens": raw_chars // CHARS_PER_TOKEN,
+            "shaped_tokens": len(shaped) // CHARS_PER_TOKEN,
+            "saved_pct": round(100 * (raw_chars - len(shaped)) / raw_chars, 1) if raw_chars else 0.0,
+            "saved_tokens_per_call": saved_tokens,
+            "saved_tokens_conversation": saved_tokens * (args.later_turns + 1),
+            "spilled": (workspace / ".tool_results" / f"toolu_{index}.txt").exists(),
+            "shape_ms": round(elapsed_ms, 2)
+        })
+
+    total_raw = sum(row["raw_tokens"] for row in rows)
+    total_shaped = sum(row["shaped_tokens"] for row in rows)
+    report = {
+        "later_turns": args.later_turns,
+        "workloads": rows,
+        "total": {
+            "raw_tokens": total_raw,
+            "shaped_tokens": total_shaped,
+            "saved_pct": round(100 * (total_raw - total_shaped) / total_raw, 1) if total_raw else 0.0,
+            "saved_tokens_conversation": sum(row["saved_tokens_conversation"] for row in rows)
+        }
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'workload':<14} {'tool':<16} {'raw tok':>8} {'shaped':>8} {'saved':>7} "
+          f"{'saved/conv':>11} {'spilled':>8} {'ms':>7}")
+    for row in rows:
+        print(f"{row['workload']:<14} {row['tool']:<16} {row['raw_tokens']:>8} {row['shaped_tokens']:>8} "
+              f"{row['saved_pct']:>6}% {row['saved_tokens_conversation']:>11} {str(row['spilled']):>8} {row['shape_ms']:>7}")
+    total = report["total"]
+    print(f"Total: {total['raw_tokens']} -> {total['shaped_tokens']} tokens per call ({total['saved_pct']}% saved), "
+          f"{total['saved_tokens_conversation']} tokens saved over {args.later_turns} later turns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Measure the workspace retrieval index behind the retrieve tool.
+
+Fills a temporary workspace with pages in the format extract_content saves
+them (generated by benchmarks/stand_ins.py) and reports:
+
+- cold: the first retrieve, which reads and indexes every file;
+- warm: later retrieves when nothing changed;
+- incremental: a retrieve after one file was rewritten;
+- context: characters the retrieved passages add to the conversation,
+  against reading back the files they came from with read_file.
+
+    python benchmarks/retrieval_index.py
+    python benchmarks/retrieval_index.py --files 1000 --paragraphs 40 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from stand_ins import page_html  # noqa: E402
+
+QUESTIONS = ["cache latency", "token stream queue", "search index trace", "agent workspace batch"]
+
+
+def write_page(workspace: Path, number: int, paragraphs: int, extra: str = "") -> None:
+    """Save a generated page the way extract_content does."""
+    from src.utils.research import html_to_blocks
+    text = "\n\n".join(html_to_blocks(page_html(number, paragraphs))[1]) + extra
+    (workspace / f"extracted_content_page_{number}.txt").write_text(
+        f"Extracted from URL: http://127.0.0.1/pages/{number}.html\n\n{text}", encoding="utf-8"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workspace retrieval index")
+    parser.add_argument("--files", type=int, default=300, help="Files in the workspace (default: 300)")
+    parser.add_argument("--paragraphs", type=int, default=20, help="Paragraphs per file (default: 20)")
+    parser.add_argument("--top-k", type=int, default=6, help="Passages retrieved per question (default: 6)")
+    parser.add_argument("--repeats", type=int, default=20, help="Warm retrieves timed (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    workspace = Path(tempfile.mkdtemp(prefix="retrieval-bench-"))
+    os.environ.update(WORKSPACE_DIR=str(workspace.parent), LOG_LEVEL="WARNING")
+    from src.utils.retrieval import retrieval_indexes
+
+    for number in range(args.files):
+        write_page(workspace, number, args.paragraphs)
+
+    start = time.perf_counter()
+    outcome = retrieval_indexes.retrieve("bench", workspace, QUESTIONS[0], args.top_k)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    samples = []
+    rows = []
+    for repeat in range(args.repeats):
+        question = QUESTIONS[repeat % len(QUESTIONS)]
+        start = time.perf_counter()
+        outcome = retrieval_indexes.retrieve("bench", workspace, question, args.top_k)
+        samples.append((time.perf_counter() - start) * 1000)
+        if repeat < len(QUESTIONS):
+            paths = {result["path"] for result in outcome["results"]}
+            rows.append({
+                "question": question,
+                "retrieved_chars": sum(len(result["text"]) for result in outcome["results"]),
+                "file_chars": sum(len((workspace / path).read_text(encoding="utf-8")) for path in paths),
+            })
+
+    # Rewriting a file is picked up by the next retrieve
+    write_page(workspace, 0, args.paragraphs, "\n\nA unique marker paragraph about zebras.\n")
+    start = time.perf_counter()
+    outcome = retrieval_indexes.retrieve("bench", workspace, "zebras", 1)
+    incremental_ms = (time.perf_counter() - start) * 1000
+    assert outcome["updated"] == 1 and outcome["results"][0]["path"] == "extracted_content_page_0.txt"
+
+    retrieved = sum(row["retrieved_chars"] for row in rows)
+    report = {
+        "files": outcome["files"],
+        "chunks": outcome["chunks"],
+        "cold_ms": round(cold_ms, 1),
+        "warm_ms": round(statistics.median(samples), 2),
+        "incremental_ms": round(incremental_ms, 2),
+        "questions": rows,
+        "context_reduction": round(sum(row["file_chars"] for row in rows) / retrieved, 1) if retrieved else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['files']} files, {report['chunks']} chunks")
+    print(f"cold {report['cold_ms']} ms, warm {report['warm_ms']} ms, after one change {report['incremental_ms']} ms")
+    print(f"{'question':<25} {'retrieved chars':>16} {'whole files':>12}")
+    for row in rows:
+        print(f"{row['question']:<25} {row['retrieved_chars']:>16} {row['file_chars']:>12}")
+    print(f"Context reduced {report['context_reduction']}x")
+
+
+if __name__ == "__main__":
+    main()
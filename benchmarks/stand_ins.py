@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-ins for the external services the web tools call.
+
+One HTTP server provides both:
+
+    /search?q=<query>&max_results=<n>   fake search provider returning JSON
+                                        results that link to the pages below
+    /pages/<n>.html                     static site with generated articles
+
+Point the search tool at it with SEARCH_API_URL=http://127.0.0.1:8095/search.
+Run it on its own or import ``start_stand_ins`` from a benchmark:
+
+    python benchmarks/stand_ins.py --port 8095 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "agent tool model request latency search result page cache queue token stream "
+    "workspace batch trace metric index query document context reply message server"
+).split()
+
+
+def page_html(number: int, paragraphs: int = 8) -> str:
+    """Generate a deterministic HTML article for a page number."""
+    seed = int(hashlib.sha256(str(number).encode("utf-8")).hexdigest(), 16)
+    body = []
+    for paragraph in range(paragraphs):
+        words = [WORDS[(seed >> ((paragraph * 7 + i) % 200)) % len(WORDS)] for i in range(60)]
+        body.append(f"<p>{' '.join(words).capitalize()}.</p>")
+    links = "".join(f'<li><a href="/pages/{(number + step) % 1000}.html">Page {(number + step) % 1000}</a></li>'
+                    for step in (1, 7, 42))
+    return (
+        f"<!DOCTYPE html><html><head><title>Page {number}</title>"
+        f"<style>body {{ font-family: sans-serif; }}</style><script>var page = {number};</script></head>"
+        f"<body><h1>Page {number}</h1>{''.join(body)}<ul>{links}</ul></body></html>"
+    )
+
+
+def search_results(base_url: str, query: str, max_results: int):
+    """Build search results for a query; the same query always gets the same pages."""
+    seed = int(hashlib.sha256(query.encode("utf-8")).hexdigest(), 16)
+    results = []
+    for rank in range(max_results):
+        number = (seed + rank * 97) % 1000
+        results.append({
+            "title": f"{query} - result {rank + 1}",
+            "href": f"{base_url}/pages/{number}.html",
+            "body": f"Page {number} discusses {query} and related topics."
+        })
+    return results
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Request handler for the search provider and static site."""
+
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, content_type: str, data: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(self.path)
+        if url.path == "/search":
+            params = parse_qs(url.query)
+            query = params.get("q", [""])[0]
+            max_results = int(params.get("max_results", ["10"])[0])
+            base_url = f"http://{self.headers.get('Host', '%s:%s' % self.server.server_address[:2])}"
+            data = json.dumps(search_results(base_url, query, max_results)).encode("utf-8")
+            self._send(200, "application/json", data)
+            return
+
+        if url.path.startswith("/pages/") and url.path.endswith(".html"):
+            try:
+                number = int(url.path[len("/pages/"):-len(".html")])
+            except ValueError:
+                number = None
+            if number is not None:
+                self._send(200, "text/html; charset=utf-8", page_html(number).encode("utf-8"))
+                return
+
+        self._send(404, "text/plain", b"Not found")
+
+
+def start_stand_ins(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Start the stand-in server in a background thread.
+
+    Args:
+        host: Host to bind
+        port: Port to bind; 0 picks a free port
+        latency: Delay added to every response in seconds
+
+    Returns:
+        The running server; its address is ``server.server_address``
+    """
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {"latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stand-ins", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local search provider and static site for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8095, help="Port to bind (default: 8095)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay added to every response in seconds")
+    args = parser.parse_args()
+
+    server = start_stand_ins(args.host, args.port, args.latency)
+    print(f"Stand-ins listening on http://{args.host}:{server.server_address[1]} "
+          f"(search at /search, pages at /pages/<n>.html)", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException
+from ..models.batches import BatchRequest, Batch, BatchResults
+from ..core.batch_manager import batch_manager
+from typing import List
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/batches", response_model=Batch)
+async def submit_batch(request: BatchRequest):
+    """
+    Submit a batch of prompts for offline processing.
+    
+    Args:
+        request: The batch request containing the prompts
+        
+    Returns:
+        Batch: The submitted batch; poll it until status is ended
+    """
+    try:
+        batch = await batch_manager.submit(
+            [item.dict() for item in request.requests],
+            model=request.model,
+            max_tokens=request.max_tokens,
+            backend=request.backend
+        )
+        return Batch(**batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error submitting batch: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batches", response_model=List[Batch])
+async def list_batches():
+    """
+    List all batches.
+    
+    Returns:
+        List[Batch]: The batches, newest first
+    """
+    return [Batch(**batch) for batch in batch_manager.list_batches()]
+
+
+@router.get("/batches/{batch_id}", response_model=Batch)
+async def get_batch(batch_id: str):
+    """
+    Get the state of a batch.
+    
+    Args:
+        batch_id: The ID of the batch
+        
+    Returns:
+        Batch: The batch with its current status
+    """
+    batch = batch_manager.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return Batch(**batch)
+
+
+@router.get("/batches/{batch_id}/results", response_model=BatchResults)
+async def get_batch_results(batch_id: str, offset: int = 0, limit: int = 100):
+    """
+    Read the results of a batch; results appear as they are written.
+    
+    Args:
+        batch_id: The ID of the batch
+        offset: Number of results to skip
+        limit: Maximum number of results to return
+        
+    Returns:
+        BatchResults: The results and the offset for the next read
+    """
+    results = batch_manager.read_results(batch_id, offset, limit)
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return BatchResults(**results)
+
+
+@router.post("/batches/{batch_id}/cancel", response_model=Batch)
+async def cancel_batch(batch_id: str):
+    """
+    Cancel a batch that has not finished.
+    
+    Args:
+        batch_id: The ID of the batch
+        
+    Returns:
+        Batch: The batch after cancellation
+    """
+    batch = await batch_manager.cancel(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return Batch(**batch)
@@ -1,21 +1,181 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from ..models.chat import ChatRequest, ChatResponse, Message, ToolResultRequest, ToolCall, ToolResult
-from ..utils.llm_client import claude_client
-from ..utils.tools import tool_registry
-from ..core.conversation_manager import conversation_manager
+from ..utils.llm_client import llm_router
+from ..utils.resilience import CircuitOpenError, DeadlineExceededError, get_status_code, get_retry_after
+from ..utils.tools import tool_dispatcher
+from ..utils.tools.shaping import result_shaper, max_result_chars, image_block
+from ..core.conversation_manager import conversation_manager, is_valid_conversation_id
+from ..core.history import ConversationHistory, HistoryMessage
+from ..core.conversation_actor import conversation_actors, ConversationBusyError, Turn
+from ..core.admission_control import admission_controller, RateLimitedError
+from ..utils.telemetry import tracer
+from ..utils.serialization import FastJSONResponse, dumps
+from ..config import settings
+import asyncio
+import math
 import uuid
-import sys
-from typing import Dict, List, Any, Optional
+from typing import List, Any, Optional, Callable
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
+
+def _get_tenant(http_request: Request) -> str:
+    """
+    Identify the tenant of a request for admission control.
+    
+    Args:
+        http_request: The incoming HTTP request
+        
+    Returns:
+        Tenant identifier derived from the API key, or the client IP
+    """
+    api_key = http_request.headers.get("x-api-key")
+    authorization = http_request.headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    client_host = http_request.client.host if http_request.client else None
+    return admission_controller.tenant_for(api_key, client_host)
+
+
+async def _call_model(conversation_id: str, history: ConversationHistory, new_messages: List[HistoryMessage],
+                      tenant: str, on_delta: Optional[Callable[[str], None]] = None) -> Any:
+    """
+    Admit and call the model, translating failures into HTTP errors.
+    
+    The call runs in a "chat.turn" span, so admission wait, retries and
+    failovers of one agent step nest under it.
+    
+    Args:
+        conversation_id: The ID of the conversation, recorded on the span
+        history: The conversation so far
+        new_messages: Messages to send after the history, not yet added to it
+        tenant: Tenant identifier used for rate limiting and fair queueing
+        on_delta: Called from a worker thread with streamed output text
+        
+    Returns:
+        The model response
+        
+    Raises:
+        HTTPException: 429 when the tenant is over its limits or the server is
+            overloaded, 503 when the model is unavailable or rate limited,
+            504 when the request deadline passed, 502 for other upstream errors
+    """
+    try:
+        claude_messages = history.payload(new_messages)
+        estimated_tokens = admission_controller.estimate_tokens(history.size_with(new_messages))
+        with tracer.span("chat.turn", conversation_id=conversation_id, estimated_tokens=estimated_tokens):
+            async with admission_controller.admit(tenant, estimated_tokens):
+                logger.debug("Sending %d messages to the LLM router", len(claude_messages))
+                return await llm_router.create_message(claude_messages, on_delta=on_delta)
+    except RateLimitedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except CircuitOpenError as e:
+        logger.warning("LLM unavailable: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except DeadlineExceededError as e:
+        logger.warning("LLM request deadline exceeded: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error("Error calling LLM: %s", e)
+        if get_status_code(e) in (429, 529):
+            retry_after = get_retry_after(e)
+            headers = {"Retry-After": str(math.ceil(retry_after))} if retry_after is not None else None
+            raise HTTPException(status_code=503, detail=f"LLM overloaded: {e}", headers=headers)
+        raise HTTPException(status_code=502, detail=f"LLM error: {e}")
+
+
+def _record_response(conversation_id: str, response: Any) -> ChatResponse:
+    """
+    Store a model response in the conversation and build the API response.
+    
+    The response models are constructed without validation: the tool
+    definitions come validated from the registry and the rest comes from
+    the model response.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        response: The model response
+        
+    Returns:
+        ChatResponse: The response for the client
+    """
+    # Keep the tool_use blocks, which the tool results of the next turn refer to
+    assistant_message = HistoryMessage.from_response(response)
+    
+    # Extract tool calls from response
+    tool_calls = None
+    extracted_tool_calls = llm_router.extract_tool_calls(response)
+    if extracted_tool_calls:
+        tool_calls = []
+        for tool_call in extracted_tool_calls:
+            # Add the pending tool call to conversation manager
+            conversation_manager.add_pending_tool_call(
+                conversation_id, 
+                tool_call["id"], 
+                tool_call
+            )
+            
+            # Add to response tool calls list
+            tool_calls.append(ToolCall.model_construct(**tool_call))
+        
+        logger.debug("Found %d tool calls in response", len(tool_calls))
+    
+    # Store assistant response in conversation history
+    conversation_manager.add_message(conversation_id, assistant_message)
+    
+    return ChatResponse.model_construct(
+        conversation_id=conversation_id,
+        message=Message.model_construct(
+            role="assistant",
+            content=assistant_message.text
+        ),
+        tool_calls=tool_calls
+    )
+
+
+async def _run_turn(conversation_id: str, turn: Turn) -> Any:
+    """
+    Run a turn after the earlier turns of its conversation.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        turn: Coroutine function running the turn
+        
+    Returns:
+        The result of the turn
+        
+    Raises:
+        HTTPException: 429 when too many turns of the conversation are waiting
+    """
+    try:
+        return await conversation_actors.run(conversation_id, turn)
+    except ConversationBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Process a chat request and return a response from Claude.
     
+    The new messages are only added to the conversation once the model has
+    answered, so a failed request can be retried as is. Requests for the
+    same conversation are handled one at a time, in arrival order.
+    
     Args:
         request: The chat request containing messages and optionally a conversation_id
+        http_request: The incoming HTTP request, used to identify the tenant
         
     Returns:
         ChatResponse: The response from Claude
@@ -23,194 +183,270 @@ async def chat(request: ChatRequest):
     try:
         # Get or create conversation_id
         conversation_id = request.conversation_id or str(uuid.uuid4())
-        
-        # Get existing conversation history or create new
-        claude_messages = []
-        if conversation_id in conversation_manager.conversations:
-            claude_messages = conversation_manager.get_conversation(conversation_id)
-        else:
-            # If this is a new conversation, create the workspace directory
-            conversation_manager.create_conversation()
-        
-        # Add new messages from the request
-        for message in request.messages:
-            if message.role == "user" and (not claude_messages or claude_messages[-1]["role"] != "user"):
-                # Add user message directly
-                new_message = {"role": "user", "content": message.content}
-                conversation_manager.add_message(conversation_id, new_message)
-                claude_messages.append(new_message)
-            elif message.role == "assistant" and (not claude_messages or claude_messages[-1]["role"] != "assistant"):
-                # Add assistant message directly
-                new_message = {"role": "assistant", "content": message.content}
-                conversation_manager.add_message(conversation_id, new_message)
-                claude_messages.append(new_message)
-        
-        # Check if we should use a mock response for testing
-        use_mock = False
-        try:
-            # Try to call Claude API
-            print(f"Sending {len(claude_messages)} messages to Claude API", file=sys.stderr)
-            response = claude_client.create_message(claude_messages)
-            
-            # Extract text content and tool calls
-            assistant_message = ""
-            tool_calls = None
-            
-            # Extract text content from response
-            for content_block in response.content:
-                if content_block.type == "text":
-                    assistant_message += content_block.text
-            
-            # Extract tool calls from response
-            extracted_tool_calls = claude_client.extract_tool_calls(response)
-            if extracted_tool_calls:
-                tool_calls = []
-                for tool_call in extracted_tool_calls:
-                    # Add the pending tool call to conversation manager
-                    conversation_manager.add_pending_tool_call(
-                        conversation_id, 
-                        tool_call["id"], 
-                        tool_call
-                    )
-                    
-                    # Add to response tool calls list
-                    tool_calls.append(ToolCall(**tool_call))
-                
-                print(f"Found {len(tool_calls)} tool calls in response", file=sys.stderr)
-            
-        except Exception as e:
-            print(f"Error calling Claude API: {e}", file=sys.stderr)
-            print("Using mock response for testing", file=sys.stderr)
-            use_mock = True
-            
-        if use_mock:
-            # Create a mock response for testing
-            last_user_message = next((m["content"] for m in reversed(claude_messages) if m["role"] == "user"), "")
-            assistant_message = f"This is a mock response. You said: {last_user_message}"
-            tool_calls = None
-        
-        # Store assistant response in conversation history
-        assistant_response = {"role": "assistant", "content": assistant_message}
-        conversation_manager.add_message(conversation_id, assistant_response)
-        
-        # Create response
-        return ChatResponse(
-            conversation_id=conversation_id,
-            message=Message(
-                role="assistant",
-                content=assistant_message
-            ),
-            tool_calls=tool_calls
-        )
+        if not is_valid_conversation_id(conversation_id):
+            raise HTTPException(
+                status_code=400,
+                detail="conversation_id must be 1 to 64 letters, digits, underscores or hyphens"
+            )
+        tenant = _get_tenant(http_request)
+        response = await _run_turn(conversation_id, lambda: _chat_turn(conversation_id, request, tenant))
+        return FastJSONResponse(response)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error processing chat request: {e}", file=sys.stderr)
+        logger.exception("Error processing chat request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _chat_turn(conversation_id: str, request: ChatRequest, tenant: str,
+                     on_delta: Optional[Callable[[str], None]] = None) -> ChatResponse:
+    """Add the new messages of a chat request and call the model."""
+    # Get existing conversation history or create new
+    history = conversation_manager.get_conversation(conversation_id)
+    if history is None:
+        # If this is a new conversation, create the workspace directory
+        conversation_manager.create_conversation(conversation_id)
+        history = conversation_manager.get_conversation(conversation_id)
+    
+    # Collect new messages from the request
+    new_messages: List[HistoryMessage] = []
+    for message in request.messages:
+        last_role = new_messages[-1].role if new_messages else history.last_role
+        if message.role != last_role:
+            new_messages.append(HistoryMessage(message.role, message.content))
+    
+    # Every tool_use must be answered by a tool_result in the next user turn, so tool
+    # calls left pending by the new message are closed as errors in that same turn
+    pending_tool_calls = list(conversation_manager.get_pending_tool_calls(conversation_id))
+    if pending_tool_calls and new_messages and new_messages[0].role == "user":
+        closed = [
+            {
+                "type": "tool_result",
+                "tool_use_id": tool_call_id,
+                "content": "Not run: the user sent a new message instead of a result",
+                "is_error": True
+            }
+            for tool_call_id in pending_tool_calls
+        ]
+        new_messages[0] = HistoryMessage("user", closed + [{"type": "text", "text": new_messages[0].content}])
+    
+    response = await _call_model(conversation_id, history, new_messages, tenant, on_delta)
+    
+    for new_message in new_messages:
+        conversation_manager.add_message(conversation_id, new_message)
+    if new_messages and new_messages[0].role == "user":
+        for tool_call_id in pending_tool_calls:
+            conversation_manager.remove_pending_tool_call(conversation_id, tool_call_id)
+    
+    return _record_response(conversation_id, response)
+
+
 @router.post("/tool-results", response_model=ChatResponse)
-async def process_tool_results(request: ToolResultRequest):
+async def process_tool_results(request: ToolResultRequest, http_request: Request):
     """
     Process results from tool calls and continue the conversation.
     
+    The tool results are only recorded once the model has answered, so a
+    failed request can be retried as is. All results become a single user
+    turn, handled after earlier turns of the conversation, so the request
+    must answer every pending tool call of the conversation.
+    
     Args:
         request: The tool results request
+        http_request: The incoming HTTP request, used to identify the tenant
         
     Returns:
         ChatResponse: The next response from Claude
     """
     try:
         conversation_id = request.conversation_id
+        tenant = _get_tenant(http_request)
+        response = await _run_turn(conversation_id, lambda: _tool_results_turn(conversation_id, request, tenant))
+        return FastJSONResponse(response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error processing tool results: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _tool_results_turn(conversation_id: str, request: ToolResultRequest, tenant: str,
+                             on_delta: Optional[Callable[[str], None]] = None) -> ChatResponse:
+    """Add the results of pending tool calls as one user turn and call the model."""
+    # Verify conversation exists
+    history = conversation_manager.get_conversation(conversation_id)
+    if not history:
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+    
+    # Verify tool calls exist for this conversation
+    pending_tool_calls = conversation_manager.get_pending_tool_calls(conversation_id)
+    if not pending_tool_calls:
+        raise HTTPException(status_code=400, detail="No pending tool calls for this conversation")
+    
+    # Check the tool calls before any result is shaped
+    for tool_result in request.tool_results:
+        if tool_result.tool_call_id not in pending_tool_calls:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Tool call not found: {tool_result.tool_call_id}"
+            )
+    # The model expects a result for each of its tool calls in the next turn
+    answered = {tool_result.tool_call_id for tool_result in request.tool_results}
+    missing = [tool_call_id for tool_call_id in pending_tool_calls if tool_call_id not in answered]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing results for pending tool calls: {', '.join(missing)}; send all results in one request"
+        )
+    
+    # Format the tool results as the blocks of a single user turn
+    workspace_path = conversation_manager.get_workspace_path(conversation_id)
+    result_blocks = []
+    for tool_result in request.tool_results:
         
-        # Verify conversation exists
-        if not conversation_manager.get_conversation(conversation_id):
-            raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
-        
-        # Verify tool calls exist for this conversation
-        pending_tool_calls = conversation_manager.get_pending_tool_calls(conversation_id)
-        if not pending_tool_calls:
-            raise HTTPException(status_code=400, detail="No pending tool calls for this conversation")
-        
-        # Process each tool result
-        for tool_result in request.tool_results:
-            # Check if this tool call exists
-            if tool_result.tool_call_id not in pending_tool_calls:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Tool call not found: {tool_result.tool_call_id}"
-                )
-            
-            # Format the tool result for Claude's message format
-            tool_result_message = {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "tool_result",
-                        "tool_use_id": tool_result.tool_call_id,
-                        "content": tool_result.result
-                    }
-                ]
-            }
-            
-            # Add tool result to conversation history
-            conversation_manager.add_message(conversation_id, tool_result_message)
-            
-            # Remove pending tool call
-            conversation_manager.remove_pending_tool_call(conversation_id, tool_result.tool_call_id)
+        # Shape the result as compact text before it becomes part of every later request
+        tool_name = pending_tool_calls[tool_result.tool_call_id]["tool"].name
+        content = await asyncio.to_thread(
+            result_shaper.shape,
+            tool_name,
+            workspace_path,
+            tool_result.tool_call_id,
+            tool_result.error or tool_result.result,
+            max_result_chars(tool_name)
+        )
+        if not tool_result.error:
+            # Images named by the result, e.g. screenshots, are sent along with its text
+            image = await asyncio.to_thread(image_block, tool_name, workspace_path, tool_result.result)
+            if image is not None:
+                content = [image, {"type": "text", "text": content}]
+        result_block = {
+            "type": "tool_result",
+            "tool_use_id": tool_result.tool_call_id,
+            "content": content
+        }
+        if tool_result.error:
+            result_block["is_error"] = True
+        result_blocks.append(result_block)
+    tool_result_message = HistoryMessage("user", result_blocks)
+    
+    # Call the model with the updated conversation
+    response = await _call_model(conversation_id, history, [tool_result_message], tenant, on_delta)
+    
+    # Add tool results to conversation history and clear the pending calls
+    conversation_manager.add_message(conversation_id, tool_result_message)
+    for tool_result in request.tool_results:
+        conversation_manager.remove_pending_tool_call(conversation_id, tool_result.tool_call_id)
+    
+    return _record_response(conversation_id, response)
+
+
+@router.post("/conversations/{conversation_id}/tool-calls/{tool_call_id}/execute", response_model=ToolResult)
+async def execute_tool_call(conversation_id: str, tool_call_id: str):
+    """
+    Run a pending tool call on the server and return its result.
+    
+    The call runs under the tool's concurrency limit and timeout and stays
+    pending; send the result to /tool-results to continue the conversation.
+    Tool failures are returned in the error field so they can be passed back
+    to the model.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        tool_call_id: The ID of the pending tool call
         
-        # Get the updated conversation history
-        claude_messages = conversation_manager.get_conversation(conversation_id)
+    Returns:
+        ToolResult: The result of the tool call
+    """
+    tool_call = conversation_manager.get_pending_tool_calls(conversation_id).get(tool_call_id)
+    if tool_call is None:
+        raise HTTPException(status_code=404, detail=f"Tool call not found: {tool_call_id}")
+    
+    tool_name = tool_call["tool"].name
+    try:
+        result = await tool_dispatcher.dispatch(tool_name, conversation_id, tool_call["input"])
+        return ToolResult(tool_call_id=tool_call_id, result=result)
+    except Exception as e:
+        logger.warning("Tool %s failed: %s", tool_name, e)
+        return ToolResult(tool_call_id=tool_call_id, result=None, error=str(e))
+
+
+@router.get("/conversations/{conversation_id}/queue")
+async def get_conversation_queue(conversation_id: str):
+    """
+    Get the turn queue of a conversation.
+    
+    Args:
+        conversation_id: The ID of the conversation
         
-        # Call Claude API with the updated conversation
-        try:
-            print(f"Sending updated conversation with tool results to Claude API", file=sys.stderr)
-            response = claude_client.create_message(claude_messages)
-            
-            # Extract text content and tool calls
-            assistant_message = ""
-            tool_calls = None
-            
-            # Extract text content from response
-            for content_block in response.content:
-                if content_block.type == "text":
-                    assistant_message += content_block.text
-            
-            # Extract tool calls from response
-            extracted_tool_calls = claude_client.extract_tool_calls(response)
-            if extracted_tool_calls:
-                tool_calls = []
-                for tool_call in extracted_tool_calls:
-                    # Add the pending tool call to conversation manager
-                    conversation_manager.add_pending_tool_call(
-                        conversation_id, 
-                        tool_call["id"], 
-                        tool_call
-                    )
-                    
-                    # Add to response tool calls list
-                    tool_calls.append(ToolCall(**tool_call))
-                
-                print(f"Found {len(tool_calls)} tool calls in response", file=sys.stderr)
-            
-            # Store assistant response in conversation history
-            assistant_response = {"role": "assistant", "content": assistant_message}
-            conversation_manager.add_message(conversation_id, assistant_response)
-            
-            # Create response
-            return ChatResponse(
-                conversation_id=conversation_id,
-                message=Message(
-                    role="assistant",
-                    content=assistant_message
-                ),
-                tool_calls=tool_calls
-            )
-            
-        except Exception as e:
-            print(f"Error calling Claude API with tool results: {e}", file=sys.stderr)
-            raise HTTPException(status_code=500, detail=str(e))
+    Returns:
+        Number of queued turns, whether a turn is running, turns run and the
+        last and longest wait in seconds; all zero if the conversation has
+        had no recent turns
+    """
+    if conversation_manager.get_conversation(conversation_id) is None:
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+    stats = conversation_actors.stats(conversation_id)
+    if stats is None:
+        stats = {"queued": 0, "running": False, "turns": 0, "last_wait": 0.0, "max_wait": 0.0}
+    return {"conversation_id": conversation_id, **stats}
+
+
+@router.get("/conversations/{conversation_id}/messages")
+async def get_conversation_messages(conversation_id: str, http_request: Request, after: int = 0, wait: float = 0):
+    """
+    Get the messages of a conversation added after a sequence number.
+    
+    Messages are numbered from 1 in the order they were added, so the i-th
+    returned message (from 0) has sequence number ``after + 1 + i``; pass the
+    returned "seq" as ``after`` on the next call to get only newer messages.
+    With ``wait``, the request is held until there are newer messages or the
+    wait (capped at HISTORY_POLL_MAX_WAIT) runs out. The response carries an
+    ETag of the conversation's state; a request whose If-None-Match matches
+    it gets 304 Not Modified.
+    
+    If ``after`` is beyond the last message, the client saw a history of an
+    earlier server process: all messages are returned with "reset" true.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        http_request: The incoming HTTP request
+        after: Sequence number of the last message the client has, 0 for none
+        wait: Seconds to wait for newer messages, 0 to answer at once
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error processing tool results: {e}", file=sys.stderr)
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+    Returns:
+        The conversation ID, the "after" the messages follow, the sequence
+        number of the last message, "reset" and the messages in Anthropic's
+        message format
+    """
+    history = conversation_manager.get_conversation(conversation_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+    
+    reset = after > history.seq
+    if reset:
+        after = 0
+    elif wait > 0:
+        await conversation_manager.wait_for_messages(conversation_id, after, min(wait, settings.HISTORY_POLL_MAX_WAIT))
+    
+    seq = history.seq
+    etag = f'"{conversation_manager.epoch}-{seq}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # Reuse the encoding each message cached when it was added instead of serializing the history again
+    head = dumps({"conversation_id": conversation_id, "after": after, "seq": seq, "reset": reset})
+    messages = b",".join(message.encoded for message in history.since(after))
+    body = head[:-1] + b',"messages":[' + messages + b"]}"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an If-None-Match header matches an ETag, using weak comparison."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,113 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from ..models.jobs import JobRequest, Job, JobOutput
+from ..utils.tools import tool_dispatcher
+from ..core.job_manager import job_manager
+from ..core.conversation_manager import conversation_manager
+from typing import List
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+def _check_workspace(conversation_id: str) -> None:
+    """Raise 404 if the conversation has no workspace."""
+    if not conversation_manager.get_workspace_path(conversation_id).is_dir():
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+
+
+@router.post("/conversations/{conversation_id}/jobs", response_model=Job)
+async def start_job(conversation_id: str, request: JobRequest):
+    """
+    Start a background job and return immediately.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        request: The job request containing the command
+        
+    Returns:
+        Job: The started job
+    """
+    _check_workspace(conversation_id)
+    try:
+        # Go through the tool so the same command validation applies
+        job = await tool_dispatcher.dispatch("start_job", conversation_id, {"command": request.command})
+        return Job(**job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error starting job: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/conversations/{conversation_id}/jobs", response_model=List[Job])
+async def list_jobs(conversation_id: str):
+    """
+    List the background jobs of a conversation.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        
+    Returns:
+        List[Job]: The jobs, oldest first
+    """
+    _check_workspace(conversation_id)
+    return [Job(**job) for job in job_manager.list_jobs(conversation_id)]
+
+
+@router.get("/conversations/{conversation_id}/jobs/{job_id}", response_model=Job)
+async def get_job(conversation_id: str, job_id: str):
+    """
+    Get the status of a background job.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        job_id: The ID of the job
+        
+    Returns:
+        Job: The job with its current status
+    """
+    job = job_manager.get_job(conversation_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return Job(**job)
+
+
+@router.get("/conversations/{conversation_id}/jobs/{job_id}/output", response_model=JobOutput)
+async def get_job_output(conversation_id: str, job_id: str, offset: int = 0, limit: int = job_manager.MAX_TAIL_BYTES):
+    """
+    Read the output of a background job starting at a byte offset.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        job_id: The ID of the job
+        offset: Byte offset to read from
+        limit: Maximum number of bytes to return
+        
+    Returns:
+        JobOutput: The output slice and the offset for the next read
+    """
+    output = job_manager.read_output(conversation_id, job_id, offset, limit)
+    if output is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return JobOutput(**output)
+
+
+@router.post("/conversations/{conversation_id}/jobs/{job_id}/cancel", response_model=Job)
+async def cancel_job(conversation_id: str, job_id: str):
+    """
+    Cancel a running background job.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        job_id: The ID of the job
+        
+    Returns:
+        Job: The job after cancellation
+    """
+    job = await asyncio.to_thread(job_manager.cancel_job, conversation_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return Job(**job)
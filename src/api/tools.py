@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from ..utils.tools import tool_registry
+import asyncio
+from typing import List, Dict, Any
+
+router = APIRouter()
+
+
+@router.get("/tools", response_model=List[Dict[str, Any]])
+async def list_tools():
+    """
+    List the available tools and their parameters.
+    
+    Returns:
+        List[Dict[str, Any]]: Tool definitions
+    """
+    return tool_registry.get_tool_definitions()
+
+
+@router.post("/tools/reload", response_model=Dict[str, Any])
+async def reload_tools():
+    """
+    Reload tool modules whose source changed and load new plugin files.
+    
+    Conversations and pending tool calls are kept; the next model call sees
+    the new tool schemas.
+    
+    Returns:
+        Dict[str, Any]: The reloaded modules and the current tool names
+    """
+    reloaded = await asyncio.to_thread(tool_registry.check_for_changes)
+    return {"reloaded": reloaded, "tools": tool_registry.get_tool_names()}
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException
+from ..utils.telemetry import tracer
+from typing import List, Dict, Any
+
+router = APIRouter()
+
+
+@router.get("/traces", response_model=List[Dict[str, Any]])
+async def list_traces(limit: int = 20):
+    """
+    List the most recent traces kept in memory.
+    
+    Args:
+        limit: Maximum number of traces to return
+        
+    Returns:
+        List[Dict[str, Any]]: Trace summaries, newest first
+    """
+    return tracer.recent_traces(limit)
+
+
+@router.get("/traces/{trace_id}", response_model=Dict[str, Any])
+async def get_trace(trace_id: str):
+    """
+    Get a trace with all of its spans.
+    
+    Args:
+        trace_id: The ID of the trace
+        
+    Returns:
+        Dict[str, Any]: The trace and its spans in OpenTelemetry field naming
+    """
+    trace = tracer.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
+    return trace
@@ -0,0 +1,162 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from ..models.chat import ChatRequest, ChatResponse, Message, ToolResultRequest
+from ..core.conversation_manager import is_valid_conversation_id
+from ..core.event_log import conversation_events, EventLog, Subscription
+from ..config import settings
+from ..utils.telemetry import WEBSOCKET_CONNECTIONS
+from ..utils.serialization import dumps
+from .chat import _get_tenant, _run_turn, _chat_turn, _tool_results_turn
+import asyncio
+import functools
+import uuid
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+# Close code telling a client it fell behind and should reconnect and resume
+CLOSE_TRY_AGAIN_LATER = 1013
+# Close code rejecting a connection for an invalid conversation ID
+CLOSE_POLICY_VIOLATION = 1008
+
+# Open sockets, for the connections gauge
+_sockets: Set[WebSocket] = set()
+# Turns started by sockets; they finish even if their socket closes
+_turns: Set[asyncio.Task] = set()
+
+
+@router.websocket("/conversations/{conversation_id}/ws")
+async def conversation_socket(websocket: WebSocket, conversation_id: str, after: Optional[int] = None):
+    """
+    Carry a conversation over one WebSocket.
+
+    The client sends ``{"type": "message", "content": ...}`` to add a user
+    message and ``{"type": "tool_results", "tool_results": [...]}`` to answer
+    tool calls; both may carry an "id" that is echoed on the events of the
+    turn. The server first sends ``{"type": "ready", "seq": N, "gap": ...}``,
+    then numbered events: user_message, assistant_delta (streamed text),
+    assistant_message (the final message with its tool_calls) and error.
+
+    To resume after a reconnect, pass the last seen sequence number as
+    ``?after=N``; later events still kept are replayed. "gap" is true if
+    some were already dropped, in which case the client should reload the
+    conversation. A client that does not read events fast enough is closed
+    with code 1013 and can resume the same way.
+
+    Args:
+        websocket: The WebSocket connection
+        conversation_id: The ID of the conversation
+        after: Sequence number of the last event the client saw
+    """
+    if not is_valid_conversation_id(conversation_id):
+        # Closing before accepting rejects the handshake
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    tenant = _get_tenant(websocket)
+    await websocket.accept()
+    log = conversation_events.get(conversation_id)
+    replay, gap, subscription = log.subscribe(after, settings.WEBSOCKET_SEND_QUEUE)
+    _sockets.add(websocket)
+    sender = None
+    try:
+        await websocket.send_json({"type": "ready", "conversation_id": conversation_id, "seq": log.seq, "gap": gap})
+        sender = asyncio.create_task(_send_events(websocket, replay, subscription))
+        while True:
+            try:
+                frame = await websocket.receive_json()
+            except ValueError:
+                log.publish({"type": "error", "id": None, "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+            _start_turn(conversation_id, log, frame, tenant)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        log.unsubscribe(subscription)
+        _sockets.discard(websocket)
+        if sender is not None:
+            sender.cancel()
+
+
+async def _send_events(websocket: WebSocket, replay: List[Dict[str, Any]], subscription: Subscription) -> None:
+    """Send replayed and new events to a client, closing it if it falls behind."""
+    try:
+        for event in replay:
+            await websocket.send_text(dumps(event).decode("utf-8"))
+        while True:
+            event = await subscription.queue.get()
+            if subscription.overflowed:
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Client too slow; resume from last seq")
+                return
+            await websocket.send_text(dumps(event).decode("utf-8"))
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while an event was being sent
+        pass
+
+
+def _start_turn(conversation_id: str, log: EventLog, frame: Any, tenant: str) -> None:
+    """Validate a client frame and run its turn in the background."""
+    turn_id = frame.get("id") if isinstance(frame, dict) else None
+    turn_id = turn_id or uuid.uuid4().hex
+    kind = frame.get("type") if isinstance(frame, dict) else None
+
+    loop = asyncio.get_running_loop()
+
+    def on_delta(text: str) -> None:
+        # Called from the thread running the model call
+        loop.call_soon_threadsafe(log.publish, {"type": "assistant_delta", "id": turn_id, "text": text})
+
+    try:
+        if kind == "message":
+            request = ChatRequest(
+                messages=[Message(role="user", content=frame.get("content"))],
+                conversation_id=conversation_id
+            )
+            log_event = {"type": "user_message", "id": turn_id, "content": request.messages[0].content}
+            run = functools.partial(_chat_turn, conversation_id, request, tenant, on_delta)
+        elif kind == "tool_results":
+            request = ToolResultRequest(conversation_id=conversation_id, tool_results=frame.get("tool_results"))
+            log_event = None
+            run = functools.partial(_tool_results_turn, conversation_id, request, tenant, on_delta)
+        else:
+            log.publish({"type": "error", "id": turn_id, "status": 400, "detail": f"Unknown frame type: {kind}"})
+            return
+    except ValidationError as e:
+        log.publish({"type": "error", "id": turn_id, "status": 422, "detail": str(e)})
+        return
+
+    task = asyncio.create_task(_run_socket_turn(conversation_id, log, turn_id, log_event, run))
+    _turns.add(task)
+    task.add_done_callback(_turns.discard)
+
+
+async def _run_socket_turn(conversation_id: str, log: EventLog, turn_id: str, log_event: Optional[Dict[str, Any]],
+                           run: Callable[[], Awaitable[ChatResponse]]) -> None:
+    """Run a turn on the conversation's actor and publish its outcome."""
+
+    async def turn() -> None:
+        # Events of a turn are published while it holds the conversation, so they stay in order
+        if log_event is not None:
+            log.publish(log_event)
+        try:
+            response = await run()
+        except HTTPException as e:
+            log.publish({"type": "error", "id": turn_id, "status": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            logger.exception("Error processing WebSocket turn: %s", e)
+            log.publish({"type": "error", "id": turn_id, "status": 500, "detail": str(e)})
+            return
+        log.publish({"type": "assistant_message", "id": turn_id, **response.dict()})
+        # The final message supersedes the streamed text; resuming clients get only the message
+        log.compact("assistant_delta", turn_id)
+
+    try:
+        await _run_turn(conversation_id, turn)
+    except HTTPException as e:
+        log.publish({"type": "error", "id": turn_id, "status": e.status_code, "detail": e.detail})
+
+
+WEBSOCKET_CONNECTIONS.set_function(lambda: len(_sockets))
@@ -1,7 +1,7 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
-import sys
 
 def load_environment():
     """
@@ -10,34 +10,29 @@ def load_environment():
     2. .env.local (user-specific overrides)
     3. .env (project defaults)
     4. .env.example (example configuration)
+    
+    Nothing is printed here: settings load before logging is configured, so
+    the loaded files are reported by src/utils/logger.py instead.
+    
+    Returns:
+        Names of the files that were loaded
     """
     env_files = ['.env.local', '.env', '.env.example']
-    env_loaded = False
+    loaded = []
     
     # Get the base project directory
     base_dir = Path(__file__).resolve().parent.parent
     
-    print(f"Current working directory: {base_dir}", file=sys.stderr)
-    print(f"Looking for environment files: {env_files}", file=sys.stderr)
-    
     for env_file in env_files:
         env_path = base_dir / env_file
-        print(f"Checking {env_path}", file=sys.stderr)
         if env_path.exists():
-            print(f"Found {env_file}, loading variables...", file=sys.stderr)
             load_dotenv(dotenv_path=env_path)
-            env_loaded = True
-            print(f"Loaded environment variables from {env_file}", file=sys.stderr)
-            # Print loaded keys (but not values for security)
-            with open(env_path) as f:
-                keys = [line.split('=')[0].strip() for line in f if '=' in line and not line.startswith('#')]
-                print(f"Keys loaded from {env_file}: {keys}", file=sys.stderr)
+            loaded.append(env_file)
     
-    if not env_loaded:
-        print("Warning: No .env files found. Using system environment variables only.", file=sys.stderr)
+    return loaded
 
 # Load environment variables at module import
-load_environment()
+LOADED_ENV_FILES = load_environment()
 
 # API Configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -48,8 +43,166 @@ DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-7-sonnet-20250219")
 
+# LLM routing configuration
+# JSON mapping route names to {"targets": ["provider:model", ...], "latency_slo": s, "timeout": s}
+LLM_ROUTES = json.loads(os.getenv("LLM_ROUTES", "{}"))
+LLM_FAILOVER_COOLDOWN = float(os.getenv("LLM_FAILOVER_COOLDOWN", "30"))
+
+# LLM resilience configuration
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "20"))
+LLM_REQUEST_DEADLINE = float(os.getenv("LLM_REQUEST_DEADLINE", "120"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+# Seconds before a slow call is duplicated; 0 disables hedging
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "0"))
+# Return canned echo responses instead of calling any provider (tests only)
+LLM_MOCK_MODE = os.getenv("LLM_MOCK_MODE", "false").lower() == "true"
+
 # Workspace Configuration
+# Created on first use rather than at import
 WORKSPACE_DIR = Path(os.getenv("WORKSPACE_DIR", "runs")).resolve()
 
-# Ensure workspace directory exists
-os.makedirs(WORKSPACE_DIR, exist_ok=True) 
\ No newline at end of file
+# Persistent shell session configuration
+SHELL_SESSION_IDLE_TIMEOUT = int(os.getenv("SHELL_SESSION_IDLE_TIMEOUT", "900"))
+SHELL_SESSION_MAX_OUTPUT = int(os.getenv("SHELL_SESSION_MAX_OUTPUT", "100000"))
+
+# Conversation turn configuration
+# Turns of one conversation run one at a time; an actor idle this long is reclaimed
+CONVERSATION_ACTOR_IDLE_TIMEOUT = float(os.getenv("CONVERSATION_ACTOR_IDLE_TIMEOUT", "60"))
+CONVERSATION_MAX_QUEUED_TURNS = int(os.getenv("CONVERSATION_MAX_QUEUED_TURNS", "8"))
+
+# History sync configuration
+# Longest a long-polling request for new messages waits, in seconds
+HISTORY_POLL_MAX_WAIT = float(os.getenv("HISTORY_POLL_MAX_WAIT", "30"))
+
+# WebSocket configuration
+# Events kept per conversation for clients resuming after a reconnect
+WEBSOCKET_EVENT_BUFFER = int(os.getenv("WEBSOCKET_EVENT_BUFFER", "1000"))
+# Seconds a conversation's events are kept once no client is subscribed and no turn publishes
+WEBSOCKET_EVENT_LOG_IDLE_TIMEOUT = float(os.getenv("WEBSOCKET_EVENT_LOG_IDLE_TIMEOUT", "600"))
+# Events queued for a client before it is disconnected as too slow
+WEBSOCKET_SEND_QUEUE = int(os.getenv("WEBSOCKET_SEND_QUEUE", "256"))
+
+# Tool plugin configuration
+# Tools are also loaded from this entry point group and from the plugin directories (os.pathsep-separated)
+TOOL_ENTRY_POINT_GROUP = os.getenv("TOOL_ENTRY_POINT_GROUP", "web_agentic_ai.tools")
+TOOL_PLUGIN_DIRS = [p.strip() for p in os.getenv("TOOL_PLUGIN_DIRS", "").split(os.pathsep) if p.strip()]
+# Seconds between checks for changed tool modules; 0 disables hot reload
+TOOL_RELOAD_INTERVAL = float(os.getenv("TOOL_RELOAD_INTERVAL", "0"))
+
+# Tool execution configuration
+# Seconds before a tool call is abandoned, for tools that do not set their own timeout (0 for none)
+TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", "600"))
+# JSON object overriding tool policies, e.g. {"extract_content": {"max_concurrency": 2, "timeout": 60}}
+TOOL_LIMITS = json.loads(os.getenv("TOOL_LIMITS", "{}"))
+# Results of cacheable tools kept in memory per worker (0 disables the cache)
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+# Longest tool result added to a conversation, for tools that set no limit; the rest is saved to the workspace
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "20000"))
+TOOL_THREAD_POOL_SIZE = int(os.getenv("TOOL_THREAD_POOL_SIZE", "32"))
+TOOL_PROCESS_POOL_SIZE = int(os.getenv("TOOL_PROCESS_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+
+# Search configuration
+# JSON endpoint of a search provider, e.g. the stand-in in benchmarks/stand_ins.py
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "")
+# Comma-separated providers searched in parallel: "duckduckgo" and "api" (SEARCH_API_URL)
+SEARCH_PROVIDERS = [p.strip() for p in os.getenv("SEARCH_PROVIDERS", "api" if SEARCH_API_URL else "duckduckgo").split(",") if p.strip()]
+# Seconds before a slow provider call is duplicated (0 disables hedging), and before a search gives up on a provider
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "3"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "20"))
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "2"))
+SEARCH_THREAD_POOL_SIZE = int(os.getenv("SEARCH_THREAD_POOL_SIZE", "16"))
+# Most queries accepted by one web_search call
+SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", "8"))
+
+# Research configuration
+# Pages fetched and passages returned per research call by default
+RESEARCH_MAX_PAGES = int(os.getenv("RESEARCH_MAX_PAGES", "5"))
+RESEARCH_MAX_PASSAGES = int(os.getenv("RESEARCH_MAX_PASSAGES", "8"))
+# Words per passage the pages are split into
+RESEARCH_PASSAGE_WORDS = int(os.getenv("RESEARCH_PASSAGE_WORDS", "120"))
+# Seconds before the pages not yet fetched are given up, and the most bytes read from one page
+RESEARCH_FETCH_TIMEOUT = float(os.getenv("RESEARCH_FETCH_TIMEOUT", "15"))
+RESEARCH_MAX_PAGE_BYTES = int(os.getenv("RESEARCH_MAX_PAGE_BYTES", "2000000"))
+# HTML pages with fewer words are loaded again in the headless browser (0 never uses the browser)
+RESEARCH_RENDER_MIN_WORDS = int(os.getenv("RESEARCH_RENDER_MIN_WORDS", "50"))
+RESEARCH_THREAD_POOL_SIZE = int(os.getenv("RESEARCH_THREAD_POOL_SIZE", "8"))
+
+# Retrieval configuration
+# Words per chunk the workspace files are split into, and chunks returned by default
+RETRIEVAL_CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "150"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+# Blend BM25 with hashed embeddings, which also match word variants; the weight is the embeddings' share of the score
+RETRIEVAL_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "true").lower() == "true"
+RETRIEVAL_EMBEDDING_DIM = int(os.getenv("RETRIEVAL_EMBEDDING_DIM", "256"))
+RETRIEVAL_EMBEDDING_WEIGHT = float(os.getenv("RETRIEVAL_EMBEDDING_WEIGHT", "0.3"))
+# Largest file and most files indexed per workspace, and workspace indexes kept per worker
+RETRIEVAL_MAX_FILE_BYTES = int(os.getenv("RETRIEVAL_MAX_FILE_BYTES", "2000000"))
+RETRIEVAL_MAX_FILES = int(os.getenv("RETRIEVAL_MAX_FILES", "5000"))
+RETRIEVAL_MAX_INDEXES = int(os.getenv("RETRIEVAL_MAX_INDEXES", "32"))
+
+# Screenshot configuration
+# Contexts kept warm in the shared headless browser, which is closed after this many idle seconds
+BROWSER_POOL_CONTEXTS = int(os.getenv("BROWSER_POOL_CONTEXTS", "4"))
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+# Default viewport, and the widest viewport and tallest full page captured
+SCREENSHOT_VIEWPORT_WIDTH = int(os.getenv("SCREENSHOT_VIEWPORT_WIDTH", "1280"))
+SCREENSHOT_VIEWPORT_HEIGHT = int(os.getenv("SCREENSHOT_VIEWPORT_HEIGHT", "800"))
+SCREENSHOT_MAX_WIDTH = int(os.getenv("SCREENSHOT_MAX_WIDTH", "1920"))
+SCREENSHOT_MAX_PAGE_HEIGHT = int(os.getenv("SCREENSHOT_MAX_PAGE_HEIGHT", "2400"))
+# Images are scaled to fit these limits before they reach the model, then encoded as "webp" or "jpeg"
+SCREENSHOT_MAX_EDGE = int(os.getenv("SCREENSHOT_MAX_EDGE", "1568"))
+SCREENSHOT_MAX_PIXELS = int(os.getenv("SCREENSHOT_MAX_PIXELS", "1150000"))
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "webp")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+# Seconds a screenshot is reused without opening the page again, and how many are kept per worker
+SCREENSHOT_CACHE_TTL = float(os.getenv("SCREENSHOT_CACHE_TTL", "60"))
+SCREENSHOT_CACHE_ENTRIES = int(os.getenv("SCREENSHOT_CACHE_ENTRIES", "128"))
+# A changed recapture whose perceptual hash differs in at most this many of 64 bits is counted as similar
+# in the cache metrics; only a byte-identical capture reuses the previous image
+SCREENSHOT_HASH_DISTANCE = int(os.getenv("SCREENSHOT_HASH_DISTANCE", "2"))
+
+# Python package installation configuration
+# Shared across workspaces; kept under WORKSPACE_DIR so virtualenvs can be hardlinked
+PYTHON_ENV_CACHE_DIR = Path(os.getenv("PYTHON_ENV_CACHE_DIR", str(WORKSPACE_DIR / ".cache"))).resolve()
+PIP_CACHE_DIR = Path(os.getenv("PIP_CACHE_DIR", str(PYTHON_ENV_CACHE_DIR / "pip"))).resolve()
+PIP_WHEELHOUSE_DIR = Path(os.getenv("PIP_WHEELHOUSE_DIR", str(PYTHON_ENV_CACHE_DIR / "wheelhouse"))).resolve()
+PIP_OFFLINE = os.getenv("PIP_OFFLINE", "false").lower() == "true"
+PIP_INSTALL_TIMEOUT = int(os.getenv("PIP_INSTALL_TIMEOUT", "600"))
+VENV_TEMPLATE_PACKAGES = [p.strip() for p in os.getenv("VENV_TEMPLATE_PACKAGES", "").split(",") if p.strip()]
+
+# Admission control configuration
+# "memory" keeps limits per worker; "sqlite" shares them across workers on a host
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = Path(os.getenv("RATE_LIMIT_DB_PATH", str(WORKSPACE_DIR / ".cache" / "rate_limits.sqlite"))).resolve()
+RATE_LIMIT_REQUESTS_PER_MINUTE = float(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "60"))
+RATE_LIMIT_REQUEST_BURST = float(os.getenv("RATE_LIMIT_REQUEST_BURST", "10"))
+RATE_LIMIT_TOKENS_PER_MINUTE = float(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "200000"))
+# JSON mapping API keys (or "ip:<address>") to fair-share weights, default weight 1
+RATE_LIMIT_TENANT_WEIGHTS = json.loads(os.getenv("RATE_LIMIT_TENANT_WEIGHTS", "{}"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+
+# Batch configuration
+# "anthropic" uses the Message Batches API; "local" runs requests through the LLM router
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "anthropic")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_LOCAL_CONCURRENCY = int(os.getenv("BATCH_LOCAL_CONCURRENCY", "4"))
+
+# Telemetry configuration
+# Fraction of requests traced; metrics are always collected
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Optional JSON lines file receiving every finished trace
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+# JSON objects mapping module names (e.g. "utils.llm_client") to levels and to sample rates for INFO/DEBUG records
+LOG_LEVELS = json.loads(os.getenv("LOG_LEVELS", "{}"))
+LOG_SAMPLING = json.loads(os.getenv("LOG_SAMPLING", "{}"))
+# "json" or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
@@ -1 +1,4 @@
-from .conversation_manager import conversation_manager 
\ No newline at end of file
+from .conversation_manager import conversation_manager
+from .job_manager import job_manager
+from .admission_control import admission_controller
+from .batch_manager import batch_manager
@@ -0,0 +1,381 @@
+import os
+import time
+import heapq
+import hashlib
+import asyncio
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Tuple
+from ..config import settings
+from ..utils.telemetry import tracer, ADMISSION_WAIT, ADMISSION_REJECTIONS, ADMISSION_ACTIVE, ADMISSION_WAITING
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RateLimitedError(Exception):
+    """Raised when a request is rejected by admission control."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Tenant of the requests of batches run by the local batch backend
+BATCH_TENANT = "batch"
+
+# A bucket is described by (key, capacity, refill rate per second, cost)
+Bucket = Tuple[str, float, float, float]
+
+
+class MemoryBucketStore:
+    """Token buckets kept in process memory (one set per worker)."""
+
+    # Acquisitions only take a lock held for microseconds, so they run on the event loop
+    blocking = False
+
+    def __init__(self):
+        # {bucket_key: (tokens, updated_at)}
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.lock = threading.Lock()
+
+    def try_acquire(self, buckets: List[Bucket]) -> float:
+        """
+        Take tokens from several buckets atomically.
+
+        Args:
+            buckets: The buckets to draw from
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until they would be available
+        """
+        with self.lock:
+            now = time.time()
+            levels = [_refill(self.buckets.get(key), capacity, rate, now) for key, capacity, rate, _ in buckets]
+            retry_after = _retry_after(buckets, levels)
+            if retry_after == 0:
+                for (key, _, _, cost), level in zip(buckets, levels):
+                    self.buckets[key] = (level - cost, now)
+            return retry_after
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file shared by all workers on a host.
+
+    Each acquisition runs in a BEGIN IMMEDIATE transaction, which serializes
+    concurrent writers across processes.
+    """
+
+    # Acquisitions may wait for other workers' transactions, so they run in a thread
+    blocking = True
+
+    def __init__(self, db_path: str):
+        """
+        Open the bucket database.
+
+        Args:
+            db_path: Path of the SQLite file
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def try_acquire(self, buckets: List[Bucket]) -> float:
+        """
+        Take tokens from several buckets atomically.
+
+        Args:
+            buckets: The buckets to draw from
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until they would be available
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            levels = []
+            for key, capacity, rate, _ in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                levels.append(_refill(row, capacity, rate, now))
+            retry_after = _retry_after(buckets, levels)
+            if retry_after == 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(key, level - cost, now) for (key, _, _, cost), level in zip(buckets, levels)]
+                )
+            conn.execute("COMMIT")
+            return retry_after
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _refill(state: Optional[Tuple[float, float]], capacity: float, rate: float, now: float) -> float:
+    """Return the current level of a bucket; new buckets start full."""
+    if state is None:
+        return capacity
+    tokens, updated_at = state
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+def _retry_after(buckets: List[Bucket], levels: List[float]) -> float:
+    """Return seconds until every bucket can cover its cost, or 0 if they can now."""
+    wait = 0.0
+    for (_, _, rate, cost), level in zip(buckets, levels):
+        if level < cost:
+            wait = max(wait, (cost - level) / rate)
+    return wait
+
+
+class FairQueue:
+    """
+    Weighted fair queue limiting concurrent model calls.
+
+    Waiting requests are ordered by virtual finish time: each tenant's
+    requests are spaced by cost / weight, so a tenant sending a burst only
+    delays its own later requests and cannot starve the others.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        """
+        Initialize the queue.
+
+        Args:
+            max_concurrency: Maximum number of requests holding a slot
+            max_queue: Maximum number of waiting requests before shedding
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.virtual_time = 0.0
+        self.sequence = 0
+        # [(finish_tag, sequence, future)]; entries of waiters that gave up
+        # stay in the heap until popped or compacted
+        self.waiting: List[Tuple[float, int, asyncio.Future]] = []
+        # Number of requests still waiting, not counting those that gave up
+        self.queued = 0
+        # {tenant: finish tag of the tenant's last request}
+        self.last_finish: Dict[str, float] = {}
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self.avg_service_time = 1.0
+
+    def _finish_tag(self, tenant: str, weight: float, cost: float) -> float:
+        """Assign the virtual finish time of a new request."""
+        start = max(self.virtual_time, self.last_finish.get(tenant, 0.0))
+        finish = start + cost / weight
+        self.last_finish[tenant] = finish
+        return finish
+
+    def estimated_wait(self) -> float:
+        """Rough time until a newly queued request would get a slot."""
+        return (self.queued + 1) * self.avg_service_time / self.max_concurrency
+
+    async def acquire(self, tenant: str, weight: float, cost: float, timeout: float) -> None:
+        """
+        Wait for a slot.
+
+        Args:
+            tenant: Tenant identifier
+            weight: Tenant weight; higher weights get a larger share
+            cost: Cost of the request, e.g. estimated input tokens
+            timeout: Maximum time to wait in seconds
+
+        Raises:
+            RateLimitedError: If the queue is full or the wait timed out
+        """
+        if self.active < self.max_concurrency and not self.queued:
+            self._finish_tag(tenant, weight, cost)
+            self.active += 1
+            return
+
+        if self.queued >= self.max_queue:
+            raise RateLimitedError("Server is overloaded, try again later", self.estimated_wait())
+
+        finish = self._finish_tag(tenant, weight, cost)
+        self.sequence += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (finish, self.sequence, future))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._give_up(future)
+            raise RateLimitedError("Timed out waiting for capacity", self.estimated_wait())
+        except asyncio.CancelledError:
+            self._give_up(future)
+            raise
+
+    def _give_up(self, future: asyncio.Future) -> None:
+        """Withdraw a waiter that timed out or was cancelled."""
+        if future.done() and not future.cancelled():
+            # The slot was handed over just before the waiter gave up; pass it on
+            self._hand_over()
+            return
+        future.cancel()
+        self.queued -= 1
+        # Drop dead entries once they outnumber the live ones, so a burst of
+        # timeouts does not leave the heap growing until the next hand-over
+        if len(self.waiting) > 2 * self.queued:
+            self.waiting = [entry for entry in self.waiting if not entry[2].done()]
+            heapq.heapify(self.waiting)
+
+    def release(self, service_time: float) -> None:
+        """
+        Give a slot back and hand it to the next waiting request.
+
+        Args:
+            service_time: How long the slot was held in seconds
+        """
+        self.avg_service_time = 0.2 * service_time + 0.8 * self.avg_service_time
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        """Free a slot and give it to the next waiting request, if any."""
+        self.active -= 1
+        while self.waiting:
+            finish, _, future = heapq.heappop(self.waiting)
+            if future.done():
+                # The waiter gave up
+                continue
+            self.virtual_time = finish
+            self.queued -= 1
+            self.active += 1
+            future.set_result(None)
+            break
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current queue state."""
+        return {"active": self.active, "waiting": self.queued, "max_concurrency": self.max_concurrency}
+
+
+class AdmissionController:
+    """
+    Admission control in front of the LLM router.
+
+    Every model call is admitted in two steps:
+    1. Per-tenant token buckets for request count and estimated input tokens.
+       Requests over the limit are rejected immediately with a retry delay.
+    2. A weighted fair queue bounding concurrent model calls per worker.
+       Requests are shed when the queue is full or the wait is too long.
+
+    With RATE_LIMIT_BACKEND=sqlite the buckets are shared by all uvicorn
+    workers on the host through a SQLite file.
+    """
+
+    def __init__(self):
+        """Initialize the admission controller from settings."""
+        if settings.RATE_LIMIT_BACKEND == "sqlite":
+            self.store = SQLiteBucketStore(str(settings.RATE_LIMIT_DB_PATH))
+        else:
+            self.store = MemoryBucketStore()
+
+        # Weights are configured per API key, as "ip:<address>" or for the "batch" tenant
+        self.weights = {
+            key if key.startswith("ip:") or key == BATCH_TENANT else self._hash_key(key): float(weight)
+            for key, weight in settings.RATE_LIMIT_TENANT_WEIGHTS.items()
+        }
+        self.queue = FairQueue(settings.LLM_MAX_CONCURRENCY, settings.ADMISSION_MAX_QUEUE)
+
+        logger.info("Initialized admission control with %s backend", settings.RATE_LIMIT_BACKEND)
+
+    def _hash_key(self, api_key: str) -> str:
+        """Derive a tenant ID from an API key without keeping the key itself."""
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def tenant_for(self, api_key: Optional[str], client_host: Optional[str]) -> str:
+        """
+        Identify the tenant of a request.
+
+        Args:
+            api_key: API key sent by the client, if any
+            client_host: Client IP address
+
+        Returns:
+            Tenant identifier
+        """
+        if api_key:
+            return self._hash_key(api_key)
+        return f"ip:{client_host or 'unknown'}"
+
+    def estimate_tokens(self, encoded_size: int) -> int:
+        """Roughly estimate the input tokens of a conversation from the size of its JSON (about 4 bytes per token)."""
+        return encoded_size // 4 + 1
+
+    @asynccontextmanager
+    async def admit(self, tenant: str, estimated_tokens: int):
+        """
+        Admit a model call for a tenant, holding a queue slot for its duration.
+
+        Args:
+            tenant: Tenant identifier
+            estimated_tokens: Estimated input tokens of the call
+
+        Raises:
+            RateLimitedError: If the tenant is over its limits or the server is overloaded
+        """
+        buckets: List[Bucket] = []
+        if settings.RATE_LIMIT_REQUESTS_PER_MINUTE > 0:
+            buckets.append((
+                f"{tenant}:requests",
+                settings.RATE_LIMIT_REQUEST_BURST,
+                settings.RATE_LIMIT_REQUESTS_PER_MINUTE / 60,
+                1
+            ))
+        if settings.RATE_LIMIT_TOKENS_PER_MINUTE > 0:
+            capacity = settings.RATE_LIMIT_TOKENS_PER_MINUTE
+            # Requests larger than the bucket can still run once it is full
+            buckets.append((f"{tenant}:tokens", capacity, capacity / 60, min(estimated_tokens, capacity)))
+
+        if buckets:
+            if self.store.blocking:
+                retry_after = await asyncio.to_thread(self.store.try_acquire, buckets)
+            else:
+                retry_after = self.store.try_acquire(buckets)
+            if retry_after > 0:
+                logger.info("Rate limited tenant %s for %.1fs", tenant, retry_after)
+                ADMISSION_REJECTIONS.inc(reason="rate_limit")
+                raise RateLimitedError("Rate limit exceeded", retry_after)
+
+        # Shed early rather than queueing a request that would time out anyway
+        if self.queue.estimated_wait() > settings.ADMISSION_MAX_WAIT and self.queue.queued:
+            ADMISSION_REJECTIONS.inc(reason="overloaded")
+            raise RateLimitedError("Server is overloaded, try again later", self.queue.estimated_wait())
+
+        weight = self.weights.get(tenant, 1.0)
+        start = time.monotonic()
+        with tracer.span("admission.wait", tenant=tenant, queue_depth=self.queue.queued):
+            try:
+                await self.queue.acquire(tenant, weight, max(1, estimated_tokens), settings.ADMISSION_MAX_WAIT)
+            except RateLimitedError:
+                ADMISSION_REJECTIONS.inc(reason="queue")
+                raise
+        ADMISSION_WAIT.observe(time.monotonic() - start)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.queue.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current admission state."""
+        return self.queue.stats()
+
+
+# Create a singleton instance
+admission_controller = AdmissionController()
+ADMISSION_ACTIVE.set_function(lambda: admission_controller.queue.active)
+ADMISSION_WAITING.set_function(lambda: admission_controller.queue.queued)
@@ -0,0 +1,406 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Dict, List, Any, Optional, Set
+from ..config import settings
+from .admission_control import admission_controller, RateLimitedError, BATCH_TENANT
+from ..utils.telemetry import BATCHES_IN_PROGRESS
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Batch statuses after which nothing more happens
+TERMINAL_STATUSES = {"ended", "canceled", "failed"}
+
+
+class BatchManager:
+    """
+    Runs non-interactive bulk prompt jobs.
+
+    Each batch lives in ``<WORKSPACE_DIR>/batches/<batch_id>/``:
+    - ``batch.json``: batch state (backend, provider batch ID, status, counts)
+    - ``requests.jsonl``: the submitted requests, one per line
+    - ``results.jsonl``: results, appended as they become available
+
+    Two backends are supported:
+    - ``anthropic``: submits to the Message Batches API and polls it. Works
+      against tools/mock_llm_server.py through ANTHROPIC_BASE_URL.
+    - ``local``: runs the requests through the LLM router (route "batch",
+      falling back to "chat") with bounded concurrency, admitting each one
+      under the batch tenant so batches share admission control with chat.
+
+    Because all state is on disk, unfinished batches are picked up again by
+    ``resume()`` after a restart; results already written are not repeated.
+    """
+
+    def __init__(self):
+        """Initialize the batch manager."""
+        self.root = settings.WORKSPACE_DIR / "batches"
+        # {batch_id: asyncio.Task} for batches being polled or processed
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, requests: List[Dict[str, Any]], model: Optional[str] = None,
+                     max_tokens: int = 1024, backend: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Submit a batch of single-turn prompts.
+
+        Args:
+            requests: Items with custom_id and either prompt or messages, plus optional system and max_tokens
+            model: Model to use (default: CLAUDE_MODEL, or the primary model of the batch route for the local backend)
+            max_tokens: Default maximum output tokens per request
+            backend: "anthropic" or "local" (default: BATCH_BACKEND)
+
+        Returns:
+            The batch state
+
+        Raises:
+            ValueError: If the requests are invalid or the local backend cannot serve the model
+        """
+        backend = backend or settings.BATCH_BACKEND
+        if backend not in ("anthropic", "local"):
+            raise ValueError(f"Unsupported batch backend: {backend}")
+        if not requests:
+            raise ValueError("A batch needs at least one request")
+
+        if backend == "local":
+            from ..utils.llm_client import llm_router
+            models = llm_router.route_models("batch")
+            model = model or models[0]
+            if model not in models:
+                raise ValueError(f"Model {model} is not served by the batch route; available: {', '.join(models)}")
+        model = model or settings.CLAUDE_MODEL
+
+        # Check every request before anything is written, so a rejected batch leaves no directory behind
+        lines = []
+        seen: Set[str] = set()
+        for index, item in enumerate(requests):
+            custom_id = item.get("custom_id") or f"request-{index}"
+            if custom_id in seen:
+                raise ValueError(f"Duplicate custom_id: {custom_id}")
+            seen.add(custom_id)
+
+            messages = item.get("messages")
+            if not messages:
+                prompt = item.get("prompt")
+                if not isinstance(prompt, str) or not prompt.strip():
+                    raise ValueError(f"Request {custom_id} needs non-empty messages or a prompt")
+                messages = [{"role": "user", "content": prompt}]
+            params = {
+                "model": model,
+                "max_tokens": item.get("max_tokens") or max_tokens,
+                "messages": messages
+            }
+            if item.get("system"):
+                params["system"] = item["system"]
+            lines.append(json.dumps({"custom_id": custom_id, "params": params}) + "\n")
+
+        batch_id = uuid.uuid4().hex[:16]
+        batch_dir = self.root / batch_id
+        os.makedirs(batch_dir, exist_ok=True)
+        with open(batch_dir / "requests.jsonl", "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+        batch = {
+            "batch_id": batch_id,
+            "backend": backend,
+            "provider_batch_id": None,
+            "model": model,
+            "status": "submitting",
+            "request_count": len(seen),
+            "counts": {"succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": time.time(),
+            "ended_at": None,
+            "error": None
+        }
+        self._write_batch(batch)
+        self._start(batch_id)
+
+        logger.info("Submitted batch %s with %d requests to %s backend", batch_id, len(seen), backend)
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of a batch.
+
+        Args:
+            batch_id: The ID of the batch
+
+        Returns:
+            The batch state, or None if not found
+        """
+        if not batch_id or not batch_id.isalnum():
+            return None
+        batch_path = self.root / batch_id / "batch.json"
+        if not batch_path.exists():
+            return None
+        with open(batch_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list_batches(self) -> List[Dict[str, Any]]:
+        """List all batches, newest first."""
+        if not self.root.exists():
+            return []
+        batches = [self.get_batch(path.name) for path in self.root.iterdir()]
+        return sorted([b for b in batches if b], key=lambda b: b["created_at"], reverse=True)
+
+    def read_results(self, batch_id: str, offset: int = 0, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Read results of a batch starting at a line offset.
+
+        Args:
+            batch_id: The ID of the batch
+            offset: Number of result lines to skip
+            limit: Maximum number of results to return
+
+        Returns:
+            Dictionary with the results and the next offset, or None if the batch does not exist
+        """
+        if self.get_batch(batch_id) is None:
+            return None
+
+        results = []
+        next_offset = offset
+        results_path = self.root / batch_id / "results.jsonl"
+        if results_path.exists():
+            with open(results_path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f):
+                    if line_number < offset:
+                        continue
+                    if len(results) >= limit:
+                        break
+                    results.append(json.loads(line))
+                    next_offset = line_number + 1
+        return {"results": results, "offset": offset, "next_offset": next_offset}
+
+    async def cancel(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a batch that has not finished.
+
+        Args:
+            batch_id: The ID of the batch
+
+        Returns:
+            The batch state, or None if not found
+        """
+        batch = self.get_batch(batch_id)
+        if batch is None or batch["status"] in TERMINAL_STATUSES:
+            return batch
+
+        if batch["backend"] == "anthropic" and batch["provider_batch_id"]:
+            client = self._anthropic_client()
+            await asyncio.to_thread(client.messages.batches.cancel, batch["provider_batch_id"])
+            batch["status"] = "canceling"
+        else:
+            task = self.tasks.pop(batch_id, None)
+            if task is not None:
+                task.cancel()
+            batch["status"] = "canceled"
+            batch["ended_at"] = time.time()
+        self._write_batch(batch)
+        return batch
+
+    def resume(self) -> None:
+        """Resume polling or processing of every unfinished batch on disk."""
+        for batch in self.list_batches():
+            if batch["status"] not in TERMINAL_STATUSES:
+                logger.info("Resuming batch %s (%s)", batch["batch_id"], batch["status"])
+                self._start(batch["batch_id"])
+
+    async def shutdown(self) -> None:
+        """Stop background work; unfinished batches are resumed on the next start."""
+        tasks = list(self.tasks.values())
+        self.tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, batch_id: str) -> None:
+        """Start the background task driving a batch."""
+        if batch_id not in self.tasks:
+            self.tasks[batch_id] = asyncio.create_task(self._drive(batch_id))
+
+    async def _drive(self, batch_id: str) -> None:
+        """Drive a batch to completion with its backend."""
+        try:
+            batch = self.get_batch(batch_id)
+            if batch["backend"] == "anthropic":
+                await self._drive_anthropic(batch)
+            else:
+                await self._drive_local(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Batch %s failed: %s", batch_id, e)
+            batch = self.get_batch(batch_id)
+            batch["status"] = "failed"
+            batch["error"] = str(e)
+            batch["ended_at"] = time.time()
+            self._write_batch(batch)
+        finally:
+            self.tasks.pop(batch_id, None)
+
+    async def _drive_anthropic(self, batch: Dict[str, Any]) -> None:
+        """Submit a batch to the Message Batches API, poll it and stream its results."""
+        client = self._anthropic_client()
+        batch_id = batch["batch_id"]
+
+        if not batch["provider_batch_id"]:
+            # A crash between create and the write below resubmits the batch on resume
+            requests = list(self._read_requests(batch_id))
+            created = await asyncio.to_thread(client.messages.batches.create, requests=requests)
+            batch["provider_batch_id"] = created.id
+            batch["status"] = "in_progress"
+            self._write_batch(batch)
+
+        while True:
+            remote = await asyncio.to_thread(client.messages.batches.retrieve, batch["provider_batch_id"])
+            # Re-read so a concurrent cancel() is not overwritten
+            batch = self.get_batch(batch_id)
+            if remote.processing_status == "ended":
+                break
+            if batch["status"] != "canceling":
+                batch["status"] = remote.processing_status
+            counts = remote.request_counts
+            batch["counts"] = {
+                "processing": counts.processing,
+                "succeeded": counts.succeeded,
+                "errored": counts.errored,
+                "canceled": counts.canceled,
+                "expired": counts.expired
+            }
+            self._write_batch(batch)
+            await asyncio.sleep(settings.BATCH_POLL_INTERVAL)
+
+        # Stream results into the results file, skipping any written before a restart
+        written = self._written_ids(batch_id)
+        entries = await asyncio.to_thread(client.messages.batches.results, batch["provider_batch_id"])
+        with open(self.root / batch_id / "results.jsonl", "a", encoding="utf-8") as f:
+            while True:
+                entry = await asyncio.to_thread(next, entries, None)
+                if entry is None:
+                    break
+                if entry.custom_id in written:
+                    continue
+                result = self._format_result(entry.custom_id, entry.result.type, getattr(entry.result, "message", None),
+                                             getattr(entry.result, "error", None))
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+
+        self._finish(batch)
+
+    async def _drive_local(self, batch: Dict[str, Any]) -> None:
+        """Run a batch's remaining requests through the LLM router."""
+        from ..utils.llm_client import llm_router
+
+        batch_id = batch["batch_id"]
+        batch["status"] = "in_progress"
+        self._write_batch(batch)
+
+        written = self._written_ids(batch_id)
+        semaphore = asyncio.Semaphore(settings.BATCH_LOCAL_CONCURRENCY)
+        results_file = open(self.root / batch_id / "results.jsonl", "a", encoding="utf-8")
+
+        async def run(request: Dict[str, Any]) -> None:
+            async with semaphore:
+                params = request["params"]
+                estimated_tokens = admission_controller.estimate_tokens(len(json.dumps(params["messages"])))
+                try:
+                    while True:
+                        try:
+                            async with admission_controller.admit(BATCH_TENANT, estimated_tokens):
+                                message = await llm_router.create_message(
+                                    params["messages"], enable_tools=False, route="batch",
+                                    max_tokens=params["max_tokens"], system=params.get("system"), model=params["model"]
+                                )
+                            break
+                        except RateLimitedError as e:
+                            # Batches are not interactive, so wait for capacity instead of failing the request
+                            await asyncio.sleep(max(e.retry_after, 1.0))
+                    result = self._format_result(request["custom_id"], "succeeded", message)
+                except Exception as e:
+                    result = self._format_result(request["custom_id"], "errored", error=str(e))
+                results_file.write(json.dumps(result) + "\n")
+                results_file.flush()
+
+        try:
+            await asyncio.gather(*[
+                run(request) for request in self._read_requests(batch_id)
+                if request["custom_id"] not in written
+            ])
+        finally:
+            results_file.close()
+
+        self._finish(self.get_batch(batch_id))
+
+    def _finish(self, batch: Dict[str, Any]) -> None:
+        """Count the results of a batch and mark it ended."""
+        counts = {"succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        results_path = self.root / batch["batch_id"] / "results.jsonl"
+        if results_path.exists():
+            with open(results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    status = json.loads(line)["status"]
+                    counts[status] = counts.get(status, 0) + 1
+        batch["counts"] = counts
+        batch["status"] = "canceled" if batch["status"] == "canceling" else "ended"
+        batch["ended_at"] = time.time()
+        self._write_batch(batch)
+        logger.info("Batch %s %s: %s", batch["batch_id"], batch["status"], counts)
+
+    def _format_result(self, custom_id: str, status: str, message: Any = None, error: Any = None) -> Dict[str, Any]:
+        """Build one line of the results file."""
+        result = {"custom_id": custom_id, "status": status}
+        if message is not None:
+            result["text"] = "".join(block.text for block in message.content if block.type == "text")
+            usage = getattr(message, "usage", None)
+            if usage is not None and not isinstance(usage, dict):
+                usage = {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+            result["usage"] = usage or {}
+        if error is not None:
+            if not isinstance(error, str):
+                # SDK error responses nest the message as error.error.message
+                error = getattr(getattr(error, "error", None), "message", None) or str(error)
+            result["error"] = error
+        return result
+
+    def _written_ids(self, batch_id: str) -> Set[str]:
+        """Return the custom IDs that already have a result."""
+        results_path = self.root / batch_id / "results.jsonl"
+        if not results_path.exists():
+            return set()
+        written = set()
+        with open(results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    written.add(json.loads(line)["custom_id"])
+                except (ValueError, KeyError):
+                    # A line cut short by a crash; the request is simply run again
+                    continue
+        return written
+
+    def _read_requests(self, batch_id: str):
+        """Yield the stored requests of a batch."""
+        with open(self.root / batch_id / "requests.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _anthropic_client(self):
+        """Return the shared Anthropic client."""
+        from ..utils.llm_client import llm_router
+        return llm_router.get_provider("anthropic").client
+
+    def _write_batch(self, batch: Dict[str, Any]) -> None:
+        """Atomically persist batch state."""
+        batch_dir = self.root / batch["batch_id"]
+        tmp_path = batch_dir / "batch.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(batch, f)
+        os.replace(tmp_path, batch_dir / "batch.json")
+
+
+# Create a singleton instance
+batch_manager = BatchManager()
+BATCHES_IN_PROGRESS.set_function(lambda: len(batch_manager.tasks))
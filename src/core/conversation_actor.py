@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from ..config import settings
+from ..utils.telemetry import CONVERSATION_ACTORS, CONVERSATION_QUEUE_DEPTH, CONVERSATION_TURN_WAIT
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A turn is a coroutine function reading and updating one conversation
+Turn = Callable[[], Awaitable[Any]]
+
+
+class ConversationBusyError(Exception):
+    """Raised when a conversation already has the maximum number of queued turns."""
+
+
+class ConversationActor:
+    """
+    Runs the turns of one conversation one at a time, in arrival order.
+
+    A single task consumes the conversation's queue, so every turn sees the
+    history and pending tool calls left by the turn before it. A turn whose
+    caller goes away before it starts is skipped; one already running is
+    finished, so the conversation is never left half updated.
+
+    Each turn runs in a copy of the context of the request that submitted
+    it, so its telemetry spans belong to that request's trace. The actor
+    task itself starts from an empty context and does not keep the first
+    request's context.
+    """
+
+    def __init__(self, conversation_id: str, idle_timeout: float, on_exit: Callable[["ConversationActor"], None]):
+        """
+        Initialize the actor and start its task.
+
+        Args:
+            conversation_id: The ID of the conversation
+            idle_timeout: Seconds without turns after which the task exits
+            on_exit: Called with the actor when its task exits
+        """
+        self.conversation_id = conversation_id
+        self.idle_timeout = idle_timeout
+        # [(enqueued_at, turn, context of the submitting request, future)]
+        self.queue: "asyncio.Queue[Tuple[float, Turn, contextvars.Context, asyncio.Future]]" = asyncio.Queue()
+        self.running = False
+        self.turns = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self._on_exit = on_exit
+        self.task = contextvars.Context().run(asyncio.create_task, self._run(), name=f"conversation-{conversation_id}")
+
+    def submit(self, turn: Turn) -> asyncio.Future:
+        """
+        Queue a turn.
+
+        Args:
+            turn: Coroutine function running the turn
+
+        Returns:
+            Future resolved with the turn's result or exception
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((time.monotonic(), turn, contextvars.copy_context(), future))
+        return future
+
+    async def _run(self) -> None:
+        """Run queued turns until the actor has been idle for idle_timeout seconds."""
+        try:
+            while True:
+                try:
+                    enqueued_at, turn, context, future = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # A turn may have been queued while the wait was being cancelled
+                    if self.queue.empty():
+                        return
+                    continue
+                if future.done():
+                    # The caller gave up before the turn started
+                    continue
+
+                wait = time.monotonic() - enqueued_at
+                CONVERSATION_TURN_WAIT.observe(wait)
+                self.last_wait = wait
+                self.max_wait = max(self.max_wait, wait)
+                self.turns += 1
+
+                self.running = True
+                # The turn runs as a task created in the submitting request's context
+                running = context.run(lambda: asyncio.ensure_future(turn()))
+                try:
+                    result = await running
+                except asyncio.CancelledError:
+                    running.cancel()
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    self.running = False
+        finally:
+            self._on_exit(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()[3].cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the actor's queue state."""
+        return {
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "turns": self.turns,
+            "last_wait": round(self.last_wait, 4),
+            "max_wait": round(self.max_wait, 4)
+        }
+
+
+class ConversationActors:
+    """
+    Serializes the turns of each conversation.
+
+    Every conversation with recent turns has a ConversationActor; turns of
+    different conversations run in parallel. Actors are created on the first
+    turn and reclaimed after CONVERSATION_ACTOR_IDLE_TIMEOUT seconds without
+    turns, so idle conversations cost no task.
+    """
+
+    def __init__(self):
+        """Initialize with no actors."""
+        # {conversation_id: ConversationActor}
+        self.actors: Dict[str, ConversationActor] = {}
+
+    async def run(self, conversation_id: str, turn: Turn) -> Any:
+        """
+        Run a turn after the earlier turns of its conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+            turn: Coroutine function running the turn
+
+        Returns:
+            The result of the turn
+
+        Raises:
+            ConversationBusyError: If CONVERSATION_MAX_QUEUED_TURNS turns are already waiting
+            Exception: Whatever the turn raises
+        """
+        actor = self.actors.get(conversation_id)
+        if actor is None:
+            actor = ConversationActor(conversation_id, settings.CONVERSATION_ACTOR_IDLE_TIMEOUT, self._remove)
+            self.actors[conversation_id] = actor
+        elif 0 < settings.CONVERSATION_MAX_QUEUED_TURNS <= actor.queue.qsize():
+            raise ConversationBusyError(
+                f"Conversation {conversation_id} already has {actor.queue.qsize()} turns waiting"
+            )
+        return await actor.submit(turn)
+
+    def _remove(self, actor: ConversationActor) -> None:
+        if self.actors.get(actor.conversation_id) is actor:
+            del self.actors[actor.conversation_id]
+            logger.debug("Reclaimed idle actor of conversation %s", actor.conversation_id)
+
+    def stats(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the queue state of a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            Queued turns, whether a turn is running, turns run and wait times
+            in seconds, or None if the conversation has no live actor
+        """
+        actor = self.actors.get(conversation_id)
+        return actor.stats() if actor is not None else None
+
+    def queue_depth(self) -> int:
+        """Total number of turns waiting behind an earlier turn."""
+        return sum(actor.queue.qsize() for actor in list(self.actors.values()))
+
+    async def shutdown(self) -> None:
+        """Cancel all actors and the turns they are running or holding."""
+        tasks = [actor.task for actor in self.actors.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Create a singleton instance
+conversation_actors = ConversationActors()
+
+CONVERSATION_ACTORS.set_function(lambda: len(conversation_actors.actors))
+CONVERSATION_QUEUE_DEPTH.set_function(conversation_actors.queue_depth)
@@ -1,35 +1,63 @@
+import asyncio
+import re
 import uuid
 import os
-import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Any, Optional
 from ..config import settings
+from .history import ConversationHistory, HistoryMessage
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Conversation IDs name workspace directories, so only these characters are accepted
+CONVERSATION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def is_valid_conversation_id(conversation_id: str) -> bool:
+    """
+    Check that a conversation ID is safe to use as a workspace directory name.
+    
+    Args:
+        conversation_id: The ID to check, e.g. one chosen by a client
+        
+    Returns:
+        True for IDs of 1 to 64 letters, digits, underscores and hyphens, which include UUIDs
+    """
+    return isinstance(conversation_id, str) and CONVERSATION_ID_PATTERN.fullmatch(conversation_id) is not None
+
 
 class ConversationManager:
     """
     Manages conversations and their associated workspaces.
     
     This class handles:
-    - In-memory tracking of conversation histories
+    - In-memory tracking of conversation histories (see ConversationHistory)
     - Creating and managing conversation workspaces (directories)
     - Associating tool calls with conversations
+    - Waking clients waiting for new messages of a conversation
     """
     
     def __init__(self):
         """Initialize the conversation manager."""
         # Store conversations in memory
-        # {conversation_id: [message1, message2, ...]}
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
+        # {conversation_id: ConversationHistory}
+        self.conversations: Dict[str, ConversationHistory] = {}
         
         # Store pending tool calls for each conversation
         # {conversation_id: {tool_call_id: tool_call_info}}
         self.pending_tool_calls: Dict[str, Dict[str, Any]] = {}
         
-        # Create the base workspace directory if it doesn't exist
-        os.makedirs(settings.WORKSPACE_DIR, exist_ok=True)
-        print(f"Initialized ConversationManager with workspace at {settings.WORKSPACE_DIR}", file=sys.stderr)
+        # Histories live in memory, so sequence numbers restart with the process;
+        # the epoch tells ETags of different processes apart
+        self.epoch = uuid.uuid4().hex[:12]
+        
+        # Set when a message is added, for clients waiting for new messages
+        # {conversation_id: asyncio.Event}
+        self._changed: Dict[str, asyncio.Event] = {}
+        logger.info("Initialized ConversationManager with workspace at %s", settings.WORKSPACE_DIR)
     
-    def get_conversation(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+    def get_conversation(self, conversation_id: str) -> Optional[ConversationHistory]:
         """
         Get a conversation by ID.
         
@@ -41,19 +69,27 @@ class ConversationManager:
         """
         return self.conversations.get(conversation_id)
     
-    def create_conversation(self) -> str:
+    def create_conversation(self, conversation_id: Optional[str] = None) -> str:
         """
-        Create a new conversation with a unique ID.
+        Create a new conversation.
         
+        Args:
+            conversation_id: ID to use for the conversation; a new unique ID is generated if omitted
+            
         Returns:
             The ID of the new conversation
+            
+        Raises:
+            ValueError: If the ID is not a valid conversation ID
         """
-        conversation_id = str(uuid.uuid4())
-        self.conversations[conversation_id] = []
+        conversation_id = conversation_id or str(uuid.uuid4())
+        if not is_valid_conversation_id(conversation_id):
+            raise ValueError(f"Invalid conversation ID: {conversation_id!r}")
+        self.conversations[conversation_id] = ConversationHistory()
         self._create_workspace(conversation_id)
         return conversation_id
     
-    def add_message(self, conversation_id: str, message: Dict[str, Any]) -> None:
+    def add_message(self, conversation_id: str, message: HistoryMessage) -> None:
         """
         Add a message to a conversation.
         
@@ -62,9 +98,37 @@ class ConversationManager:
             message: The message to add
         """
         if conversation_id not in self.conversations:
-            self.create_conversation()
+            self.create_conversation(conversation_id)
         
         self.conversations[conversation_id].append(message)
+        
+        changed = self._changed.pop(conversation_id, None)
+        if changed is not None:
+            changed.set()
+    
+    async def wait_for_messages(self, conversation_id: str, after: int, timeout: float) -> bool:
+        """
+        Wait until a conversation has messages after a sequence number.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            after: Sequence number of the last message already seen
+            timeout: Longest time to wait in seconds
+            
+        Returns:
+            True if there are later messages, False if the wait timed out
+        """
+        history = self.conversations.get(conversation_id)
+        while history is not None and history.seq <= after:
+            changed = self._changed.get(conversation_id)
+            if changed is None:
+                changed = self._changed[conversation_id] = asyncio.Event()
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+            history = self.conversations.get(conversation_id)
+        return True
     
     def add_pending_tool_call(self, conversation_id: str, tool_call_id: str, tool_call: Dict[str, Any]) -> None:
         """
@@ -113,7 +177,12 @@ class ConversationManager:
             
         Returns:
             Path to the workspace directory
+            
+        Raises:
+            ValueError: If the ID is not a valid conversation ID, so it cannot point outside WORKSPACE_DIR
         """
+        if not is_valid_conversation_id(conversation_id):
+            raise ValueError(f"Invalid conversation ID: {conversation_id!r}")
         return settings.WORKSPACE_DIR / conversation_id
     
     def _create_workspace(self, conversation_id: str) -> Path:
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
+from ..config import settings
+from ..utils.telemetry import WEBSOCKET_SLOW_CONSUMERS
+
+
+class Subscription:
+    """A subscriber's bounded queue of events."""
+
+    __slots__ = ("queue", "overflowed")
+
+    def __init__(self, max_queued: int):
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(max_queued)
+        # Set when an event could not be queued; the subscriber must resume from its last sequence number
+        self.overflowed = False
+
+
+class EventLog:
+    """
+    Numbered events of one conversation, kept for replay.
+
+    Every event gets the next sequence number and is kept in a bounded
+    buffer, so a client that reconnects can ask for the events after the
+    last one it saw. Subscribers get new events through a bounded queue; a
+    subscriber that falls behind is marked overflowed instead of slowing
+    down the conversation, and is expected to reconnect and resume.
+    """
+
+    def __init__(self, max_events: int):
+        """
+        Initialize the log.
+
+        Args:
+            max_events: Number of events kept for replay
+        """
+        self.seq = 0
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        # Sequence number of the newest event pushed out of the buffer
+        self.evicted_seq = 0
+        self.subscribers: List[Subscription] = []
+        # monotonic time of the last event or subscription change
+        self.last_active = time.monotonic()
+
+    @property
+    def idle_for(self) -> float:
+        """Seconds the log has had no subscribers and no new events, or 0 while subscribed."""
+        return 0.0 if self.subscribers else time.monotonic() - self.last_active
+
+    def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Number an event, keep it and hand it to the subscribers.
+
+        Args:
+            event: The event; a "seq" key is added
+
+        Returns:
+            The event with its sequence number
+        """
+        self.seq += 1
+        self.last_active = time.monotonic()
+        event["seq"] = self.seq
+        if self.events and len(self.events) == self.events.maxlen:
+            self.evicted_seq = self.events[0]["seq"]
+        self.events.append(event)
+        for subscription in self.subscribers:
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                WEBSOCKET_SLOW_CONSUMERS.inc()
+        return event
+
+    def compact(self, event_type: str, turn_id: Any) -> None:
+        """
+        Drop kept events of a type belonging to a turn, e.g. the streamed
+        deltas of a turn whose final message has been published. Unlike
+        events pushed out of the buffer, these are not reported as a gap.
+
+        Args:
+            event_type: Type of the events to drop
+            turn_id: The "id" of the turn the events belong to
+        """
+        kept = [event for event in self.events if event["type"] != event_type or event.get("id") != turn_id]
+        if len(kept) != len(self.events):
+            self.events = deque(kept, maxlen=self.events.maxlen)
+
+    def subscribe(self, after: Optional[int], max_queued: int) -> Tuple[List[Dict[str, Any]], bool, Subscription]:
+        """
+        Subscribe to new events and get the kept ones to replay.
+
+        Args:
+            after: Sequence number of the last event the subscriber saw, or None for none
+            max_queued: Maximum number of events queued for the subscriber
+
+        Returns:
+            Tuple of (events after ``after`` to replay, whether events between
+            ``after`` and the replayed ones were dropped, the subscription)
+        """
+        after = after or 0
+        replay = [event for event in self.events if event["seq"] > after]
+        # Events were dropped, or the subscriber saw events of an earlier server process
+        gap = after < self.evicted_seq or after > self.seq
+        subscription = Subscription(max_queued)
+        self.subscribers.append(subscription)
+        self.last_active = time.monotonic()
+        return replay, gap, subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Stop handing events to a subscriber.
+
+        Args:
+            subscription: The subscription from subscribe
+        """
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+        self.last_active = time.monotonic()
+
+
+class ConversationEvents:
+    """
+    Event logs of conversations, created on first use.
+
+    A log with no subscribers and no new events for idle_timeout seconds
+    is dropped, so logs do not pile up for every conversation ever opened.
+    A client resuming from a dropped log is told about the gap and reloads
+    the conversation.
+    """
+
+    # Seconds between sweeps for idle logs, at most
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, idle_timeout: float):
+        """
+        Initialize with no logs.
+
+        Args:
+            idle_timeout: Seconds an unsubscribed log is kept without new events
+        """
+        self.idle_timeout = idle_timeout
+        # {conversation_id: EventLog}
+        self.logs: Dict[str, EventLog] = {}
+        self._swept_at = time.monotonic()
+
+    def get(self, conversation_id: str) -> EventLog:
+        """
+        Get the event log of a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            The conversation's event log
+        """
+        self._sweep()
+        log = self.logs.get(conversation_id)
+        if log is None:
+            log = self.logs[conversation_id] = EventLog(settings.WEBSOCKET_EVENT_BUFFER)
+        return log
+
+    def _sweep(self) -> None:
+        """Drop the logs that have been idle for idle_timeout seconds."""
+        now = time.monotonic()
+        if now - self._swept_at < min(self.SWEEP_INTERVAL, self.idle_timeout):
+            return
+        self._swept_at = now
+        for conversation_id in [cid for cid, log in self.logs.items() if log.idle_for >= self.idle_timeout]:
+            del self.logs[conversation_id]
+
+
+# Create a singleton instance
+conversation_events = ConversationEvents(settings.WEBSOCKET_EVENT_LOG_IDLE_TIMEOUT)
@@ -0,0 +1,185 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# A message's content: plain text, or a tuple of content blocks
+Content = Union[str, Tuple[Dict[str, Any], ...]]
+
+# Bytes an image counts as when sizing a request: its base64 data is far
+# larger than the ~1,600 tokens a model-sized image costs, at 4 bytes a token
+IMAGE_SIZE = 6400
+
+
+class HistoryMessage:
+    """
+    One message of a conversation in Anthropic's message format.
+
+    Messages are never changed once added to a conversation. Their API form
+    and compact JSON encoding are built on first use and reused by every
+    later model call that resends them.
+    """
+
+    __slots__ = ("role", "content", "_payload", "_encoded", "_size")
+
+    def __init__(self, role: str, content: Union[str, Iterable[Dict[str, Any]]]):
+        """
+        Initialize a message.
+
+        Args:
+            role: "user" or "assistant"
+            content: Text, or content blocks (text, tool_use or tool_result)
+        """
+        self.role = role
+        self.content: Content = content if isinstance(content, str) else tuple(content)
+        self._payload: Optional[Dict[str, Any]] = None
+        self._encoded: Optional[bytes] = None
+        self._size: Optional[int] = None
+
+    @classmethod
+    def from_response(cls, response: Any) -> "HistoryMessage":
+        """
+        Build the assistant message of a model response.
+
+        Text and tool_use blocks are kept, so tool results sent later refer
+        to tool calls the model can see. A response with text only is stored
+        as a string.
+
+        Args:
+            response: Model response with Anthropic-shaped content blocks
+
+        Returns:
+            The assistant message
+        """
+        blocks = []
+        for block in response.content:
+            if block.type == "text" and block.text:
+                blocks.append({"type": "text", "text": block.text})
+            elif block.type == "tool_use":
+                blocks.append({"type": "tool_use", "id": block.id, "name": block.name, "input": block.input})
+        if all(block["type"] == "text" for block in blocks):
+            return cls("assistant", "".join(block["text"] for block in blocks))
+        return cls("assistant", blocks)
+
+    @property
+    def text(self) -> str:
+        """The text of the message, without tool blocks."""
+        if isinstance(self.content, str):
+            return self.content
+        return "".join(block["text"] for block in self.content if block["type"] == "text")
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        """The message as sent to the model; shared, so callers must not modify it."""
+        if self._payload is None:
+            content = self.content if isinstance(self.content, str) else list(self.content)
+            self._payload = {"role": self.role, "content": content}
+        return self._payload
+
+    @property
+    def encoded(self) -> bytes:
+        """The message as compact UTF-8 JSON."""
+        if self._encoded is None:
+            self._encoded = json.dumps(
+                self.payload, separators=(",", ":"), ensure_ascii=False, default=str
+            ).encode("utf-8")
+        return self._encoded
+
+    @property
+    def size(self) -> int:
+        """Size of the encoded message, with each image counted as IMAGE_SIZE bytes instead of its data."""
+        if self._size is None:
+            size = len(self.encoded)
+            if not isinstance(self.content, str):
+                for block in self.content:
+                    # Images are sent on their own or in tool results
+                    nested = block.get("content") if block["type"] == "tool_result" else None
+                    for image in (nested if isinstance(nested, list) else [block]):
+                        if image.get("type") == "image" and image["source"].get("type") == "base64":
+                            size += IMAGE_SIZE - len(image["source"]["data"])
+            self._size = size
+        return self._size
+
+
+class ConversationHistory:
+    """
+    The messages of a conversation.
+
+    Keeps the API form of every message and the total size of their
+    encodings alongside the messages, so building the request for the next
+    turn only costs the new messages, not the whole conversation.
+    """
+
+    __slots__ = ("messages", "_payloads", "encoded_size")
+
+    def __init__(self):
+        """Initialize an empty history."""
+        self.messages: List[HistoryMessage] = []
+        self._payloads: List[Dict[str, Any]] = []
+        # Size in bytes of the encoded messages, without separators; see HistoryMessage.size
+        self.encoded_size = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[HistoryMessage]:
+        return iter(self.messages)
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last message; messages are numbered from 1 in the order they were added."""
+        return len(self.messages)
+
+    @property
+    def last_role(self) -> Optional[str]:
+        """Role of the last message, or None if the history is empty."""
+        return self.messages[-1].role if self.messages else None
+
+    def append(self, message: HistoryMessage) -> None:
+        """
+        Add a message to the end of the history.
+
+        Args:
+            message: The message to add
+        """
+        self.messages.append(message)
+        self._payloads.append(message.payload)
+        self.encoded_size += message.size
+
+    def since(self, seq: int) -> List[HistoryMessage]:
+        """
+        Get the messages added after a sequence number.
+
+        Args:
+            seq: Sequence number of the last message already seen, 0 for none
+
+        Returns:
+            The later messages, oldest first
+        """
+        return self.messages[max(seq, 0):]
+
+    def payload(self, new_messages: List[HistoryMessage] = ()) -> List[Dict[str, Any]]:
+        """
+        Build the messages to send to the model.
+
+        Args:
+            new_messages: Messages to send after the history, not added to it
+
+        Returns:
+            List of messages in Anthropic's message format
+        """
+        return self._payloads + [message.payload for message in new_messages]
+
+    def size_with(self, new_messages: List[HistoryMessage] = ()) -> int:
+        """
+        Get the size of the JSON messages array sent to the model, for
+        estimating its tokens; images count as IMAGE_SIZE bytes.
+
+        Args:
+            new_messages: Messages to send after the history
+
+        Returns:
+            Size in bytes of the encoded messages array
+        """
+        count = len(self.messages) + len(new_messages)
+        size = self.encoded_size + sum(message.size for message in new_messages)
+        # Brackets and the commas between messages
+        return size + max(count - 1, 0) + 2
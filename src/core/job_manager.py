@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import uuid
+import shlex
+import signal
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from .conversation_manager import conversation_manager
+from ..utils.telemetry import SUBPROCESS_SPAWNS, JOBS_RUNNING
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobManager:
+    """
+    Manages detached long-running commands for conversations.
+
+    Each job gets a directory under ``<workspace>/.jobs/<job_id>/`` holding:
+    - ``job.json``: the job metadata (command, pid, status, timestamps)
+    - ``output.log``: combined stdout and stderr of the command
+    - ``exit_code``: written by the wrapper shell when the command finishes
+
+    Because all state lives in the workspace, jobs can be polled and cancelled
+    after a client reconnects or the server restarts.
+    """
+
+    JOBS_DIR = ".jobs"
+
+    # Maximum number of output bytes returned by a single tail call
+    MAX_TAIL_BYTES = 64 * 1024
+
+    def __init__(self):
+        """Initialize the job manager."""
+        # Process handles for jobs started by this server process, used to
+        # reap finished children
+        # {job_id: Popen}
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def start_job(self, conversation_id: str, command: str) -> Dict[str, Any]:
+        """
+        Start a command detached from the request and return immediately.
+
+        Args:
+            conversation_id: The ID of the conversation
+            command: The shell command to run in the conversation workspace
+
+        Returns:
+            The job metadata
+        """
+        workspace_path = conversation_manager.get_workspace_path(conversation_id)
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self._jobs_root(conversation_id) / job_id
+        os.makedirs(job_dir, exist_ok=True)
+
+        exit_path = job_dir / "exit_code"
+        output_path = job_dir / "output.log"
+
+        # The wrapper records the exit status on disk so it survives restarts;
+        # the subshell keeps an explicit `exit` in the command from skipping it
+        wrapper = f"(\n{command}\n)\nprintf '%s' \"$?\" > {shlex.quote(str(exit_path))}"
+
+        with open(output_path, "wb") as output_file:
+            SUBPROCESS_SPAWNS.inc(source="job")
+            process = subprocess.Popen(
+                ["/bin/bash", "-c", wrapper],
+                cwd=str(workspace_path),
+                stdin=subprocess.DEVNULL,
+                stdout=output_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        self.processes[job_id] = process
+
+        job = {
+            "job_id": job_id,
+            "conversation_id": conversation_id,
+            "command": command,
+            "pid": process.pid,
+            # Identifies the process behind the pid, which the kernel may reuse
+            # once the job has exited and the server restarted
+            "pid_start_time": self._start_time(process.pid),
+            "status": "running",
+            "exit_code": None,
+            "started_at": time.time(),
+            "finished_at": None
+        }
+        self._write_job(conversation_id, job)
+
+        logger.info("Started job %s (pid %d) for %s: %s", job_id, process.pid, conversation_id, command)
+        return job
+
+    def get_job(self, conversation_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a job.
+
+        Args:
+            conversation_id: The ID of the conversation
+            job_id: The ID of the job
+
+        Returns:
+            The job metadata with an up-to-date status, or None if not found
+        """
+        job = self._read_job(conversation_id, job_id)
+        if job is None:
+            return None
+        return self._refresh(conversation_id, job)
+
+    def list_jobs(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        List all jobs of a conversation, oldest first.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            List of job metadata dictionaries
+        """
+        jobs_root = self._jobs_root(conversation_id)
+        if not jobs_root.exists():
+            return []
+
+        jobs = []
+        for job_dir in jobs_root.iterdir():
+            job = self.get_job(conversation_id, job_dir.name)
+            if job is not None:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job["started_at"])
+
+    def read_output(self, conversation_id: str, job_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read job output starting at a byte offset.
+
+        Args:
+            conversation_id: The ID of the conversation
+            job_id: The ID of the job
+            offset: Byte offset to start reading from
+            limit: Maximum number of bytes to read
+
+        Returns:
+            Dictionary with the output text, the next offset and the total size,
+            or None if the job does not exist
+        """
+        if self._read_job(conversation_id, job_id) is None:
+            return None
+
+        limit = min(limit or self.MAX_TAIL_BYTES, self.MAX_TAIL_BYTES)
+        output_path = self._jobs_root(conversation_id) / job_id / "output.log"
+        if not output_path.exists():
+            return {"output": "", "offset": offset, "next_offset": offset, "size": 0}
+
+        size = output_path.stat().st_size
+        offset = max(0, min(offset, size))
+        with open(output_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(limit)
+
+        return {
+            "output": data.decode("utf-8", errors="replace"),
+            "offset": offset,
+            "next_offset": offset + len(data),
+            "size": size
+        }
+
+    def cancel_job(self, conversation_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a running job by terminating its process group.
+
+        This blocks for up to a few seconds while the group exits, so async
+        callers should run it in a thread.
+
+        Args:
+            conversation_id: The ID of the conversation
+            job_id: The ID of the job
+
+        Returns:
+            The updated job metadata, or None if not found
+        """
+        job = self.get_job(conversation_id, job_id)
+        if job is None or job["status"] != "running":
+            return job
+
+        process = self.processes.pop(job_id, None)
+        # A pid read from disk after a restart may belong to an unrelated
+        # process by now, so only signal the group if it is still the job
+        if process is not None or self._is_job_process(job):
+            try:
+                os.killpg(job["pid"], signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            except OSError as e:
+                logger.error("Error cancelling job %s: %s", job_id, e)
+
+        if process is not None:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                try:
+                    os.killpg(job["pid"], signal.SIGKILL)
+                except ProcessLookupError:
+                    # The group exited between the wait and the kill
+                    pass
+                except OSError as e:
+                    logger.error("Error killing job %s: %s", job_id, e)
+                    process.kill()
+                process.wait()
+
+        job["status"] = "cancelled"
+        job["finished_at"] = time.time()
+        self._write_job(conversation_id, job)
+
+        logger.info("Cancelled job %s for %s", job_id, conversation_id)
+        return job
+
+    def _refresh(self, conversation_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Update the status of a running job from the process and exit code file."""
+        if job["status"] != "running":
+            return job
+
+        job_id = job["job_id"]
+        process = self.processes.get(job_id)
+        if process is not None and process.poll() is not None:
+            # Reap the finished child
+            del self.processes[job_id]
+
+        exit_path = self._jobs_root(conversation_id) / job_id / "exit_code"
+        if exit_path.exists():
+            try:
+                exit_code = int(exit_path.read_text().strip())
+            except ValueError:
+                exit_code = -1
+            job["exit_code"] = exit_code
+            job["status"] = "completed" if exit_code == 0 else "failed"
+        elif not self._is_job_process(job):
+            # The process went away without recording an exit status,
+            # e.g. it was killed externally
+            job["status"] = "lost"
+        else:
+            return job
+
+        job["finished_at"] = time.time()
+        self._write_job(conversation_id, job)
+        return job
+
+    def _is_job_process(self, job: Dict[str, Any]) -> bool:
+        """Return True if the job's pid is alive and still belongs to the job."""
+        if not self._pid_alive(job["pid"]):
+            return False
+        expected = job.get("pid_start_time")
+        if expected is None:
+            # Jobs written before start times were recorded, or no /proc
+            return True
+        return self._start_time(job["pid"]) == expected
+
+    def _start_time(self, pid: int) -> Optional[int]:
+        """Get the start time of a process in clock ticks since boot, or None if unknown."""
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # The command name in field 2 may contain spaces and parentheses, so
+        # count fields from its closing parenthesis; starttime is field 22
+        try:
+            return int(stat[stat.rindex(b")") + 2:].split()[19])
+        except (ValueError, IndexError):
+            return None
+
+    def _pid_alive(self, pid: int) -> bool:
+        """Return True if a process with this ID exists."""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _jobs_root(self, conversation_id: str) -> Path:
+        """Get the directory holding all jobs of a conversation."""
+        return conversation_manager.get_workspace_path(conversation_id) / self.JOBS_DIR
+
+    def _read_job(self, conversation_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Load job metadata from the workspace."""
+        # Job IDs are used as directory names, so reject anything path-like
+        if not job_id or not job_id.isalnum():
+            return None
+        job_path = self._jobs_root(conversation_id) / job_id / "job.json"
+        if not job_path.exists():
+            return None
+        with open(job_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_job(self, conversation_id: str, job: Dict[str, Any]) -> None:
+        """Atomically persist job metadata to the workspace."""
+        job_dir = self._jobs_root(conversation_id) / job["job_id"]
+        tmp_path = job_dir / "job.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, job_dir / "job.json")
+
+
+# Create a singleton instance
+job_manager = JobManager()
+JOBS_RUNNING.set_function(lambda: sum(1 for process in list(job_manager.processes.values()) if process.poll() is None))
@@ -1,20 +1,31 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import uvicorn
-import sys
+import asyncio
 import os
+import sys
 
-from .api import chat
+from .api import chat, jobs, batches, traces, tools, websocket
 from .config import settings
 from .utils import tool_registry  # Import tool registry to ensure tools are initialized
+from .utils.tools import tool_dispatcher
+from .utils.tools.browser_pool import browser_pool
 from .core import conversation_manager  # Import conversation manager to ensure it's initialized
+from .core.admission_control import admission_controller
+from .core.batch_manager import batch_manager
+from .core.conversation_actor import conversation_actors
+from .utils.telemetry import metrics, TelemetryMiddleware
+from .utils.serialization import FastJSONResponse
+from .utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
     title="Agentic AI Chat API",
     description="Backend API for Agentic AI Chat application",
     version="0.3.0",  # Updated version for Phase 3
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -26,16 +37,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record request metrics and open the root span of each request's trace
+app.add_middleware(TelemetryMiddleware)
+
 # Include routers
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(websocket.router, prefix="/api", tags=["chat"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
+app.include_router(batches.router, prefix="/api", tags=["batches"])
+app.include_router(traces.router, prefix="/api", tags=["telemetry"])
+app.include_router(tools.router, prefix="/api", tags=["tools"])
+
+# Background task reloading changed tool modules, if enabled
+tool_watcher = None
+
+
+@app.on_event("startup")
+async def resume_batches():
+    """Resume polling of batches left unfinished by a previous run."""
+    batch_manager.resume()
+
+
+@app.on_event("startup")
+async def watch_tools():
+    """Start reloading changed tool modules if TOOL_RELOAD_INTERVAL is set."""
+    global tool_watcher
+    if settings.TOOL_RELOAD_INTERVAL > 0:
+        tool_watcher = asyncio.create_task(tool_registry.watch(settings.TOOL_RELOAD_INTERVAL))
+
+
+@app.on_event("shutdown")
+async def stop_batches():
+    """Stop batch polling; unfinished batches resume on the next start."""
+    await batch_manager.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_conversations():
+    """Stop the conversation turn actors."""
+    await conversation_actors.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_tools():
+    """Stop the tool reload task, the tool executor pools, the search and research threads and the shared browser."""
+    if tool_watcher is not None:
+        tool_watcher.cancel()
+    tool_dispatcher.shutdown()
+    # The search and research modules are loaded by the first tool call using them; only those loaded have threads
+    search = sys.modules.get(f"{__package__}.utils.search")
+    if search is not None:
+        search.search_service.shutdown()
+    research = sys.modules.get(f"{__package__}.utils.research")
+    if research is not None:
+        research.research_pipeline.shutdown()
+    await browser_pool.close()
 
 # Mount static files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
-    print(f"Mounted static files from {static_dir}", file=sys.stderr)
+    logger.info("Mounted static files from %s", static_dir)
 else:
-    print(f"Warning: Static directory not found at {static_dir}", file=sys.stderr)
+    logger.warning("Static directory not found at %s", static_dir)
 
 # Serve the main HTML page
 @app.get("/", tags=["frontend"])
@@ -54,15 +118,27 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "registered_tools": [tool.name for tool in tool_registry.get_all_tools()]
+        "registered_tools": tool_registry.get_tool_names(),
+        "admission": admission_controller.stats(),
+        "conversation_actors": len(conversation_actors.actors)
     }
 
 
+# Prometheus scrape endpoint
+@app.get("/metrics", tags=["telemetry"])
+async def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    from fastapi.responses import PlainTextResponse
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 def start():
     """Start the FastAPI application using uvicorn server."""
-    print(f"Starting Agentic AI Chat API on {settings.API_HOST}:{settings.API_PORT}", file=sys.stderr)
-    print(f"Available tools: {[tool.name for tool in tool_registry.get_all_tools()]}", file=sys.stderr)
-    print(f"Frontend available at http://{settings.API_HOST}:{settings.API_PORT}/", file=sys.stderr)
+    import uvicorn
+    
+    logger.info("Starting Agentic AI Chat API on %s:%s", settings.API_HOST, settings.API_PORT)
+    logger.info("Available tools: %s", tool_registry.get_tool_names())
+    logger.info("Frontend available at http://%s:%s/", settings.API_HOST, settings.API_PORT)
     uvicorn.run(
         "src.main:app",
         host=settings.API_HOST,
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal, Union
+
+
+class BatchItem(BaseModel):
+    """Model for a single prompt in a batch."""
+    custom_id: Optional[str] = Field(None, description="Caller-chosen ID used to match results (default: request-<index>)")
+    prompt: Optional[str] = Field(None, description="Single user prompt")
+    messages: Optional[List[Dict[str, Any]]] = Field(None, description="Full message list, used instead of prompt")
+    system: Optional[Union[str, List[Dict[str, Any]]]] = Field(None, description="Optional system prompt, as text or text blocks")
+    max_tokens: Optional[int] = Field(None, description="Maximum output tokens for this request")
+
+
+class BatchRequest(BaseModel):
+    """Model for submitting a batch."""
+    requests: List[BatchItem] = Field(..., description="Prompts to run")
+    model: Optional[str] = Field(None, description="Model to use (default: CLAUDE_MODEL)")
+    max_tokens: int = Field(1024, description="Default maximum output tokens per request")
+    backend: Optional[Literal["anthropic", "local"]] = Field(None, description="Batch backend (default: BATCH_BACKEND)")
+
+
+class Batch(BaseModel):
+    """Model for the state of a batch."""
+    batch_id: str = Field(..., description="ID of the batch")
+    backend: str = Field(..., description="Backend running the batch")
+    provider_batch_id: Optional[str] = Field(None, description="ID assigned by the Message Batches API")
+    model: str = Field(..., description="Model used")
+    status: str = Field(..., description="submitting, in_progress, canceling, ended, canceled or failed")
+    request_count: int = Field(..., description="Number of requests in the batch")
+    counts: Dict[str, int] = Field(..., description="Result counts by status")
+    created_at: float = Field(..., description="Creation time as a UNIX timestamp")
+    ended_at: Optional[float] = Field(None, description="End time as a UNIX timestamp")
+    error: Optional[str] = Field(None, description="Error that stopped the batch, if any")
+
+
+class BatchResults(BaseModel):
+    """Model for a page of batch results."""
+    results: List[Dict[str, Any]] = Field(..., description="Results with custom_id, status, text, usage and error")
+    offset: int = Field(..., description="Line offset the page starts at")
+    next_offset: int = Field(..., description="Offset to pass on the next read")
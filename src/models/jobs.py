@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+
+
+class JobRequest(BaseModel):
+    """Model for starting a background job."""
+    command: str = Field(..., description="Command to run in the conversation workspace")
+
+
+class Job(BaseModel):
+    """Model for a background job."""
+    job_id: str = Field(..., description="ID of the job")
+    conversation_id: str = Field(..., description="ID of the conversation the job belongs to")
+    command: str = Field(..., description="Command being run")
+    pid: int = Field(..., description="Process ID of the job")
+    status: Literal["running", "completed", "failed", "cancelled", "lost"] = Field(..., description="Current status of the job")
+    exit_code: Optional[int] = Field(None, description="Exit code once the job has finished")
+    started_at: float = Field(..., description="Start time as a UNIX timestamp")
+    finished_at: Optional[float] = Field(None, description="Finish time as a UNIX timestamp")
+
+
+class JobOutput(BaseModel):
+    """Model for a slice of job output."""
+    output: str = Field(..., description="Output read from the offset")
+    offset: int = Field(..., description="Byte offset the output starts at")
+    next_offset: int = Field(..., description="Byte offset to pass on the next read")
+    size: int = Field(..., description="Total size of the output in bytes")
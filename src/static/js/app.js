@@ -62,6 +62,9 @@ class App {
             this.updateStatus('sending');
             const response = await apiClient.sendMessage(message, this.conversationId);
             
+            // The server answers tool calls left pending by a new message as errors
+            toolHandler.clearToolCalls();
+            
             // Update conversation ID
             if (response.conversation_id) {
                 this.conversationId = response.conversation_id;
@@ -9,6 +9,8 @@ class ToolHandler {
         }
         
         this.pendingToolCalls = new Map();
+        // Results entered so far; they are sent together once every pending call has one
+        this.readyResults = new Map();
     }
     
     /**
@@ -73,7 +75,7 @@ class ToolHandler {
     }
     
     /**
-     * Handle submitting a tool result
+     * Handle entering a tool result; the results are sent once every pending call has one
      * 
      * @param {string} toolCallId - The ID of the tool call
      */
@@ -93,35 +95,57 @@ class ToolHandler {
             return;
         }
         
+        // Hold the result until every pending call has one
+        this.readyResults.set(toolCallId, resultValue);
+        resultInput.disabled = true;
+        const submitButton = document.querySelector(`.submit-result[data-tool-id="${toolCallId}"]`);
+        submitButton.disabled = true;
+        if (this.readyResults.size < this.pendingToolCalls.size) {
+            submitButton.textContent = 'Waiting for the other results...';
+            return;
+        }
+        
+        await this.submitResults(toolCall.conversationId);
+    }
+    
+    /**
+     * Send the results of all pending tool calls in one request
+     * 
+     * @param {string} conversationId - The conversation ID
+     */
+    async submitResults(conversationId) {
+        const results = Array.from(this.readyResults, ([toolCallId, result]) => ({
+            tool_call_id: toolCallId,
+            result
+        }));
+        const submitButtons = results.map(
+            ({ tool_call_id }) => document.querySelector(`.submit-result[data-tool-id="${tool_call_id}"]`)
+        );
+        
         try {
             // Update UI to show loading state
-            const submitButton = document.querySelector(`.submit-result[data-tool-id="${toolCallId}"]`);
-            submitButton.textContent = 'Submitting...';
-            submitButton.disabled = true;
+            submitButtons.forEach(button => {
+                button.textContent = 'Submitting...';
+            });
             
-            // Send the result to the API
-            const response = await apiClient.sendToolResults(toolCall.conversationId, [
-                {
-                    tool_call_id: toolCallId,
-                    result: resultValue
-                }
-            ]);
+            // Send the results to the API
+            const response = await apiClient.sendToolResults(conversationId, results);
             
-            // Display the result in the UI
-            resultContainer.innerHTML = `
-                <div class="tool-result">
-                    <strong>Result:</strong>
-                    <pre>${resultValue}</pre>
-                </div>
-            `;
-            
-            // Remove the pending tool call
-            this.pendingToolCalls.delete(toolCallId);
+            // Display the results in the UI
+            results.forEach(({ tool_call_id, result }) => {
+                document.querySelector(`#result-${tool_call_id}`).innerHTML = `
+                    <div class="tool-result">
+                        <strong>Result:</strong>
+                        <pre>${result}</pre>
+                    </div>
+                `;
+            });
+            submitButtons.forEach(button => button.remove());
             
-            // If there are no more pending tool calls, hide the tool section
-            if (this.pendingToolCalls.size === 0) {
-                this.hideToolSection();
-            }
+            // All pending tool calls are answered
+            this.pendingToolCalls.clear();
+            this.readyResults.clear();
+            this.hideToolSection();
             
             // Process the response message
             if (response.message) {
@@ -134,13 +158,18 @@ class ToolHandler {
             }
             
         } catch (error) {
-            console.error('Error submitting tool result:', error);
-            alert(`Error submitting result: ${error.message}`);
+            console.error('Error submitting tool results:', error);
+            alert(`Error submitting results: ${error.message}`);
             
-            // Restore the UI state
-            const submitButton = document.querySelector(`.submit-result[data-tool-id="${toolCallId}"]`);
-            submitButton.textContent = 'Submit Result';
-            submitButton.disabled = false;
+            // Restore the UI state so the results can be sent again
+            this.readyResults.clear();
+            results.forEach(({ tool_call_id }) => {
+                document.querySelector(`#result-${tool_call_id} .tool-result-input`).disabled = false;
+            });
+            submitButtons.forEach(button => {
+                button.textContent = 'Submit Result';
+                button.disabled = false;
+            });
         }
     }
     
@@ -173,6 +202,7 @@ class ToolHandler {
     clearToolCalls() {
         this.container.innerHTML = '';
         this.pendingToolCalls.clear();
+        this.readyResults.clear();
         this.hideToolSection();
     }
 }
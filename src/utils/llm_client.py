@@ -1,67 +1,566 @@
-from anthropic import Anthropic
-from typing import List, Dict, Any, Optional
-import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Union
+import asyncio
+import json
+import time
 import sys
 from ..config import settings
 from .tools import tool_registry
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError,
+    is_retryable, get_status_code, get_retry_after, backoff_delay, hedged
+)
+from .telemetry import (
+    tracer, usage_tokens, LLM_REQUEST_DURATION, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS, LLM_ERRORS
+)
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# tools/ lives at the repository root next to src/
+_REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.append(str(_REPO_ROOT))
+
+
+def system_text(system: Union[str, List[Dict[str, Any]]]) -> str:
+    """Flatten a system prompt given as text blocks for providers that take a single string."""
+    if isinstance(system, str):
+        return system
+    return "\n\n".join(block["text"] for block in system if block.get("type") == "text")
+
+
+class ContentBlock:
+    """A content block of a model response, shaped like Anthropic's blocks."""
+
+    def __init__(self, type: str, text: str = "", id: Optional[str] = None,
+                 name: Optional[str] = None, input: Optional[Dict[str, Any]] = None):
+        self.type = type
+        self.text = text
+        self.id = id
+        self.name = name
+        self.input = input or {}
+
+
+class LLMResponse:
+    """A provider-independent model response, shaped like Anthropic's Message."""
+
+    def __init__(self, content: List[ContentBlock], model: str, stop_reason: Optional[str] = None,
+                 usage: Optional[Dict[str, int]] = None):
+        self.content = content
+        self.model = model
+        self.stop_reason = stop_reason
+        self.usage = usage or {}
+
+
+class LLMProvider(ABC):
+    """
+    Base class for LLM providers.
+
+    Providers accept conversation history in Anthropic's message format
+    (text, tool_use and tool_result blocks) and return responses with
+    Anthropic-shaped content blocks, so the chat handlers do not depend on
+    the provider that served a turn.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the provider.
+
+        Args:
+            name: Provider name as understood by tools/llm_api.py
+        """
+        self.name = name
+        self._client = None
+
+    @property
+    def client(self):
+        """The SDK client, created on first use and shared afterwards."""
+        if self._client is None:
+            from tools import llm_api
+            client = llm_api.get_llm_client(self.name)
+            # Retries are handled by the router, so SDK-level retries would
+            # only multiply attempts and hide errors from the circuit breaker
+            if hasattr(client, "with_options"):
+                client = client.with_options(max_retries=0)
+            self._client = client
+            logger.info("Initialized %s client", self.name)
+        return self._client
+
+    @abstractmethod
+    def create_message(self, model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]],
+                       max_tokens: int, temperature: float, timeout: Optional[float] = None,
+                       on_delta: Optional[Callable[[str], None]] = None,
+                       system: Optional[Union[str, List[Dict[str, Any]]]] = None) -> Any:
+        """
+        Send a conversation to the model.
+
+        Args:
+            model: Model name
+            messages: Conversation history in Anthropic message format
+            tools: Tool schemas with name, description and input_schema, or None
+            max_tokens: Maximum number of output tokens
+            temperature: Sampling temperature
+            timeout: Request timeout in seconds
+            on_delta: Called from the calling thread with each piece of output
+                text as it arrives, by providers that stream; others ignore it
+            system: System prompt as a string or a list of text blocks
+
+        Returns:
+            A response with Anthropic-shaped content blocks
+        """
+        pass
+
+
+class AnthropicProvider(LLMProvider):
+    """Provider for Anthropic's Messages API."""
+
+    def create_message(self, model, messages, tools, max_tokens, temperature, timeout=None, on_delta=None, system=None):
+        kwargs = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if system:
+            kwargs["system"] = system
+        if tools:
+            kwargs["tools"] = tools
+        if timeout:
+            kwargs["timeout"] = timeout
+        if on_delta is None:
+            return self.client.messages.create(**kwargs)
+
+        with self.client.messages.stream(**kwargs) as stream:
+            for text in stream.text_stream:
+                on_delta(text)
+            return stream.get_final_message()
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Provider for OpenAI chat completions (OpenAI, Azure, DeepSeek, SiliconFlow, local servers)."""
+
+    def create_message(self, model, messages, tools, max_tokens, temperature, timeout=None, on_delta=None, system=None):
+        converted = self._convert_messages(messages)
+        if system:
+            converted.insert(0, {"role": "system", "content": system_text(system)})
+        kwargs = {
+            "model": model,
+            "messages": converted,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if tools:
+            kwargs["tools"] = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool["name"],
+                        "description": tool["description"],
+                        "parameters": tool["input_schema"]
+                    }
+                }
+                for tool in tools
+            ]
+        if timeout:
+            kwargs["timeout"] = timeout
+
+        response = self.client.chat.completions.create(**kwargs)
+        choice = response.choices[0]
+
+        content = []
+        if choice.message.content:
+            content.append(ContentBlock("text", text=choice.message.content))
+        for tool_call in choice.message.tool_calls or []:
+            try:
+                arguments = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            content.append(ContentBlock("tool_use", id=tool_call.id, name=tool_call.function.name, input=arguments))
+
+        usage = {}
+        if response.usage:
+            usage = {
+                "input_tokens": response.usage.prompt_tokens,
+                "output_tokens": response.usage.completion_tokens
+            }
+        stop_reason = "tool_use" if choice.finish_reason == "tool_calls" else choice.finish_reason
+        return LLMResponse(content, response.model, stop_reason, usage)
+
+    def _convert_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert Anthropic-format history to OpenAI chat messages."""
+        converted = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                converted.append({"role": message["role"], "content": content})
+                continue
+
+            texts = []
+            tool_calls = []
+            for block in content:
+                if block["type"] == "text":
+                    texts.append(block["text"])
+                elif block["type"] == "tool_use":
+                    tool_calls.append({
+                        "id": block["id"],
+                        "type": "function",
+                        "function": {"name": block["name"], "arguments": json.dumps(block["input"])}
+                    })
+                elif block["type"] == "tool_result":
+                    result = block.get("content")
+                    converted.append({
+                        "role": "tool",
+                        "tool_call_id": block["tool_use_id"],
+                        "content": result if isinstance(result, str) else json.dumps(result)
+                    })
+
+            if message["role"] == "assistant":
+                assistant_message = {"role": "assistant", "content": "".join(texts) or None}
+                if tool_calls:
+                    assistant_message["tool_calls"] = tool_calls
+                converted.append(assistant_message)
+            elif texts:
+                converted.append({"role": "user", "content": "".join(texts)})
+        return converted
+
+
+class GeminiProvider(LLMProvider):
+    """Provider for Google Gemini (text only; tools are not forwarded)."""
+
+    def create_message(self, model, messages, tools, max_tokens, temperature, timeout=None, on_delta=None, system=None):
+        if tools:
+            logger.debug("Gemini provider does not support tools; sending %s a text-only request", model)
+
+        contents = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                text = content
+            else:
+                parts = []
+                for block in content:
+                    if block["type"] == "text":
+                        parts.append(block["text"])
+                    elif block["type"] == "tool_result":
+                        result = block.get("content")
+                        parts.append(result if isinstance(result, str) else json.dumps(result))
+                text = "\n".join(parts)
+            if text:
+                contents.append({"role": "model" if message["role"] == "assistant" else "user", "parts": [text]})
+
+        generative_model = self.client.GenerativeModel(model, system_instruction=system_text(system) if system else None)
+        response = generative_model.generate_content(
+            contents,
+            generation_config={"max_output_tokens": max_tokens, "temperature": temperature}
+        )
+        return LLMResponse([ContentBlock("text", text=response.text)], model, "end_turn")
+
+
+class TargetHealth:
+    """Latency tracking and circuit breaker for one provider/model target."""
+
+    # Weight of the newest sample in the latency moving average
+    EWMA_ALPHA = 0.3
+
+    def __init__(self):
+        self.ewma_latency: Optional[float] = None
+        self.breaker = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_FAILOVER_COOLDOWN)
+
+    def record_latency(self, latency: float) -> None:
+        """Record the latency of a successful call."""
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.EWMA_ALPHA * latency + (1 - self.EWMA_ALPHA) * self.ewma_latency
+
+    def is_healthy(self, latency_slo: Optional[float]) -> bool:
+        """Return True if the circuit is closed and the target meets the latency SLO."""
+        if self.breaker.state != "closed":
+            return False
+        if latency_slo and self.ewma_latency is not None and self.ewma_latency > latency_slo:
+            return False
+        return True
+
+
+class LLMRouter:
+    """
+    Routes model calls to provider/model targets with failover.
+
+    Routes are configured through LLM_ROUTES, for example::
+
+        {"chat": {"targets": ["anthropic:claude-3-7-sonnet-20250219", "openai:gpt-4o"],
+                  "latency_slo": 20, "timeout": 120},
+         "subtask": {"targets": ["local:Qwen/Qwen2.5-32B-Instruct-AWQ", "anthropic:claude-3-5-haiku-latest"]}}
+
+    Targets are tried in order, healthy ones first. Each target is called
+    with retries (jittered exponential backoff honoring retry-after) behind a
+    circuit breaker that opens after LLM_CIRCUIT_FAILURE_THRESHOLD
+    consecutive failures and probes again after LLM_FAILOVER_COOLDOWN
+    seconds. A target whose moving-average latency exceeds the route's
+    latency_slo is demoted behind healthy targets until it recovers. The whole
+    request must finish within LLM_REQUEST_DEADLINE seconds, and a route's
+    hedge_delay (or LLM_HEDGE_DELAY) starts a duplicate call when the first one
+    is slow. Unknown routes use the "chat" route.
+
+    With LLM_MOCK_MODE enabled no provider is called and a canned echo
+    response is returned, for tests and offline development.
+    """
+
+    PROVIDER_CLASSES = {
+        "anthropic": AnthropicProvider,
+        "openai": OpenAICompatibleProvider,
+        "azure": OpenAICompatibleProvider,
+        "deepseek": OpenAICompatibleProvider,
+        "siliconflow": OpenAICompatibleProvider,
+        "local": OpenAICompatibleProvider,
+        "gemini": GeminiProvider,
+    }
 
-class ClaudeClient:
-    """Client for Anthropic's Claude API."""
-    
     def __init__(self):
-        """Initialize Claude client with API key from settings."""
+        """Initialize the router from settings."""
         if not settings.ANTHROPIC_API_KEY:
-            print("ANTHROPIC_API_KEY not found in environment variables. Please add it to your .env file.", file=sys.stderr)
-        
-        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-        self.model = settings.CLAUDE_MODEL
-        print(f"Initialized Claude client with model: {self.model}", file=sys.stderr)
-    
-    def create_message(self, messages: List[Dict[str, Any]], enable_tools: bool = True) -> Dict[str, Any]:
+            logger.warning("ANTHROPIC_API_KEY not found in environment variables. Please add it to your .env file.")
+
+        self.routes: Dict[str, Dict[str, Any]] = {
+            "chat": {"targets": [f"anthropic:{settings.CLAUDE_MODEL}"]}
+        }
+        for route, config in settings.LLM_ROUTES.items():
+            # A bare list is shorthand for {"targets": [...]}
+            self.routes[route] = {"targets": config} if isinstance(config, list) else dict(config)
+
+        # {provider_name: LLMProvider}
+        self.providers: Dict[str, LLMProvider] = {}
+        # {"provider:model": TargetHealth}
+        self.health: Dict[str, TargetHealth] = {}
+
+        logger.info("Initialized LLM router with routes: %s", self.routes)
+
+    @property
+    def model(self) -> str:
+        """Model of the primary target of the chat route."""
+        return self.routes["chat"]["targets"][0].split(":", 1)[1]
+
+    def get_provider(self, name: str) -> LLMProvider:
         """
-        Create a message with Claude API.
-        
+        Get the cached provider instance for a provider name.
+
+        Args:
+            name: Provider name, e.g. "anthropic" or "local"
+
+        Returns:
+            The provider instance
+
+        Raises:
+            ValueError: If the provider is not supported
+        """
+        if name not in self.providers:
+            if name not in self.PROVIDER_CLASSES:
+                raise ValueError(f"Unsupported provider: {name}")
+            self.providers[name] = self.PROVIDER_CLASSES[name](name)
+        return self.providers[name]
+
+    async def create_message(self, messages: List[Dict[str, Any]], enable_tools: bool = True, route: str = "chat",
+                             max_tokens: int = 4000, temperature: float = 0.7,
+                             deadline: Optional[float] = None,
+                             on_delta: Optional[Callable[[str], None]] = None,
+                             system: Optional[Union[str, List[Dict[str, Any]]]] = None,
+                             model: Optional[str] = None) -> Any:
+        """
+        Send a conversation to the first healthy target of a route.
+
+        With ``on_delta`` the response is streamed from providers that
+        support it, and the call is not hedged. The callback runs in a worker
+        thread. Text streamed by an attempt that then fails is not withdrawn,
+        so the returned response is the authoritative one.
+
         Args:
             messages: List of messages in the conversation
             enable_tools: Whether to enable tool usage
-            
+            route: Name of the route selecting the candidate models
+            max_tokens: Maximum number of output tokens
+            temperature: Sampling temperature
+            deadline: Seconds the whole request may take (default: LLM_REQUEST_DEADLINE)
+            on_delta: Called with each piece of output text as it arrives
+            system: System prompt as a string or a list of text blocks
+            model: Only try the route's targets serving this model
+
         Returns:
-            The response from Claude API
+            The model response with Anthropic-shaped content blocks
+
+        Raises:
+            ValueError: If the route has no target serving ``model``
+            CircuitOpenError: If every target's circuit is open
+            DeadlineExceededError: If the deadline passed before a response
+            Exception: The last error if every target failed
         """
-        try:
-            # Prepare tools if enabled
-            tools = None
-            if enable_tools:
-                tools = tool_registry.get_tool_definitions()
-                if tools:
-                    print(f"Enabling {len(tools)} tools for Claude", file=sys.stderr)
-            
-            # Create the message with tools if enabled
-            response = self.client.messages.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=4000,
-                temperature=0.7,
-                tools=tools if tools else None
-            )
-            
+        with tracer.span("llm.request", route=route, messages=len(messages)):
+            if settings.LLM_MOCK_MODE:
+                return self._mock_response(messages)
+            return await self._route_message(messages, enable_tools, route, max_tokens, temperature, deadline, on_delta,
+                                             system, model)
+
+    def route_models(self, route: str) -> List[str]:
+        """
+        List the models a route can serve, primary target first.
+
+        Args:
+            route: Name of the route; unknown routes use the "chat" route
+
+        Returns:
+            The model names of the route's targets
+        """
+        config = self.routes.get(route, self.routes["chat"])
+        return list(dict.fromkeys(target.split(":", 1)[1] for target in config["targets"]))
+
+    async def _route_message(self, messages: List[Dict[str, Any]], enable_tools: bool, route: str,
+                             max_tokens: int, temperature: float, deadline: Optional[float],
+                             on_delta: Optional[Callable[[str], None]],
+                             system: Optional[Union[str, List[Dict[str, Any]]]] = None,
+                             model: Optional[str] = None) -> Any:
+        """Try the targets of a route in order until one answers."""
+        config = self.routes.get(route, self.routes["chat"])
+        targets = self._ordered_targets(config)
+        if model is not None:
+            targets = [target for target in targets if target.split(":", 1)[1] == model]
+            if not targets:
+                raise ValueError(f"Route {route} has no target serving model {model}")
+        expires_at = time.monotonic() + (deadline or settings.LLM_REQUEST_DEADLINE)
+
+        # Prepare tools if enabled
+        tools = None
+        if enable_tools:
+            tools = tool_registry.get_tool_schemas()
+            if tools:
+                logger.debug("Enabling %d tools for route %s", len(tools), route)
+
+        last_error: Optional[Exception] = None
+        for target in targets:
+            health = self.health.setdefault(target, TargetHealth())
+            if not health.breaker.allow_request():
+                last_error = last_error or CircuitOpenError(target, health.breaker.retry_after())
+                continue
+
+            try:
+                return await self._call_target(target, health, config, messages, tools, max_tokens, temperature,
+                                               expires_at, on_delta, system)
+            except DeadlineExceededError:
+                raise
+            except Exception as e:
+                logger.warning("Failing over from %s: %s", target, e)
+                last_error = e
+            finally:
+                # A call cancelled or stopped by the deadline records no outcome; it must not keep a half-open probe
+                health.breaker.release_probe()
+
+        raise last_error or RuntimeError(f"No targets configured for route {route}")
+
+    async def _call_target(self, target: str, health: TargetHealth, config: Dict[str, Any],
+                           messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]],
+                           max_tokens: int, temperature: float, expires_at: float,
+                           on_delta: Optional[Callable[[str], None]] = None,
+                           system: Optional[Union[str, List[Dict[str, Any]]]] = None) -> Any:
+        """Call one target with retries, recording the outcome in its circuit breaker."""
+        provider_name, model = target.split(":", 1)
+        provider = self.get_provider(provider_name)
+        # A hedged copy would stream its own text
+        hedge_delay = None if on_delta else config.get("hedge_delay", settings.LLM_HEDGE_DELAY)
+        # monotonic time of the first streamed text of the current attempt
+        first_delta: List[float] = []
+
+        def stream_delta(text: str) -> None:
+            if not first_delta:
+                first_delta.append(time.monotonic())
+            on_delta(text)
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f"Deadline exceeded before calling {target}")
+            timeout = min(remaining, config.get("timeout") or remaining)
+
+            start = time.monotonic()
+            first_delta.clear()
+            try:
+                with tracer.span("llm.call", provider=provider_name, model=model, attempt=attempt) as span:
+                    response = await asyncio.wait_for(
+                        hedged(
+                            lambda: provider.create_message(model, messages, tools, max_tokens, temperature, timeout,
+                                                            stream_delta if on_delta else None, system),
+                            hedge_delay
+                        ),
+                        timeout=timeout
+                    )
+                    tokens = usage_tokens(getattr(response, "usage", None))
+                    for kind, count in tokens.items():
+                        span.set_attribute(f"tokens.{kind}", count)
+                        LLM_TOKENS.inc(count, provider=provider_name, model=model, type=kind)
+                    span.set_attribute("stop_reason", getattr(response, "stop_reason", None))
+            except Exception as e:
+                LLM_REQUEST_DURATION.observe(time.monotonic() - start, provider=provider_name, model=model, outcome="error")
+                LLM_ERRORS.inc(provider=provider_name, model=model, error=get_status_code(e) or type(e).__name__)
+                if not is_retryable(e):
+                    # A client error still means the target is up and answering
+                    health.breaker.record_success()
+                    raise
+                health.breaker.record_failure()
+                if expires_at - time.monotonic() <= 0:
+                    raise DeadlineExceededError(f"Deadline exceeded calling {target}: {e}") from e
+                if attempt == settings.LLM_MAX_RETRIES or not health.breaker.allow_request():
+                    raise
+
+                delay = backoff_delay(attempt, settings.LLM_BACKOFF_BASE, settings.LLM_BACKOFF_CAP, get_retry_after(e))
+                if time.monotonic() + delay >= expires_at:
+                    raise
+                logger.warning("Retrying %s in %.2fs after error: %s", target, delay, e)
+                await asyncio.sleep(delay)
+                continue
+
+            latency = time.monotonic() - start
+            LLM_REQUEST_DURATION.observe(latency, provider=provider_name, model=model, outcome="success")
+            # Without streaming the first token arrives with the whole response
+            time_to_first_token = first_delta[0] - start if first_delta else latency
+            LLM_TIME_TO_FIRST_TOKEN.observe(time_to_first_token, provider=provider_name, model=model)
+            health.breaker.record_success()
+            health.record_latency(latency)
+            if config.get("latency_slo") and latency > config["latency_slo"]:
+                logger.warning("%s took %.1fs, above the %ss latency SLO", target, latency, config["latency_slo"])
             return response
-        except Exception as e:
-            print(f"Error creating message with Claude API: {e}", file=sys.stderr)
-            raise
-    
-    def extract_tool_calls(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+
+    def _mock_response(self, messages: List[Dict[str, Any]]) -> LLMResponse:
+        """Build the canned response used in mock mode."""
+        last_user_message = ""
+        for message in reversed(messages):
+            if message["role"] == "user" and isinstance(message["content"], str):
+                last_user_message = message["content"]
+                break
+        return LLMResponse(
+            [ContentBlock("text", text=f"This is a mock response. You said: {last_user_message}")],
+            "mock",
+            "end_turn"
+        )
+
+    def _ordered_targets(self, config: Dict[str, Any]) -> List[str]:
+        """Order a route's targets with healthy ones first, keeping configured order otherwise."""
+        targets = config["targets"]
+        latency_slo = config.get("latency_slo")
+        healthy = [t for t in targets if self.health.setdefault(t, TargetHealth()).is_healthy(latency_slo)]
+        degraded = [t for t in targets if t not in healthy]
+        return healthy + degraded
+
+    def extract_tool_calls(self, response: Any) -> List[Dict[str, Any]]:
         """
-        Extract tool calls from a Claude API response.
-        
+        Extract tool calls from a model response.
+
         Args:
-            response: The response from Claude API
-            
+            response: The model response
+
         Returns:
             List of tool calls extracted from the response
         """
         tool_calls = []
-        
+
         # Check if response has content blocks
         if hasattr(response, 'content') and response.content:
             for block in response.content:
@@ -70,16 +569,14 @@ class ClaudeClient:
                     tool_call = {
                         'id': block.id,
                         'type': 'tool_call',
-                        'tool': {
-                            'name': block.name,
-                            'description': tool_registry.get_tool(block.name).description,
-                            'parameters': tool_registry.get_tool(block.name).parameters
-                        },
+                        # Shared, already validated definition
+                        'tool': tool_registry.get_tool(block.name).definition(),
                         'input': block.input
                     }
                     tool_calls.append(tool_call)
-        
+
         return tool_calls
 
+
 # Create a singleton instance
-claude_client = ClaudeClient() 
\ No newline at end of file
+llm_router = LLMRouter()
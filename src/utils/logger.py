@@ -0,0 +1,177 @@
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from ..config import settings
+from .telemetry import tracer, LOG_RECORDS_DROPPED
+
+
+# Loggers of this package are named "src.<module>"; everything below this one is configured here
+ROOT_LOGGER = __name__.split(".")[0]
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+# Attributes added by the filters below, emitted separately
+_INTERNAL_ATTRIBUTES = {"trace_id", "span_id", "sample_rate"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        if getattr(record, "sample_rate", None):
+            entry["sample_rate"] = record.sample_rate
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in _INTERNAL_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current trace and span IDs, read in the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = tracer.current_span()
+        if span is not None and span.sampled:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of high-frequency records.
+
+    The rate comes from ``extra={"sample_rate": r}`` on the call, or from
+    LOG_SAMPLING for the logger (longest matching module prefix wins).
+    Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        # {logger_name: rate or None}, resolved once per logger
+        self.cache: Dict[str, Optional[float]] = {}
+
+    def _rate_for(self, name: str) -> Optional[float]:
+        if name not in self.cache:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            self.cache[name] = self.rates[max(matches, key=len)] if matches else None
+        return self.cache[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None) or self._rate_for(record.name)
+        if rate is None or rate >= 1:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the caller.
+
+    Records are formatted lazily by the listener thread; when the queue is
+    full the record is dropped and counted instead of stalling a request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now: they may not survive a thread hop
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def _module_name(name: str) -> str:
+    """Allow LOG_LEVELS and LOG_SAMPLING keys with or without the package prefix."""
+    if name == ROOT_LOGGER or name.startswith(ROOT_LOGGER + "."):
+        return name
+    return f"{ROOT_LOGGER}.{name}"
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """
+    Configure the package's loggers from settings; safe to call repeatedly.
+
+    Records are put on a bounded queue by the calling thread and written to
+    stderr by a background listener, so logging never does blocking I/O on
+    the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({_module_name(k): float(v) for k, v in settings.LOG_SAMPLING.items()}))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.propagate = False
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(_module_name(name)).setLevel(str(level).upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger(__name__)
+    for env_file in settings.LOADED_ENV_FILES:
+        logger.debug(f"Loaded environment variables from {env_file}")
+    if not settings.LOADED_ENV_FILES:
+        logger.warning("No .env files found. Using system environment variables only.")
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a logger for a module, configuring logging on first use.
+
+    Args:
+        name: Module name, usually ``__name__``
+
+    Returns:
+        The logger
+    """
+    setup_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,300 @@
+import functools
+import itertools
+import re
+import zlib
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Words too common to say anything about a passage's topic
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from had has have how i if in into is it its "
+    "me my no not of on or our so than that the their them then there these they this to was we were "
+    "what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms for ranking, without stopwords.
+
+    Args:
+        text: The text
+
+    Returns:
+        The terms in order of appearance
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(blocks: Iterable[str], max_words: int = 120, overlap: int = 20) -> List[str]:
+    """
+    Group text blocks into passages of about max_words words.
+
+    Consecutive blocks, e.g. the paragraphs of a page, are joined until the
+    next one would overflow the passage. Blocks longer than a passage are
+    cut into windows that overlap by ``overlap`` words, so a sentence on a
+    window boundary is found whole in one of them.
+
+    Args:
+        blocks: Text blocks in document order
+        max_words: Words per passage
+        overlap: Words shared by consecutive windows of a long block
+
+    Returns:
+        The passages
+    """
+    passages: List[str] = []
+    current: List[str] = []
+    current_words = 0
+    step = max(max_words - overlap, 1)
+    for block in blocks:
+        words = block.split()
+        if not words:
+            continue
+        if current and current_words + len(words) > max_words:
+            passages.append("\n".join(current))
+            current, current_words = [], 0
+        if len(words) > max_words:
+            for start in range(0, len(words) - overlap, step):
+                passages.append(" ".join(words[start:start + max_words]))
+            continue
+        current.append(" ".join(words))
+        current_words += len(words)
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+class TermMatrix:
+    """
+    Tokenized documents encoded as integer term ids for vectorized scoring.
+
+    Terms are numbered once, when the matrix is built; scoring a query is
+    then a handful of NumPy operations over the flat array of term ids
+    instead of a Python loop over documents and terms.
+    """
+
+    def __init__(self, documents: List[List[str]]):
+        """
+        Encode the documents.
+
+        Args:
+            documents: Tokenized documents
+        """
+        tokens = list(itertools.chain.from_iterable(documents))
+        self.vocabulary: Dict[str, int] = {term: term_id for term_id, term in enumerate(dict.fromkeys(tokens))}
+        self.term_ids = np.fromiter(map(self.vocabulary.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        self.lengths = np.fromiter((len(document) for document in documents), dtype=np.int64, count=len(documents))
+        # The document of each entry of term_ids
+        self.rows = np.repeat(np.arange(len(documents)), self.lengths)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def _from_arrays(cls, vocabulary: Dict[str, int], term_ids: np.ndarray, lengths: np.ndarray) -> "TermMatrix":
+        matrix = cls.__new__(cls)
+        matrix.vocabulary = vocabulary
+        matrix.term_ids = term_ids
+        matrix.lengths = lengths
+        matrix.rows = np.repeat(np.arange(len(lengths)), lengths)
+        return matrix
+
+    def reindex(self, vocabulary: Dict[str, int]) -> "TermMatrix":
+        """
+        Renumber the terms into a shared vocabulary, adding the terms it lacks.
+
+        Args:
+            vocabulary: Vocabulary shared by several matrices; updated in place
+
+        Returns:
+            A matrix of the same documents using the shared term ids
+        """
+        mapping = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in self.vocabulary),
+                              dtype=np.int64, count=len(self.vocabulary))
+        return self._from_arrays(vocabulary, mapping[self.term_ids] if len(mapping) else self.term_ids, self.lengths)
+
+    @classmethod
+    def concatenate(cls, matrices: List["TermMatrix"], vocabulary: Dict[str, int]) -> "TermMatrix":
+        """
+        Join matrices into one holding all their documents, in order.
+
+        Args:
+            matrices: Matrices whose term ids all refer to ``vocabulary``
+            vocabulary: Their shared vocabulary
+
+        Returns:
+            The joined matrix
+        """
+        if not matrices:
+            return cls._from_arrays(vocabulary, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        return cls._from_arrays(vocabulary, np.concatenate([matrix.term_ids for matrix in matrices]),
+                                np.concatenate([matrix.lengths for matrix in matrices]))
+
+    def frequencies(self, terms: List[str]) -> np.ndarray:
+        """
+        Count how often each term occurs in each document.
+
+        Args:
+            terms: Distinct terms to count
+
+        Returns:
+            Array of shape (documents, terms)
+        """
+        columns = np.full(len(self.vocabulary) + 1, -1, dtype=np.int64)
+        for column, term in enumerate(terms):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                columns[term_id] = column
+        matched = columns[self.term_ids]
+        mask = matched >= 0
+        cells = np.bincount(self.rows[mask] * len(terms) + matched[mask], minlength=len(self) * len(terms))
+        return cells.reshape(len(self), len(terms)).astype(np.float64)
+
+    def bm25(self, query: List[str], k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+        """
+        Score the documents against a tokenized query with Okapi BM25.
+
+        The documents are their own collection: term rarity is measured
+        among them.
+
+        Args:
+            query: Query terms; repeats are ignored
+            k1: Term frequency saturation
+            b: Length normalization, from 0 (none) to 1 (full)
+
+        Returns:
+            The score of each document, 0 for documents sharing no term with the query
+        """
+        terms = list(dict.fromkeys(query))
+        if not terms or not len(self):
+            return np.zeros(len(self))
+        frequencies = self.frequencies(terms)
+        return bm25_weights(frequencies, (frequencies > 0).sum(axis=0), len(self), self.lengths,
+                            float(self.lengths.mean()), k1, b)
+
+
+def bm25_weights(frequencies: np.ndarray, document_frequencies: np.ndarray, document_count: int,
+                 lengths: np.ndarray, average_length: float, k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """
+    Score documents with Okapi BM25 from precomputed statistics.
+
+    Args:
+        frequencies: Term counts of shape (documents, query terms)
+        document_frequencies: Documents containing each query term, across the collection
+        document_count: Documents in the collection
+        lengths: Length of each scored document in terms
+        average_length: Average document length in the collection
+        k1: Term frequency saturation
+        b: Length normalization, from 0 (none) to 1 (full)
+
+    Returns:
+        The score of each document
+    """
+    if frequencies.size == 0:
+        return np.zeros(frequencies.shape[0])
+    idf = np.log1p((document_count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+    norm = k1 * (1.0 - b + b * lengths / max(average_length, 1.0))
+    return (frequencies * (k1 + 1.0) / (frequencies + norm[:, None])) @ idf
+
+
+def bm25_scores(query: List[str], documents: List[List[str]], k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """
+    Score tokenized documents against a tokenized query with Okapi BM25.
+
+    Shorthand for ``TermMatrix(documents).bm25(query)``; build the matrix
+    once to score several queries.
+
+    Args:
+        query: Query terms; repeats are ignored
+        documents: Tokenized documents
+        k1: Term frequency saturation
+        b: Length normalization, from 0 (none) to 1 (full)
+
+    Returns:
+        The score of each document
+    """
+    return TermMatrix(documents).bm25(query, k1, b)
+
+
+@functools.lru_cache(maxsize=65536)
+def _term_features(term: str, dimensions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash a term and its character trigrams to (dimensions, signed weights)."""
+    marked = f"<{term}>"
+    trigrams = [marked[i:i + 3] for i in range(len(marked) - 2)]
+    hashes = np.array([zlib.crc32(piece.encode("utf-8")) for piece in [term] + trigrams], dtype=np.int64)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    # The trigrams together weigh as much as the whole term
+    weights = np.full(len(hashes), 1.0 / np.sqrt(max(len(trigrams), 1)))
+    weights[0] = 1.0
+    return hashes % dimensions, signs * weights
+
+
+class HashedEmbedder:
+    """
+    CPU-only text embeddings by feature hashing.
+
+    Each term adds its own feature and those of its character trigrams to
+    a vector of fixed size, at positions and with signs chosen by a stable
+    hash. Texts sharing words or word pieces ("cache", "caching", "cached")
+    get close vectors, which catches matches BM25's exact terms miss. No
+    model is loaded and nothing is trained.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        """
+        Initialize the embedder.
+
+        Args:
+            dimensions: Size of the vectors
+        """
+        self.dimensions = dimensions
+
+    def embed(self, matrix: TermMatrix) -> np.ndarray:
+        """
+        Embed the documents of a term matrix.
+
+        Terms are weighted by 1 + log of their count in the document, and
+        vectors are scaled to unit length so dot products are cosines.
+
+        Args:
+            matrix: The documents, built with their own vocabulary
+
+        Returns:
+            Array of shape (documents, dimensions)
+        """
+        vectors = np.zeros((len(matrix), self.dimensions), dtype=np.float32)
+        size = len(matrix.vocabulary)
+        if not size:
+            return vectors
+        pairs, counts = np.unique(matrix.rows * size + matrix.term_ids, return_counts=True)
+        rows, term_ids = pairs // size, pairs % size
+        weights = 1.0 + np.log(counts)
+
+        # Gather the features of each (document, term) pair from the features of the distinct terms
+        names = list(matrix.vocabulary)
+        present, inverse = np.unique(term_ids, return_inverse=True)
+        features = [_term_features(names[term_id], self.dimensions) for term_id in present]
+        sizes = np.array([len(positions) for positions, _ in features])
+        positions = np.concatenate([positions for positions, _ in features])
+        values = np.concatenate([values for _, values in features])
+        offsets = np.cumsum(sizes) - sizes
+        repeats = sizes[inverse]
+        index = np.repeat(offsets[inverse] - np.cumsum(repeats) + repeats, repeats) + np.arange(repeats.sum())
+
+        cells = np.repeat(rows, repeats) * self.dimensions + positions[index]
+        sums = np.bincount(cells, weights=values[index] * np.repeat(weights, repeats),
+                           minlength=len(matrix) * self.dimensions)
+        vectors[:] = sums.reshape(len(matrix), self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def embed_text(self, terms: List[str]) -> np.ndarray:
+        """Embed one tokenized text, e.g. a query."""
+        return self.embed(TermMatrix([terms]))[0]
@@ -0,0 +1,340 @@
+import asyncio
+import hashlib
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from ..config import settings
+from .search import search_service, canonicalize_url
+from .ranking import tokenize, split_passages, bm25_scores
+from .tools.browser_pool import browser_pool
+from .tools.dispatcher import tool_dispatcher
+from .telemetry import RESEARCH_PAGE_FETCHES
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Elements whose text is never part of the content
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head", "nav", "footer", "aside", "form", "iframe"}
+
+# Elements that start a new block of text
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr",
+    "td", "th", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr", "figcaption"
+}
+
+# Content types whose text is extracted
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = ("text/plain", "text/markdown")
+
+USER_AGENT = "Mozilla/5.0 (compatible; web-agentic-ai research)"
+
+# Seconds of the fetch budget kept back from the browser fallback, so a render
+# that runs out of time still leaves room to return the static text
+RENDER_GRACE = 1.0
+
+# Most passages quoted from one page, so the answer draws on several sources
+MAX_PASSAGES_PER_PAGE = 3
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the title and the text blocks of an HTML document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks: List[str] = []
+        self._parts: List[str] = []
+        self._skipping: List[str] = []
+        self._in_title = False
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._parts).split())
+        if text:
+            self.blocks.append(text)
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping.append(tag)
+        elif tag == "title":
+            self._in_title = True
+        elif tag in BLOCK_TAGS and not self._skipping:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if self._skipping and tag == self._skipping[-1]:
+            self._skipping.pop()
+        elif tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_TAGS and not self._skipping:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skipping:
+            self._parts.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def html_to_blocks(html: str) -> Tuple[str, List[str]]:
+    """
+    Extract the readable text of an HTML page.
+
+    Scripts, styles, navigation, footers and forms are dropped; the rest
+    is split into blocks at paragraphs, headings, list items and other
+    block elements.
+
+    Args:
+        html: The HTML document
+
+    Returns:
+        Tuple of (page title, text blocks in document order)
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return " ".join(parser.title.split()), parser.blocks
+
+
+def text_to_blocks(text: str) -> List[str]:
+    """Split plain text into blocks at blank lines."""
+    return [" ".join(block.split()) for block in text.split("\n\n") if block.strip()]
+
+
+class Page:
+    """A fetched page reduced to its text."""
+
+    __slots__ = ("url", "title", "blocks", "rendered")
+
+    def __init__(self, url: str, title: str, blocks: List[str], rendered: bool = False):
+        self.url = url
+        self.title = title
+        self.blocks = blocks
+        self.rendered = rendered
+
+    @property
+    def word_count(self) -> int:
+        return sum(len(block.split()) for block in self.blocks)
+
+
+class ResearchPipeline:
+    """
+    Answers a research question with the most relevant passages of the web.
+
+    One call replaces the usual round of web_search followed by
+    extract_content on each hit: the queries go to the search service, the
+    top pages are fetched concurrently, reduced to text and split into
+    passages, and the passages are ranked against the question with BM25.
+    Only the best passages reach the model, each with a link to its source;
+    the full text of every page is saved to the workspace.
+
+    Pages are fetched over plain HTTP in a thread pool of the pipeline's
+    own. A page whose static HTML holds less than RESEARCH_RENDER_MIN_WORDS
+    words, usually one built by scripts, is loaded again in the shared
+    headless browser.
+    """
+
+    def __init__(self):
+        """Initialize the pipeline; the thread pool is created on first use."""
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+    async def research(self, question: str, queries: List[str], max_pages: int, max_passages: int,
+                       workspace_path: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Search, fetch the top pages and rank their passages.
+
+        Args:
+            question: What the passages should answer; also searched
+            queries: Further search queries
+            max_pages: Pages fetched, taken from the top of the merged search results
+            max_passages: Passages returned
+            workspace_path: Where to save the text of the fetched pages, if given
+
+        Returns:
+            Dictionary with the "sources" fetched (url, title, words, file),
+            the best "passages" (source index, score, text) and the
+            "errors" of searches and fetches that failed
+
+        Raises:
+            RuntimeError: If no search provider is available
+        """
+        queries = list(dict.fromkeys([question] + queries))
+        outcome = await search_service.search(queries, max_pages)
+        errors = [f'Search on {e["provider"]} failed for "{e["query"]}": {e["error"]}' for e in outcome["errors"]]
+        hits = outcome["results"][:max_pages]
+
+        pages: List[Page] = []
+        for hit, fetched in zip(hits, await self._fetch_all([hit["href"] for hit in hits])):
+            if isinstance(fetched, Page):
+                if not fetched.title:
+                    fetched.title = hit["title"]
+                pages.append(fetched)
+            else:
+                errors.append(f"Fetching {hit['href']} failed: {fetched}")
+
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            self._get_thread_pool(), self._rank, pages, " ".join(queries), max_passages
+        )
+
+        sources = [{"url": page.url, "title": page.title, "words": page.word_count} for page in pages]
+        if workspace_path is not None:
+            files = await asyncio.to_thread(lambda: [self._save(workspace_path, page) for page in pages])
+            for source, name in zip(sources, files):
+                source["file"] = name
+        return {"sources": sources, "passages": ranked, "errors": errors}
+
+    async def _fetch_all(self, urls: List[str]) -> List[Any]:
+        """Fetch pages concurrently; each entry is a Page or the error message."""
+        deadline = asyncio.get_running_loop().time() + settings.RESEARCH_FETCH_TIMEOUT
+        tasks = [asyncio.ensure_future(self._fetch(url, deadline)) for url in urls]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=settings.RESEARCH_FETCH_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        results = []
+        for task in tasks:
+            if task in pending:
+                RESEARCH_PAGE_FETCHES.inc(status="timeout")
+                results.append(f"No answer within {settings.RESEARCH_FETCH_TIMEOUT} seconds")
+            elif task.exception() is not None:
+                RESEARCH_PAGE_FETCHES.inc(status="error")
+                results.append(str(task.exception()) or type(task.exception()).__name__)
+            else:
+                RESEARCH_PAGE_FETCHES.inc(status="rendered" if task.result().rendered else "ok")
+                results.append(task.result())
+        return results
+
+    async def _fetch(self, url: str, deadline: float) -> Page:
+        """
+        Fetch one page, loading it in the browser if its static HTML has too little text.
+
+        Args:
+            url: The URL of the page
+            deadline: Event loop time by which the page must be returned
+
+        Returns:
+            The page; its static text if rendering fails or would miss the deadline
+        """
+        final_url, content_type, text = await asyncio.get_running_loop().run_in_executor(
+            self._get_thread_pool(), self._fetch_static, url
+        )
+        if content_type in TEXT_TYPES:
+            return Page(final_url, "", text_to_blocks(text))
+        # Parsing is CPU-bound, so pages are parsed in the tool process pool, in parallel and off the GIL
+        title, blocks = await tool_dispatcher.run_in_process(html_to_blocks, text)
+        page = Page(final_url, title, blocks)
+        if page.word_count >= settings.RESEARCH_RENDER_MIN_WORDS:
+            return page
+        # The fallback only gets what is left of the budget, so a slow render
+        # cannot take the static text down with it
+        budget = deadline - asyncio.get_running_loop().time() - RENDER_GRACE
+        if budget <= 0:
+            logger.debug("No time left to render %s, keeping its static text", url)
+            return page
+        try:
+            return await asyncio.wait_for(self._fetch_rendered(url), budget)
+        except asyncio.TimeoutError:
+            logger.debug("Rendering %s took over %.1f seconds, keeping its static text", url, budget)
+            return page
+        except Exception as e:
+            logger.debug("Could not render %s, keeping its static text: %s", url, e)
+            return page
+
+    def _fetch_static(self, url: str) -> Tuple[str, str, str]:
+        """Download a page over HTTP; runs in a worker thread. Returns its final URL, content type and text."""
+        if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+            raise ValueError(f"Only http and https URLs can be fetched: {url}")
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept": "text/html,text/plain;q=0.9"})
+        with urllib.request.urlopen(request, timeout=settings.RESEARCH_FETCH_TIMEOUT) as response:
+            content_type = response.headers.get_content_type()
+            if content_type not in HTML_TYPES + TEXT_TYPES:
+                raise ValueError(f"Unsupported content type {content_type}")
+            data = response.read(settings.RESEARCH_MAX_PAGE_BYTES)
+            text = data.decode(response.headers.get_content_charset() or "utf-8", errors="replace")
+            return response.geturl(), content_type, text
+
+    async def _fetch_rendered(self, url: str) -> Page:
+        """Load a page in the shared browser and extract the text of the rendered document."""
+        async with browser_pool.page(settings.SCREENSHOT_VIEWPORT_WIDTH, settings.SCREENSHOT_VIEWPORT_HEIGHT) as page:
+            await page.goto(url, wait_until="load")
+            try:
+                await page.wait_for_load_state("networkidle", timeout=2000)
+            except Exception:
+                # Pages that keep polling never go idle; use what has loaded
+                pass
+            html = await page.content()
+            final_url = page.url
+        title, blocks = await tool_dispatcher.run_in_process(html_to_blocks, html)
+        return Page(final_url, title, blocks, rendered=True)
+
+    def _rank(self, pages: List[Page], query: str, max_passages: int) -> List[Dict[str, Any]]:
+        """
+        Split pages into passages and return the best ones; runs in a worker thread.
+
+        Passages repeated across pages, such as shared boilerplate, are kept
+        once, and at most MAX_PASSAGES_PER_PAGE are taken from one page.
+        """
+        start = time.perf_counter()
+        texts: List[str] = []
+        owners: List[int] = []
+        seen = set()
+        for index, page in enumerate(pages):
+            for passage in split_passages(page.blocks, settings.RESEARCH_PASSAGE_WORDS):
+                key = hashlib.sha1(" ".join(passage.lower().split()).encode("utf-8")).digest()
+                if key not in seen:
+                    seen.add(key)
+                    texts.append(passage)
+                    owners.append(index)
+        if not texts:
+            return []
+
+        scores = bm25_scores(tokenize(query), [tokenize(text) for text in texts])
+        ranked = []
+        per_page = [0] * len(pages)
+        for position in np.argsort(-scores, kind="stable"):
+            if scores[position] <= 0 or len(ranked) == max_passages:
+                break
+            owner = owners[position]
+            if per_page[owner] == MAX_PASSAGES_PER_PAGE:
+                continue
+            per_page[owner] += 1
+            ranked.append({"source": owner + 1, "score": round(float(scores[position]), 3), "text": texts[position]})
+        logger.debug("Ranked %d passages of %d pages in %.3fs", len(texts), len(pages), time.perf_counter() - start)
+        return ranked
+
+    @staticmethod
+    def _save(workspace_path: Path, page: Page) -> str:
+        """Write a page's text to the workspace, in the format of extract_content; returns the file name."""
+        domain = urllib.parse.urlsplit(page.url).netloc
+        safe_domain = "".join(c if c.isalnum() else "_" for c in domain)
+        digest = hashlib.sha1(canonicalize_url(page.url).encode("utf-8")).hexdigest()[:8]
+        name = f"extracted_content_{safe_domain}_{digest}.txt"
+        with open(workspace_path / name, "w", encoding="utf-8") as f:
+            f.write(f"Extracted from URL: {page.url}\n\n")
+            f.write("\n\n".join(page.blocks))
+        return name
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=settings.RESEARCH_THREAD_POOL_SIZE, thread_name_prefix="research")
+        return self._thread_pool
+
+    def shutdown(self) -> None:
+        """Shut down the thread pool without waiting for running fetches."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+# Create a singleton instance
+research_pipeline = ResearchPipeline()
@@ -0,0 +1,230 @@
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import Executor
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits,
+# server errors and Anthropic's 529 "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request runs out of time before getting a response."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the target's circuit is open."""
+
+    def __init__(self, target: str, retry_after: float):
+        super().__init__(f"Circuit open for {target}, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Return the HTTP status code carried by an SDK error, if any."""
+    status_code = getattr(error, "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Decide whether a failed call may succeed if retried.
+
+    Args:
+        error: The exception raised by the call
+
+    Returns:
+        True for rate limits, overload, server errors, timeouts and connection errors
+    """
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # SDK connection and timeout errors carry no status code
+    name = type(error).__name__
+    return name.endswith("ConnectionError") or name.endswith("TimeoutError")
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the server's requested retry delay from an SDK error.
+
+    Supports the retry-after-ms header and retry-after given either in
+    seconds or as an HTTP date.
+
+    Args:
+        error: The exception raised by the call
+
+    Returns:
+        The delay in seconds, or None if the server did not ask for one
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Compute the delay before the next retry.
+
+    Uses exponential backoff with full jitter so concurrent clients spread out;
+    a server-provided retry-after is treated as a lower bound.
+
+    Args:
+        attempt: Zero-based number of the attempt that just failed
+        base: Delay scale in seconds
+        cap: Maximum backoff in seconds
+        retry_after: Delay requested by the server, if any
+
+    Returns:
+        Delay in seconds
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        # Small jitter on top so clients told the same value do not return in lockstep
+        delay = retry_after + random.uniform(0, base)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Per-target circuit breaker.
+
+    - closed: calls pass through; consecutive failures are counted
+    - open: after ``failure_threshold`` consecutive failures calls are
+      rejected for ``reset_timeout`` seconds
+    - half-open: after the timeout one probe call is let through; success
+      closes the circuit, failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made now."""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call and close the circuit."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Give back the probe of a call that ended without an outcome, e.g. one
+        that was cancelled or never made, so a later call can probe instead.
+        """
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit at the threshold."""
+        with self.lock:
+            self.failures += 1
+            if self.probe_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+
+async def hedged(call, hedge_delay: Optional[float], executor: Optional[Executor] = None) -> Any:
+    """
+    Run a blocking call in a thread, starting a second copy if the first is slow.
+
+    The first successful result wins. If one copy fails, the other is still
+    awaited. The losing thread cannot be interrupted; its result is discarded.
+
+    Args:
+        call: Zero-argument blocking callable
+        hedge_delay: Seconds to wait before hedging; None or 0 disables hedging
+        executor: Thread pool to run the copies in, or None for the default one
+
+    Returns:
+        The result of the first copy that succeeded
+    """
+    def start() -> asyncio.Future:
+        if executor is None:
+            return asyncio.ensure_future(asyncio.to_thread(call))
+        return asyncio.get_running_loop().run_in_executor(executor, call)
+
+    first = start()
+    if not hedge_delay:
+        return await first
+
+    done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+    if done:
+        return first.result()
+
+    pending = {first, start()}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
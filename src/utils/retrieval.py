@@ -0,0 +1,311 @@
+import fnmatch
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from ..config import settings
+from .ranking import TermMatrix, HashedEmbedder, tokenize
+from .telemetry import RETRIEVAL_FILES_INDEXED, RETRIEVAL_INDEX_CHUNKS
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Directories never indexed, besides hidden ones such as .venv, .jobs and .screenshots
+SKIPPED_DIRS = {"node_modules", "__pycache__", "site-packages"}
+
+# First line of the files written by extract_content and research
+SOURCE_PREFIX = "Extracted from URL:"
+
+# Chunks scoring below this share of the best chunk's score are left out as noise
+MIN_RELATIVE_SCORE = 0.1
+
+
+def chunk_lines(text: str, max_words: int) -> List[Tuple[int, int, str]]:
+    """
+    Split a file into chunks of about max_words words, keeping whole lines.
+
+    A chunk ends early at a blank line once it is half full, so chunks
+    tend to follow paragraphs and code blocks. Lines longer than a chunk,
+    such as minified data or unwrapped prose, are cut into chunks of their
+    own.
+
+    Args:
+        text: Contents of the file
+        max_words: Words per chunk
+
+    Returns:
+        Tuples of (first line, last line, text), with 1-based line numbers
+    """
+    chunks: List[Tuple[int, int, str]] = []
+    lines: List[str] = []
+    start = 0
+    words = 0
+    number = 0
+
+    def flush(end: int) -> None:
+        nonlocal lines, words
+        if lines:
+            chunks.append((start, end, "\n".join(lines).rstrip()))
+        lines, words = [], 0
+
+    for number, line in enumerate(text.splitlines(), 1):
+        count = len(line.split())
+        if lines and (words + count > max_words or (count == 0 and words >= max_words // 2)):
+            flush(number - 1)
+        if count > max_words:
+            parts = line.split()
+            for offset in range(0, count, max_words):
+                chunks.append((number, number, " ".join(parts[offset:offset + max_words])))
+            continue
+        if not lines:
+            if count == 0:
+                continue
+            start = number
+        lines.append(line)
+        words += count
+    flush(number)
+    return chunks
+
+
+class IndexedFile:
+    """The chunks of one workspace file, with their term matrix and embeddings."""
+
+    __slots__ = ("mtime_ns", "size", "source", "chunks", "matrix", "embeddings")
+
+    def __init__(self, mtime_ns: int, size: int, source: Optional[str], chunks: List[Tuple[int, int, str]],
+                 matrix: TermMatrix, embeddings: Optional[np.ndarray]):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.source = source
+        self.chunks = chunks
+        self.matrix = matrix
+        self.embeddings = embeddings
+
+
+class WorkspaceIndex:
+    """
+    A retrieval index over the text files of one workspace.
+
+    Files are split into chunks of about RETRIEVAL_CHUNK_WORDS words. Each
+    file keeps its own term matrix, numbered in a vocabulary shared by the
+    workspace, and, if RETRIEVAL_EMBEDDINGS is on, the hashed embeddings of
+    its chunks, so a changed file is re-indexed on its own. Before every
+    search the workspace is listed and only files whose modification time
+    or size changed since the last search are read again; deleted files
+    are dropped. The files' matrices are joined once per change, and chunks
+    are ranked by BM25 across the whole workspace, blended with embedding
+    similarity when embeddings are on.
+    """
+
+    def __init__(self, root: Path):
+        """
+        Initialize an empty index.
+
+        Args:
+            root: The workspace directory
+        """
+        self.root = root
+        self.files: Dict[str, IndexedFile] = {}
+        # Term ids of all files; terms of deleted files stay until the index is dropped
+        self.vocabulary: Dict[str, int] = {}
+        self.embedder = HashedEmbedder(settings.RETRIEVAL_EMBEDDING_DIM) if settings.RETRIEVAL_EMBEDDINGS else None
+        self.lock = threading.Lock()
+        # The files with chunks, their joined matrix and embeddings, and the file of each chunk
+        self._joined: Optional[Tuple[List[Tuple[str, IndexedFile]], TermMatrix, Optional[np.ndarray], np.ndarray]] = None
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(len(indexed.chunks) for indexed in list(self.files.values()))
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the workspace.
+
+        Returns:
+            Number of files indexed again or dropped
+        """
+        seen = set()
+        changed = 0
+        for relative_path, stat in self._list_files():
+            seen.add(relative_path)
+            indexed = self.files.get(relative_path)
+            if indexed is not None and indexed.mtime_ns == stat.st_mtime_ns and indexed.size == stat.st_size:
+                continue
+            changed += 1
+            indexed = self._index_file(relative_path, stat)
+            if indexed is None:
+                self.files.pop(relative_path, None)
+            else:
+                self.files[relative_path] = indexed
+        for relative_path in [path for path in self.files if path not in seen]:
+            del self.files[relative_path]
+            changed += 1
+        if changed:
+            self._joined = None
+        return changed
+
+    def _list_files(self) -> List[Tuple[str, os.stat_result]]:
+        """List the indexable files of the workspace with their stat results."""
+        found: List[Tuple[str, os.stat_result]] = []
+        pending = [self.root]
+        while pending and len(found) < settings.RETRIEVAL_MAX_FILES:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if 0 < stat.st_size <= settings.RETRIEVAL_MAX_FILE_BYTES:
+                        found.append((os.path.relpath(entry.path, self.root), stat))
+        return found[:settings.RETRIEVAL_MAX_FILES]
+
+    def _index_file(self, relative_path: str, stat: os.stat_result) -> Optional[IndexedFile]:
+        """Read and chunk one file; returns None if it cannot be read."""
+        try:
+            data = (self.root / relative_path).read_bytes()
+        except OSError:
+            return None
+        if b"\0" in data[:4096]:
+            # Binary files are kept without chunks, so they are not read again until they change
+            return IndexedFile(stat.st_mtime_ns, stat.st_size, None, [], TermMatrix([]), None)
+        text = data.decode("utf-8", errors="replace")
+        source = None
+        if text.startswith(SOURCE_PREFIX):
+            source = text[len(SOURCE_PREFIX):text.find("\n")].strip() if "\n" in text else None
+        chunks = chunk_lines(text, settings.RETRIEVAL_CHUNK_WORDS)
+        # The file name is part of every chunk's terms, so files can be found by name
+        name_terms = tokenize(relative_path.replace(os.sep, " "))
+        matrix = TermMatrix([name_terms + tokenize(chunk_text) for _, _, chunk_text in chunks])
+        # The embedder reads the file's own vocabulary, so embed before renumbering
+        embeddings = self.embedder.embed(matrix) if self.embedder is not None else None
+        RETRIEVAL_FILES_INDEXED.inc()
+        return IndexedFile(stat.st_mtime_ns, stat.st_size, source, chunks, matrix.reindex(self.vocabulary), embeddings)
+
+    def _join(self, pattern: Optional[str]) -> Tuple[List[Tuple[str, IndexedFile]], TermMatrix, Optional[np.ndarray], np.ndarray]:
+        """Join the matrices and embeddings of the files searched; cached for searches of the whole workspace."""
+        if pattern is None and self._joined is not None:
+            return self._joined
+        files = [(path, indexed) for path, indexed in self.files.items()
+                 if indexed.chunks and (pattern is None or fnmatch.fnmatch(path, pattern))]
+        matrix = TermMatrix.concatenate([indexed.matrix for _, indexed in files], self.vocabulary)
+        embeddings = None
+        if self.embedder is not None and files:
+            embeddings = np.vstack([indexed.embeddings for _, indexed in files])
+        owners = np.repeat(np.arange(len(files)), [len(indexed.chunks) for _, indexed in files])
+        joined = (files, matrix, embeddings, owners)
+        if pattern is None:
+            self._joined = joined
+        return joined
+
+    def search(self, question: str, top_k: int, pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the chunks that best match a question.
+
+        Args:
+            question: The question or keywords
+            top_k: Chunks returned
+            pattern: Glob on paths relative to the workspace restricting the search, e.g. "*.py"
+
+        Returns:
+            Chunks as dictionaries with path, start and end lines, score, text
+            and, for pages saved by the web tools, their source URL
+        """
+        query = tokenize(question)
+        files, matrix, embeddings, owners = self._join(pattern)
+        if not query or not files:
+            return []
+
+        scores = matrix.bm25(query)
+        if embeddings is not None and settings.RETRIEVAL_EMBEDDING_WEIGHT > 0:
+            top = scores.max()
+            lexical = scores / top if top > 0 else scores
+            similarity = np.clip(embeddings @ self.embedder.embed_text(query), 0.0, None)
+            weight = settings.RETRIEVAL_EMBEDDING_WEIGHT
+            scores = (1.0 - weight) * lexical + weight * similarity
+
+        firsts = np.cumsum([0] + [len(indexed.chunks) for _, indexed in files])
+        count = min(top_k, len(scores))
+        best = np.argpartition(-scores, count - 1)[:count]
+        results = []
+        cutoff = max(float(scores.max()) * MIN_RELATIVE_SCORE, 0.0)
+        for position in best[np.argsort(-scores[best], kind="stable")]:
+            if scores[position] <= cutoff:
+                break
+            path, indexed = files[owners[position]]
+            start, end, text = indexed.chunks[position - firsts[owners[position]]]
+            result = {"path": path, "start": start, "end": end, "score": round(float(scores[position]), 3), "text": text}
+            if indexed.source:
+                result["source"] = indexed.source
+            results.append(result)
+        return results
+
+
+class RetrievalIndexes:
+    """The workspace indexes of the most recently searched conversations of this worker."""
+
+    def __init__(self, max_indexes: int):
+        """
+        Initialize the registry.
+
+        Args:
+            max_indexes: Indexes kept; the least recently used are dropped
+        """
+        self.max_indexes = max_indexes
+        self.indexes: "OrderedDict[str, WorkspaceIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str, root: Path) -> WorkspaceIndex:
+        """Get the index of a conversation's workspace, creating an empty one if needed."""
+        with self._lock:
+            index = self.indexes.get(conversation_id)
+            if index is None or index.root != root:
+                index = self.indexes[conversation_id] = WorkspaceIndex(root)
+            self.indexes.move_to_end(conversation_id)
+            while len(self.indexes) > self.max_indexes:
+                self.indexes.popitem(last=False)
+            return index
+
+    def retrieve(self, conversation_id: str, root: Path, question: str, top_k: int,
+                 pattern: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Update a workspace's index and search it.
+
+        Args:
+            conversation_id: The ID of the conversation
+            root: The workspace directory
+            question: The question or keywords
+            top_k: Chunks returned
+            pattern: Optional glob restricting the files searched
+
+        Returns:
+            Dictionary with the "results" (see WorkspaceIndex.search), the
+            "files" and "chunks" indexed and the files "updated" by this call
+        """
+        index = self.get(conversation_id, root)
+        with index.lock:
+            start = time.perf_counter()
+            updated = index.refresh()
+            results = index.search(question, top_k, pattern)
+            logger.debug("Retrieved from %d files (%d updated) in %.3fs", len(index.files), updated,
+                         time.perf_counter() - start)
+            files = sum(1 for indexed in index.files.values() if indexed.chunks)
+            return {"results": results, "files": files, "chunks": index.chunk_count, "updated": updated}
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(index.chunk_count for index in list(self.indexes.values()))
+
+
+# Create a singleton instance
+retrieval_indexes = RetrievalIndexes(settings.RETRIEVAL_MAX_INDEXES)
+RETRIEVAL_INDEX_CHUNKS.set_function(lambda: retrieval_indexes.chunk_count)
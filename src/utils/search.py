@@ -0,0 +1,279 @@
+import asyncio
+import functools
+import json
+import time
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from ..config import settings
+from .resilience import CircuitBreaker, backoff_delay, hedged
+from .telemetry import SEARCH_PROVIDER_REQUESTS, SEARCH_PROVIDER_DURATION
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rank constant of reciprocal rank fusion; larger values flatten the rank differences
+RRF_K = 60
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "ref", "ref_src", "_hsenc", "_hsmi"}
+
+# Consecutive failures after which a provider is skipped, and for how long
+PROVIDER_FAILURE_THRESHOLD = 3
+PROVIDER_COOLDOWN = 60.0
+
+
+class SearchProvider(ABC):
+    """A web search backend returning results as dictionaries with href, title and body."""
+
+    name: str
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Run a query; called in a worker thread.
+
+        Args:
+            query: The search query
+            max_results: Maximum number of results
+
+        Returns:
+            Results in rank order
+        """
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Searches DuckDuckGo through the duckduckgo_search package."""
+
+    name = "duckduckgo"
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+
+class SearchAPIProvider(SearchProvider):
+    """
+    Searches a JSON endpoint, e.g. the local stand-in in benchmarks/stand_ins.py.
+
+    The endpoint is called as ``GET <url>?q=<query>&max_results=<n>`` and
+    returns a JSON list of results with href, title and body.
+    """
+
+    name = "api"
+
+    def __init__(self, url: str):
+        """
+        Initialize the provider.
+
+        Args:
+            url: URL of the search endpoint
+        """
+        self.url = url
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        params = urllib.parse.urlencode({"q": query, "max_results": max_results})
+        with urllib.request.urlopen(f"{self.url}?{params}", timeout=settings.SEARCH_TIMEOUT) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+
+def unwrap_redirect(url: str) -> str:
+    """Return the target of a DuckDuckGo redirect link, or the URL itself."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.netloc.endswith("duckduckgo.com") and parts.path.startswith("/l/"):
+        target = urllib.parse.parse_qs(parts.query).get("uddg")
+        if target:
+            return target[0]
+    return url
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to a key shared by the URLs of the same page.
+
+    The scheme is ignored, the host is lowercased without "www.", tracking
+    parameters and the fragment are dropped, the remaining parameters are
+    sorted and a trailing slash is removed.
+
+    Args:
+        url: The URL as returned by a provider
+
+    Returns:
+        The canonical form, used only to compare URLs
+    """
+    parts = urllib.parse.urlsplit(unwrap_redirect(url.strip()))
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    params = sorted(
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    return urllib.parse.urlunsplit(("", host, path, urllib.parse.urlencode(params), ""))
+
+
+def fuse_results(ranked_lists: List[Tuple[str, str, List[Dict[str, str]]]], max_results: int) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists into one with reciprocal rank fusion.
+
+    Results are deduplicated by canonical URL. Each scores the sum of
+    1 / (RRF_K + rank) over the lists it appears in, so pages found by
+    several queries or providers rise to the top. The longest title and
+    snippet seen for a page are kept.
+
+    Args:
+        ranked_lists: Tuples of (query, provider name, results in rank order)
+        max_results: Maximum number of results returned
+
+    Returns:
+        Results with href, title, body, score and the queries and providers that found them
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for query, provider, results in ranked_lists:
+        for rank, result in enumerate(results, 1):
+            href = result.get("href") or result.get("url")
+            if not href:
+                continue
+            key = canonicalize_url(href)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {
+                    "href": unwrap_redirect(href), "title": "", "body": "", "score": 0.0, "queries": [], "providers": []
+                }
+            entry["score"] += 1.0 / (RRF_K + rank)
+            for field in ("title", "body"):
+                value = result.get(field) or ""
+                if len(value) > len(entry[field]):
+                    entry[field] = value
+            if query not in entry["queries"]:
+                entry["queries"].append(query)
+            if provider not in entry["providers"]:
+                entry["providers"].append(provider)
+    # Sorting is stable, so ties keep the order in which pages were first found
+    return sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)[:max_results]
+
+
+class SearchService:
+    """
+    Runs several queries across several search providers in one call.
+
+    Every (query, provider) pair is searched concurrently, in a thread pool of
+    the service's own so that a hanging provider cannot starve the threads
+    model calls run in. A call slower than SEARCH_HEDGE_DELAY is hedged with
+    a second copy, failures are retried with jittered backoff, and pairs
+    still unanswered after SEARCH_TIMEOUT are given up, so one slow or
+    failing provider costs its results but not the whole search. A provider
+    failing repeatedly is skipped for a while. The result lists are merged
+    by reciprocal rank fusion into one deduplicated list.
+    """
+
+    def __init__(self):
+        """Initialize the service with the providers named in SEARCH_PROVIDERS."""
+        self.providers: Dict[str, SearchProvider] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        for name in settings.SEARCH_PROVIDERS:
+            if name == "duckduckgo":
+                self.register_provider(DuckDuckGoProvider())
+            elif name == "api" and settings.SEARCH_API_URL:
+                self.register_provider(SearchAPIProvider(settings.SEARCH_API_URL))
+            else:
+                logger.warning("Unknown or unconfigured search provider: %s", name)
+
+    def register_provider(self, provider: SearchProvider) -> None:
+        """
+        Add a search provider, replacing one with the same name.
+
+        Args:
+            provider: The provider
+        """
+        self.providers[provider.name] = provider
+        self.breakers[provider.name] = CircuitBreaker(PROVIDER_FAILURE_THRESHOLD, PROVIDER_COOLDOWN)
+
+    async def search(self, queries: List[str], max_results: int) -> Dict[str, Any]:
+        """
+        Search all queries on all available providers and merge the results.
+
+        Args:
+            queries: The search queries
+            max_results: Maximum number of merged results, also asked of each provider per query
+
+        Returns:
+            Dictionary with the merged "results" (see fuse_results) and the
+            "errors" of (query, provider) pairs that returned nothing, as
+            dictionaries with query, provider and error
+
+        Raises:
+            RuntimeError: If no provider is available
+        """
+        providers = [provider for name, provider in self.providers.items() if self.breakers[name].allow_request()]
+        if not providers:
+            raise RuntimeError("No search provider is available")
+
+        pairs = [(query, provider) for query in queries for provider in providers]
+        tasks = [asyncio.ensure_future(self._search_one(query, provider, max_results)) for query, provider in pairs]
+        done, pending = await asyncio.wait(tasks, timeout=settings.SEARCH_TIMEOUT)
+        for task in pending:
+            task.cancel()
+
+        ranked_lists = []
+        errors = []
+        for (query, provider), task in zip(pairs, tasks):
+            if task in pending:
+                error = f"No answer within {settings.SEARCH_TIMEOUT} seconds"
+                # A provider that hangs is failing, like one that errors
+                self.breakers[provider.name].record_failure()
+                SEARCH_PROVIDER_REQUESTS.inc(provider=provider.name, status="timeout")
+            elif task.exception() is not None:
+                error = str(task.exception()) or type(task.exception()).__name__
+            else:
+                ranked_lists.append((query, provider.name, task.result()))
+                continue
+            errors.append({"query": query, "provider": provider.name, "error": error})
+        return {"results": fuse_results(ranked_lists, max_results), "errors": errors}
+
+    async def _search_one(self, query: str, provider: SearchProvider, max_results: int) -> List[Dict[str, str]]:
+        """Run one query on one provider with hedging and retries."""
+        breaker = self.breakers[provider.name]
+        call = functools.partial(provider.search, query, max_results)
+        for attempt in range(settings.SEARCH_MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                results = await hedged(call, settings.SEARCH_HEDGE_DELAY, self._get_thread_pool())
+            except asyncio.CancelledError:
+                # Cancelled at SEARCH_TIMEOUT or with the caller; a half-open probe held by this call must not stay taken
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                SEARCH_PROVIDER_REQUESTS.inc(provider=provider.name, status="error")
+                logger.warning("Search on %s failed (attempt %d): %s", provider.name, attempt + 1, e)
+                if attempt == settings.SEARCH_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, 0.5, 4.0))
+                continue
+            breaker.record_success()
+            SEARCH_PROVIDER_REQUESTS.inc(provider=provider.name, status="ok")
+            SEARCH_PROVIDER_DURATION.observe(time.perf_counter() - start, provider=provider.name)
+            return results or []
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=settings.SEARCH_THREAD_POOL_SIZE, thread_name_prefix="search")
+        return self._thread_pool
+
+    def shutdown(self) -> None:
+        """Shut down the thread pool without waiting for running provider calls."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+# Create a singleton instance
+search_service = SearchService()
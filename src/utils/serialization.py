@@ -0,0 +1,69 @@
+import json
+import functools
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; the standard library is used without it
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Serialize values JSON has no type for."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serialize a value as compact UTF-8 JSON.
+
+    Uses orjson when it is installed and the standard library otherwise.
+    Pydantic models nested in the value are dumped; other unknown types
+    become strings.
+
+    Args:
+        value: The value to serialize
+
+    Returns:
+        The JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def type_adapter(type_: Any) -> TypeAdapter:
+    """
+    Get the TypeAdapter of a type, built once and reused.
+
+    Args:
+        type_: A pydantic model or other type, e.g. ``List[Job]``
+
+    Returns:
+        The cached TypeAdapter
+    """
+    return TypeAdapter(type_)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that trusts its content.
+
+    Pydantic models are serialized by their cached TypeAdapter, without
+    validating them again; other content is serialized with ``dumps``.
+    Return one from an endpoint (it then skips ``response_model``
+    validation) for responses built from already validated data.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return type_adapter(type(content)).dump_json(content)
+        return dumps(content)
@@ -0,0 +1,519 @@
+import json
+import time
+import asyncio
+import random
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from ..config import settings
+
+
+# Latency buckets in seconds, from fast tool calls to slow model responses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the Prometheus text format."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Format a label set for the Prometheus text format."""
+    if not labels:
+        return ""
+    escaped = (
+        name + '="' + str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metric:
+    """
+    Base class for metrics.
+
+    Values are kept per label combination in a dict guarded by a lock, so
+    updating a metric is a dict lookup and an addition.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        """
+        Initialize the metric.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the metric's labels
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], Any] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Turn label keyword arguments into a lookup key."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return (sample name, labels, value) tuples for exposition."""
+        with self.lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter for a label set."""
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down, either set directly or read on scrape."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge for a label set."""
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the (unlabelled) gauge from a function at scrape time."""
+        self.function = function
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        if self.function is not None:
+            return [(self.name, {}, self.function())]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        """Record an observation for a label set."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self.lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+
+        samples = []
+        for key, counts, total, count in snapshot:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed on /metrics."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, returning it for assignment."""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """
+    A timed operation within a trace, modelled on OpenTelemetry spans.
+
+    Spans started while another span is current become its children, so the
+    spans of one request form a tree rooted at the request span.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+                 "attributes", "events", "status", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any],
+                 sampled: bool = True):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = "ok"
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute to the span."""
+        if self.sampled:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        """Record a point-in-time event within the span."""
+        if self.sampled:
+            self.events.append({"name": name, "time": time.time(), "attributes": attributes})
+
+    def record_exception(self, error: BaseException) -> None:
+        """Mark the span as failed by an exception."""
+        self.status = "error"
+        self.add_event("exception", type=type(error).__name__, message=str(error))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the span using OpenTelemetry field names."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": int(self.start_time * 1e9),
+            "endTimeUnixNano": int((self.end_time or time.time()) * 1e9),
+            "durationMs": round(((self.end_time or time.time()) - self.start_time) * 1000, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": self.status
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Minimal tracer producing OpenTelemetry-shaped traces.
+
+    The sampling decision is made once per trace at its root span; spans of
+    unsampled traces are still created for context propagation but record
+    nothing. Finished traces are kept in a bounded in-memory buffer (served on
+    /api/traces) and optionally appended as JSON lines to TRACE_EXPORT_PATH.
+    """
+
+    def __init__(self, sample_rate: float, buffer_size: int, export_path: Optional[str] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            sample_rate: Fraction of traces to record
+            buffer_size: Number of finished traces to keep in memory
+            export_path: Optional JSON lines file receiving finished traces
+        """
+        self.sample_rate = sample_rate
+        self.export_path = export_path
+        self.export_file = None
+        self.traces: deque = deque(maxlen=buffer_size)
+        # {trace_id: [finished spans]} for traces whose root is still open
+        self.pending: Dict[str, List[Span]] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Run a block inside a new span.
+
+        Args:
+            name: Span name, e.g. "llm.call"
+            **attributes: Initial span attributes
+
+        Yields:
+            The span, for adding attributes and events
+        """
+        parent = _current_span.get()
+        if parent is None:
+            sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+            span = Span(name, f"{random.getrandbits(128):032x}", None, attributes, sampled)
+            if sampled:
+                with self.lock:
+                    self.pending[span.trace_id] = []
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes, parent.sampled)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time()
+            if span.sampled:
+                self._finish(span)
+
+    def current_span(self) -> Optional[Span]:
+        """Return the span active in the current context, if any."""
+        return _current_span.get()
+
+    def _finish(self, span: Span) -> None:
+        """Collect a finished span, completing its trace when the root ends."""
+        with self.lock:
+            spans = self.pending.get(span.trace_id)
+            if spans is None:
+                # The root already ended, e.g. a discarded hedged call finishing late
+                return
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del self.pending[span.trace_id]
+            trace = {
+                "traceId": span.trace_id,
+                "name": span.name,
+                "startTimeUnixNano": int(span.start_time * 1e9),
+                "durationMs": round((span.end_time - span.start_time) * 1000, 3),
+                "spans": [s.to_dict() for s in spans]
+            }
+            self.traces.append(trace)
+
+        if self.export_path:
+            line = json.dumps(trace, default=str) + "\n"
+            with self.lock:
+                if self.export_file is None:
+                    self.export_file = open(self.export_path, "a", encoding="utf-8", buffering=1)
+                self.export_file.write(line)
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return summaries of the most recent traces, newest first."""
+        with self.lock:
+            traces = list(self.traces)[-limit:]
+        return [
+            {
+                "traceId": trace["traceId"],
+                "name": trace["name"],
+                "startTimeUnixNano": trace["startTimeUnixNano"],
+                "durationMs": trace["durationMs"],
+                "spanCount": len(trace["spans"])
+            }
+            for trace in reversed(traces)
+        ]
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Return a finished trace with all its spans."""
+        with self.lock:
+            for trace in self.traces:
+                if trace["traceId"] == trace_id:
+                    return trace
+        return None
+
+
+def usage_tokens(usage: Any) -> Dict[str, int]:
+    """
+    Read token counts from a response's usage, whether an SDK object or a dict.
+
+    Returns:
+        Dictionary with input, output, cache_read and cache_creation counts
+    """
+    fields = {
+        "input": "input_tokens",
+        "output": "output_tokens",
+        "cache_read": "cache_read_input_tokens",
+        "cache_creation": "cache_creation_input_tokens"
+    }
+    tokens = {}
+    for kind, field in fields.items():
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        if value:
+            tokens[kind] = value
+    return tokens
+
+
+def instrument_tool(execute: Callable) -> Callable:
+    """
+    Wrap a tool's execute method with a span and duration metrics.
+
+    Args:
+        execute: The tool's async execute method
+
+    Returns:
+        The wrapped method
+    """
+    @functools.wraps(execute)
+    async def wrapper(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        status = "success"
+        with tracer.span(f"tool.{self.name}", tool=self.name, conversation_id=conversation_id):
+            try:
+                return await execute(self, conversation_id, input_data)
+            except asyncio.CancelledError:
+                # Abandoned, e.g. after the tool's timeout
+                status = "cancelled"
+                raise
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                TOOL_DURATION.observe(time.perf_counter() - start, tool=self.name, status=status)
+    return wrapper
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware opening a root span per HTTP request and recording request metrics.
+
+    Requests are labelled by route template (e.g. /api/conversations/{conversation_id}/jobs)
+    rather than raw path to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with tracer.span(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                span.set_attribute("status_code", status_code)
+                if status_code >= 500:
+                    span.status = "error"
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start, method=scope["method"], route=route, status=status_code
+                )
+
+
+metrics = MetricsRegistry()
+tracer = Tracer(
+    settings.TRACE_SAMPLE_RATE,
+    settings.TRACE_BUFFER_SIZE,
+    settings.TRACE_EXPORT_PATH or None
+)
+
+# HTTP
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status", ("method", "route", "status")
+)
+
+# LLM calls
+LLM_REQUEST_DURATION = metrics.histogram(
+    "llm_request_duration_seconds", "Latency of a single model call attempt", ("provider", "model", "outcome")
+)
+LLM_TIME_TO_FIRST_TOKEN = metrics.histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first output token; equals full latency for non-streamed calls",
+    ("provider", "model")
+)
+LLM_TOKENS = metrics.counter(
+    "llm_tokens_total", "Tokens processed by type (input, output, cache_read, cache_creation)",
+    ("provider", "model", "type")
+)
+LLM_ERRORS = metrics.counter("llm_errors_total", "Failed model call attempts by error", ("provider", "model", "error"))
+
+# Tools and subprocesses
+TOOL_DURATION = metrics.histogram(
+    "tool_execution_duration_seconds", "Tool execution time by tool and status", ("tool", "status")
+)
+TOOL_QUEUE_WAIT = metrics.histogram(
+    "tool_queue_wait_seconds", "Time tool calls wait for the tool's concurrency limit", ("tool",)
+)
+TOOL_CACHE_REQUESTS = metrics.counter(
+    "tool_cache_requests_total", "Calls to cacheable tools by cache result (hit, shared, miss)", ("tool", "result")
+)
+TOOL_RESULT_CHARS = metrics.counter(
+    "tool_result_chars_total", "Size of tool results before and after shaping (stage raw or shaped)", ("tool", "stage")
+)
+TOOL_TIMEOUTS = metrics.counter("tool_timeouts_total", "Tool calls abandoned after the tool's timeout", ("tool",))
+SUBPROCESS_SPAWNS = metrics.counter("subprocess_spawns_total", "Child processes started, by source", ("source",))
+SEARCH_PROVIDER_REQUESTS = metrics.counter(
+    "search_provider_requests_total", "Search provider calls by provider and status (ok, error, timeout)", ("provider", "status")
+)
+SEARCH_PROVIDER_DURATION = metrics.histogram(
+    "search_provider_duration_seconds", "Latency of successful search provider calls, hedging included", ("provider",)
+)
+RESEARCH_PAGE_FETCHES = metrics.counter(
+    "research_page_fetches_total", "Pages fetched by the research tool by status (ok, rendered, error, timeout)", ("status",)
+)
+RETRIEVAL_FILES_INDEXED = metrics.counter("retrieval_files_indexed_total", "Workspace files read into a retrieval index")
+
+# Queues
+ADMISSION_WAIT = metrics.histogram("admission_wait_seconds", "Time spent waiting for an LLM concurrency slot")
+ADMISSION_REJECTIONS = metrics.counter("admission_rejections_total", "Requests rejected by admission control", ("reason",))
+ADMISSION_ACTIVE = metrics.gauge("admission_active_requests", "Model calls holding a concurrency slot")
+ADMISSION_WAITING = metrics.gauge("admission_queue_depth", "Model calls waiting for a concurrency slot")
+BATCHES_IN_PROGRESS = metrics.gauge("batches_in_progress", "Batches being polled or processed by this worker")
+SHELL_SESSIONS = metrics.gauge("shell_sessions_open", "Persistent shell sessions open in this worker")
+BROWSER_CONTEXTS = metrics.gauge("browser_contexts_open", "Browser contexts in use or pooled for reuse in this worker")
+RETRIEVAL_INDEX_CHUNKS = metrics.gauge("retrieval_index_chunks", "Chunks held in the workspace retrieval indexes of this worker")
+JOBS_RUNNING = metrics.gauge("jobs_running", "Background jobs started by this worker that are still running")
+CONVERSATION_ACTORS = metrics.gauge("conversation_actors", "Conversations with a live turn actor in this worker")
+CONVERSATION_QUEUE_DEPTH = metrics.gauge("conversation_queue_depth", "Turns waiting for an earlier turn of their conversation")
+CONVERSATION_TURN_WAIT = metrics.histogram(
+    "conversation_turn_wait_seconds", "Time a turn waits for earlier turns of the same conversation"
+)
+WEBSOCKET_CONNECTIONS = metrics.gauge("websocket_connections", "Open conversation WebSocket connections")
+WEBSOCKET_SLOW_CONSUMERS = metrics.counter(
+    "websocket_slow_consumers_total", "WebSocket clients disconnected for not reading events fast enough"
+)
+
+# Logging
+LOG_RECORDS_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
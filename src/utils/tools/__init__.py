@@ -1 +1,3 @@
-from .registry import tool_registry 
\ No newline at end of file
+from .registry import tool_registry
+from .dispatcher import tool_dispatcher, ToolTimeoutError
+from . import manager  # Registers the built-in tools
@@ -1,19 +1,58 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
-from ...models.chat import ToolParameter
+from typing import Dict, Any, List, Optional, Hashable
+from ...models.chat import ToolParameter, ToolDefinition
+from ..telemetry import instrument_tool
+from ..logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class BaseTool(ABC):
-    """Base class for all tools."""
+    """
+    Base class for all tools.
+    
+    Tools running on the event loop implement the async ``execute``. Tools
+    doing blocking or CPU-heavy work implement the synchronous ``run``
+    instead and set ``executor`` to "thread" or "process"; ``execute`` then
+    runs it in the tool dispatcher's thread or process pool.
+    """
     
     name: str
     description: str
     
+    # Resource policy enforced by the tool dispatcher; TOOL_LIMITS overrides it per tool
+    # Maximum concurrent calls, or None for no limit
+    max_concurrency: Optional[int] = None
+    # Seconds before a call is abandoned, or None for TOOL_DEFAULT_TIMEOUT
+    timeout: Optional[float] = None
+    # Where the tool runs: "loop", "thread" or "process"
+    executor: str = "loop"
+    # Whether results of identical calls may be reused, as long as cache_token is unchanged
+    cacheable: bool = False
+    # Seconds a cached result stays valid, or None until cache_token changes
+    cache_ttl: Optional[float] = None
+    # Longest result kept in the conversation, or None for TOOL_RESULT_MAX_CHARS; see shaping.py
+    max_result_chars: Optional[int] = None
+    # Whether a result's "image" key may name an image in the workspace that is sent to the model
+    image_results: bool = False
+    
+    # Validated definition, built on first use by definition()
+    _definition: Optional[ToolDefinition] = None
+    
+    def __init_subclass__(cls, **kwargs):
+        """Instrument each tool's execute method with a span and duration metrics."""
+        super().__init_subclass__(**kwargs)
+        # Tools implementing run inherit execute and are instrumented through it
+        if "execute" not in cls.__dict__ and "run" in cls.__dict__:
+            cls.execute = instrument_tool(BaseTool.execute)
+        elif "execute" in cls.__dict__ and not getattr(cls.execute, "__isabstractmethod__", False):
+            cls.execute = instrument_tool(cls.__dict__["execute"])
+    
     def __init__(self):
         """Initialize the tool with parameters."""
         # Call the method to get parameters
         self.parameters = self._get_parameters()
-        print(f"Initialized tool: {self.name} with {len(self.parameters)} parameters")
+        logger.debug("Initialized tool: %s with %d parameters", self.name, len(self.parameters))
     
     @abstractmethod
     def _get_parameters(self) -> List[ToolParameter]:
@@ -25,11 +64,13 @@ class BaseTool(ABC):
         """
         pass
     
-    @abstractmethod
     async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
         """
         Execute the tool with the provided input.
         
+        By default, runs ``run`` in the thread or process pool. Tools that
+        run on the event loop override this.
+        
         Args:
             conversation_id: The ID of the conversation
             input_data: Input parameters for the tool
@@ -37,7 +78,53 @@ class BaseTool(ABC):
         Returns:
             Result of the tool execution
         """
-        pass
+        # Imported here: the dispatcher imports the registry, which imports this module
+        from .dispatcher import tool_dispatcher
+        return await tool_dispatcher.run_blocking(self, conversation_id, input_data)
+    
+    def run(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Execute the tool synchronously, outside the event loop.
+        
+        Implemented by tools with executor "thread" or "process".
+        
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters for the tool
+            
+        Returns:
+            Result of the tool execution
+        """
+        raise NotImplementedError(f"Tool {self.name} does not implement run")
+    
+    def cache_token(self, conversation_id: str, input_data: Dict[str, Any]) -> Optional[Hashable]:
+        """
+        Describe the state a cacheable tool's result depends on.
+        
+        A cached result is reused only while the token is unchanged, e.g. a
+        file's modification time and size. Tools whose results only expire
+        with cache_ttl keep the default.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters for the tool
+            
+        Returns:
+            A hashable token, or None to run this call without the cache
+        """
+        return ""
+    
+    def definition(self) -> ToolDefinition:
+        """
+        Get the tool's definition, validated once and shared by every tool call
+        referring to the tool; callers must not modify it.
+        
+        Returns:
+            The tool definition
+        """
+        if self._definition is None:
+            self._definition = ToolDefinition(name=self.name, description=self.description, parameters=self.parameters)
+        return self._definition
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -52,6 +139,26 @@ class BaseTool(ABC):
             "parameters": [param.dict() for param in self.parameters]
         }
     
+    def to_schema(self) -> Dict[str, Any]:
+        """
+        Convert the tool to the JSON schema format expected by LLM APIs.
+        
+        Returns:
+            Tool definition with name, description and input_schema
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    param.name: {"type": param.type, "description": param.description}
+                    for param in self.parameters
+                },
+                "required": [param.name for param in self.parameters if param.required]
+            }
+        }
+    
     def validate_input(self, input_data: Dict[str, Any]) -> Optional[str]:
         """
         Validate the input data against the tool's parameters.
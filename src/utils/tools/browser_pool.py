@@ -0,0 +1,146 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, List, Optional
+from ...config import settings
+from ..telemetry import SUBPROCESS_SPAWNS, BROWSER_CONTEXTS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BrowserPool:
+    """
+    A headless Chromium shared by the browser tools, with reusable contexts.
+
+    Starting a browser takes about a second and a new context a few tens of
+    milliseconds, while opening a page in a warm context is nearly free. The
+    browser is started on first use and closed after BROWSER_IDLE_TIMEOUT
+    seconds without pages; up to BROWSER_POOL_CONTEXTS idle contexts are kept
+    and their cookies are cleared before reuse. Playwright is imported only
+    when the browser is first started.
+    """
+
+    def __init__(self):
+        """Initialize the pool without starting a browser."""
+        self._playwright: Any = None
+        self._browser: Any = None
+        # Idle contexts of the current browser
+        self._contexts: List[Any] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._closing: Optional[asyncio.Task] = None
+        self.in_use = 0
+
+    @property
+    def open_contexts(self) -> int:
+        """Contexts in use or kept for reuse."""
+        return self.in_use + len(self._contexts)
+
+    async def _get_browser(self) -> Any:
+        """Get the browser, starting it if it is not running."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            await self._close_browser()
+            try:
+                from playwright.async_api import async_playwright
+            except ImportError as e:
+                raise RuntimeError(
+                    "Browser tools need playwright: pip install playwright && playwright install chromium"
+                ) from e
+            self._playwright = await async_playwright().start()
+            SUBPROCESS_SPAWNS.inc(source="browser")
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            logger.info("Started headless browser")
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self, width: int, height: int) -> AsyncIterator[Any]:
+        """
+        Open a page in a pooled context.
+
+        The page is closed on exit. Its context goes back to the pool unless
+        the block raised, in which case the context is closed, since it may
+        be left in an unknown state.
+
+        Args:
+            width: Viewport width in CSS pixels
+            height: Viewport height in CSS pixels
+
+        Yields:
+            A Playwright page
+        """
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        browser = await self._get_browser()
+        context = self._contexts.pop() if self._contexts else await browser.new_context(device_scale_factor=1)
+        self.in_use += 1
+        reusable = False
+        try:
+            page = await context.new_page()
+            try:
+                await page.set_viewport_size({"width": width, "height": height})
+                yield page
+                reusable = True
+            finally:
+                with suppress(Exception):
+                    await page.close()
+        finally:
+            self.in_use -= 1
+            await self._release(browser, context, reusable)
+
+    async def _release(self, browser: Any, context: Any, reusable: bool) -> None:
+        """Return a context to the pool or close it, and start the idle timer."""
+        if reusable and browser is self._browser and len(self._contexts) < settings.BROWSER_POOL_CONTEXTS:
+            try:
+                await context.clear_cookies()
+                self._contexts.append(context)
+            except Exception:
+                reusable = False
+        else:
+            reusable = False
+        if not reusable:
+            with suppress(Exception):
+                await context.close()
+        if self.in_use == 0 and self._browser is not None and settings.BROWSER_IDLE_TIMEOUT > 0:
+            self._idle_timer = asyncio.get_running_loop().call_later(settings.BROWSER_IDLE_TIMEOUT, self._close_idle)
+
+    def _close_idle(self) -> None:
+        """Close the browser if no page was opened since the idle timer started."""
+        self._idle_timer = None
+        if self.in_use == 0:
+            logger.info("Closing idle headless browser")
+            self._closing = asyncio.ensure_future(self.close())
+
+    async def _close_browser(self) -> None:
+        """Close the pooled contexts, the browser and Playwright."""
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            with suppress(Exception):
+                await context.close()
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            with suppress(Exception):
+                await browser.close()
+        playwright, self._playwright = self._playwright, None
+        if playwright is not None:
+            with suppress(Exception):
+                await playwright.stop()
+
+    async def close(self) -> None:
+        """Close the browser; the next page starts a new one."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self._close_browser()
+
+
+# Create a singleton instance
+browser_pool = BrowserPool()
+BROWSER_CONTEXTS.set_function(lambda: browser_pool.open_contexts)
@@ -0,0 +1,102 @@
+import copy
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Hashable
+from ..telemetry import TOOL_CACHE_REQUESTS
+
+
+class ToolResultCache:
+    """
+    In-memory LRU cache of tool results.
+
+    Entries are keyed on tool name, conversation and normalized input, and
+    stored with the tool's validity token (e.g. a file's mtime and size) and
+    an optional expiry. A lookup hits only if the token is unchanged and the
+    entry has not expired. Identical calls arriving while the first is still
+    running wait for its result instead of running the tool again. Failed
+    calls are not cached.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of results kept; 0 disables caching
+        """
+        self.max_entries = max_entries
+        # {key: (token, expires_at or None, result)}, least recently used first
+        self.entries: "OrderedDict[str, Tuple[Hashable, Optional[float], Any]]" = OrderedDict()
+        # {key: (token, future)} for calls still running
+        self.inflight: Dict[str, Tuple[Hashable, asyncio.Future]] = {}
+
+    @staticmethod
+    def make_key(tool_name: str, conversation_id: str, input_data: Dict[str, Any]) -> str:
+        """Build a cache key; inputs differing only in key order share an entry."""
+        return json.dumps([tool_name, conversation_id, input_data], sort_keys=True, separators=(",", ":"), default=str)
+
+    async def get_or_run(self, tool_name: str, key: str, token: Hashable, ttl: Optional[float],
+                         run: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return a cached result, or run the call and cache its result.
+
+        Args:
+            tool_name: Name of the tool, for metrics
+            key: Cache key from make_key
+            token: Validity token of the tool's current state
+            ttl: Seconds the result stays valid, or None for no expiry
+            run: Coroutine function running the tool call
+
+        Returns:
+            The tool result; mutable results are copied so callers cannot change the cached one
+        """
+        if self.max_entries <= 0:
+            return await run()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            cached_token, expires_at, result = entry
+            if cached_token == token and (expires_at is None or expires_at > time.monotonic()):
+                self.entries.move_to_end(key)
+                TOOL_CACHE_REQUESTS.inc(tool=tool_name, result="hit")
+                return self._copy(result)
+            del self.entries[key]
+
+        inflight = self.inflight.get(key)
+        if inflight is not None and inflight[0] == token:
+            TOOL_CACHE_REQUESTS.inc(tool=tool_name, result="shared")
+            return self._copy(await asyncio.shield(inflight[1]))
+
+        TOOL_CACHE_REQUESTS.inc(tool=tool_name, result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = (token, future)
+        try:
+            result = await run()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception retrieved; only waiting callers should see it
+                future.exception()
+            raise
+        finally:
+            if self.inflight.get(key, (None, None))[1] is future:
+                del self.inflight[key]
+
+        future.set_result(result)
+        self.entries[key] = (token, time.monotonic() + ttl if ttl else None, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return self._copy(result)
+
+    @staticmethod
+    def _copy(result: Any) -> Any:
+        return result if isinstance(result, (str, bytes, int, float, type(None))) else copy.deepcopy(result)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self.entries.clear()
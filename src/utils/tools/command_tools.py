@@ -1,18 +1,27 @@
 import os
-import sys
 import subprocess
 import shlex
+import asyncio
 from typing import Dict, Any, List, Optional
 from .base import BaseTool
 from ...models.chat import ToolParameter
 from ...core.conversation_manager import conversation_manager
+from .shell_session import shell_session_manager
+from ..telemetry import SUBPROCESS_SPAWNS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class RunCommandTool(BaseTool):
     """Tool for running terminal commands within the conversation workspace."""
     
     name = "run_command"
-    description = "Run a terminal command in the conversation workspace."
+    description = (
+        "Run a terminal command in the conversation workspace. "
+        "Set persistent to true to run it in a long-lived shell that keeps the working directory, "
+        "environment variables and activated virtualenvs between calls."
+    )
     
     # List of forbidden commands for security
     FORBIDDEN_COMMANDS = [
@@ -30,6 +39,9 @@ class RunCommandTool(BaseTool):
     # Max command execution time in seconds
     MAX_EXECUTION_TIME = 30
     
+    max_concurrency = 16
+    max_result_chars = 10000
+    
     def _get_parameters(self) -> List[ToolParameter]:
         """Define the parameters for this tool."""
         return [
@@ -44,6 +56,13 @@ class RunCommandTool(BaseTool):
                 description="Maximum execution time in seconds (default: 30)",
                 required=False,
                 type="integer"
+            ),
+            ToolParameter(
+                name="persistent",
+                description="Run the command in the conversation's persistent shell session so that state such as "
+                            "the current directory and exported variables carries over to later calls (default: false)",
+                required=False,
+                type="boolean"
             )
         ]
     
@@ -101,53 +120,118 @@ class RunCommandTool(BaseTool):
         # Get the workspace path
         workspace_path = conversation_manager.get_workspace_path(conversation_id)
         
-        print(f"Running command in workspace {workspace_path}: {command}", file=sys.stderr)
+        if input_data.get("persistent", False):
+            return await self._execute_persistent(conversation_id, workspace_path, command, timeout)
+        
+        logger.info("Running command in workspace %s: %s", workspace_path, command)
         
         try:
-            # Run the command in the workspace directory
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                cwd=str(workspace_path),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Wait for the command to complete with timeout
-            stdout, stderr = process.communicate(timeout=timeout)
+            # Run the command in the workspace directory, waiting off the event loop
+            stdout, stderr, returncode = await asyncio.to_thread(self._run_once, workspace_path, command, timeout)
             
             # Create result dictionary
             result = {
-                "exit_code": process.returncode,
+                "exit_code": returncode,
                 "stdout": stdout,
                 "stderr": stderr
             }
             
             # Log the execution result
-            print(f"Command execution completed (exit code: {process.returncode})", file=sys.stderr)
+            logger.debug("Command execution completed (exit code: %s)", returncode)
             
             # Save the command output as a file in the workspace for reference
-            output_file = workspace_path / f"command_output_{conversation_id[:8]}.txt"
-            with open(output_file, "a", encoding="utf-8") as f:
-                f.write(f"\n--- Command: {command} ---\n")
-                f.write(f"Exit Code: {process.returncode}\n")
-                f.write(f"--- STDOUT ---\n{stdout}\n")
-                f.write(f"--- STDERR ---\n{stderr}\n")
+            self._save_output(conversation_id, workspace_path, command, result)
             
             return result
             
         except subprocess.TimeoutExpired:
-            print(f"Command timed out after {timeout} seconds: {command}", file=sys.stderr)
+            logger.warning("Command timed out after %s seconds: %s", timeout, command)
             return {
                 "exit_code": -1,
                 "stdout": "",
                 "stderr": f"Command timed out after {timeout} seconds"
             }
         except Exception as e:
-            print(f"Error running command: {str(e)}", file=sys.stderr)
+            logger.error("Error running command: %s", e)
+            return {
+                "exit_code": -1,
+                "stdout": "",
+                "stderr": f"Error: {str(e)}"
+            }
+    
+    def _run_once(self, workspace_path, command: str, timeout: int):
+        """
+        Run a command in a new shell and wait for it.
+        
+        Returns:
+            Tuple of (stdout, stderr, exit code)
+            
+        Raises:
+            subprocess.TimeoutExpired: If the command runs past the timeout; it is killed
+        """
+        SUBPROCESS_SPAWNS.inc(source="run_command")
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            cwd=str(workspace_path),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return stdout, stderr, process.returncode
+    
+    async def _execute_persistent(self, conversation_id: str, workspace_path, command: str, timeout: int) -> Dict[str, Any]:
+        """
+        Run a command in the conversation's persistent shell session.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            workspace_path: Path to the conversation workspace
+            command: The command to run
+            timeout: Maximum execution time in seconds
+            
+        Returns:
+            Output of the command; stdout and stderr are merged by the PTY
+        """
+        logger.info("Running command in persistent shell for %s: %s", conversation_id, command)
+        
+        try:
+            session = shell_session_manager.get_session(conversation_id, workspace_path)
+            result = await asyncio.to_thread(session.run, command, timeout)
+            
+            logger.debug("Persistent command completed (exit code: %s)", result["exit_code"])
+            
+            self._save_output(conversation_id, workspace_path, command, result)
+            
+            return result
+        except Exception as e:
+            logger.error("Error running command in persistent shell: %s", e)
+            shell_session_manager.close_session(conversation_id)
             return {
                 "exit_code": -1,
                 "stdout": "",
                 "stderr": f"Error: {str(e)}"
-            } 
\ No newline at end of file
+            }
+    
+    def _save_output(self, conversation_id: str, workspace_path, command: str, result: Dict[str, Any]) -> None:
+        """
+        Append a command's output to the workspace command log.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            workspace_path: Path to the conversation workspace
+            command: The command that was run
+            result: The result dictionary of the command
+        """
+        output_file = workspace_path / f"command_output_{conversation_id[:8]}.txt"
+        with open(output_file, "a", encoding="utf-8") as f:
+            f.write(f"\n--- Command: {command} ---\n")
+            f.write(f"Exit Code: {result['exit_code']}\n")
+            f.write(f"--- STDOUT ---\n{result['stdout']}\n")
+            f.write(f"--- STDERR ---\n{result['stderr']}\n")
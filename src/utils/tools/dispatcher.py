@@ -0,0 +1,228 @@
+import asyncio
+import functools
+import importlib
+import importlib.util
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Any, Optional, Tuple
+from .base import BaseTool
+from .registry import tool_registry
+from .cache import ToolResultCache
+from ...config import settings
+from ..telemetry import TOOL_QUEUE_WAIT, TOOL_TIMEOUTS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+EXECUTORS = ("loop", "thread", "process")
+
+
+class ToolTimeoutError(Exception):
+    """Raised when a tool call runs longer than the tool's timeout."""
+
+
+# Tool instances constructed in a process pool worker, by class and version of its module file
+_process_tools: Dict[Tuple[str, str, Optional[str], Optional[float]], BaseTool] = {}
+
+
+def _run_in_process(module_name: str, class_name: str, source: Optional[str], version: Optional[float],
+                    conversation_id: str, input_data: Dict[str, Any]) -> Any:
+    """
+    Run a tool's ``run`` method in a process pool worker.
+
+    Modules are imported by name, or executed from ``source`` when given:
+    directory plugins are registered under names workers cannot import, and
+    a module reloaded since the worker loaded it has a new ``version``.
+    """
+    key = (module_name, class_name, source, version)
+    if key not in _process_tools:
+        if source is None:
+            module = importlib.import_module(module_name)
+        else:
+            spec = importlib.util.spec_from_file_location(module_name, source)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+        _process_tools[key] = getattr(module, class_name)()
+    return _process_tools[key].run(conversation_id, input_data)
+
+
+class ToolDispatcher:
+    """
+    Runs tool calls under each tool's resource policy.
+
+    Every tool declares how many calls may run at once, how long a call may
+    take and where it runs (see BaseTool); TOOL_LIMITS overrides these per
+    tool. Calls over a tool's concurrency limit wait for that tool only, so
+    a burst of slow calls to one tool does not hold up the others. Tools
+    running in a thread or process pool keep blocking work off the event
+    loop.
+
+    A call that times out is abandoned: the caller gets ToolTimeoutError
+    right away, but work already running in a pool thread or process cannot
+    be interrupted and finishes in the background.
+
+    Results of cacheable tools are reused for identical calls in the same
+    conversation without running the tool again (see ToolResultCache).
+    """
+
+    def __init__(self):
+        """Initialize the dispatcher; the pools are created on first use."""
+        # {tool_name: (limit, semaphore)}
+        self.semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.cache = ToolResultCache(settings.TOOL_CACHE_MAX_ENTRIES)
+
+    def policy(self, tool: BaseTool) -> Dict[str, Any]:
+        """
+        Get the resource policy of a tool, with TOOL_LIMITS overrides applied.
+
+        Args:
+            tool: The tool
+
+        Returns:
+            Dictionary with max_concurrency, timeout, executor, cacheable, cache_ttl and max_result_chars
+        """
+        policy = {
+            "max_concurrency": tool.max_concurrency,
+            "timeout": tool.timeout if tool.timeout is not None else settings.TOOL_DEFAULT_TIMEOUT,
+            "executor": tool.executor,
+            "cacheable": tool.cacheable,
+            "cache_ttl": tool.cache_ttl,
+            "max_result_chars": tool.max_result_chars
+        }
+        policy.update(settings.TOOL_LIMITS.get(tool.name, {}))
+        if policy["executor"] not in EXECUTORS:
+            raise ValueError(f"Unknown executor for tool {tool.name}: {policy['executor']}")
+        return policy
+
+    def _semaphore(self, tool_name: str, limit: int) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent calls to a tool."""
+        current = self.semaphores.get(tool_name)
+        # A reloaded tool may declare a new limit; calls holding the old semaphore finish under it
+        if current is None or current[0] != limit:
+            current = (limit, asyncio.Semaphore(limit))
+            self.semaphores[tool_name] = current
+        return current[1]
+
+    async def dispatch(self, tool_name: str, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Run a tool call under the tool's concurrency limit and timeout, or
+        return the cached result of an identical call.
+
+        Args:
+            tool_name: Name of the tool
+            conversation_id: The ID of the conversation
+            input_data: Input parameters for the tool
+
+        Returns:
+            Result of the tool execution
+
+        Raises:
+            ValueError: If the tool is not found
+            ToolTimeoutError: If the call takes longer than the tool's timeout
+            Exception: Whatever the tool raises
+        """
+        tool = tool_registry.get_tool(tool_name)
+        policy = self.policy(tool)
+
+        if policy["cacheable"]:
+            token = tool.cache_token(conversation_id, input_data)
+            if token is not None:
+                key = self.cache.make_key(tool.name, conversation_id, input_data)
+                return await self.cache.get_or_run(
+                    tool.name, key, token, policy["cache_ttl"],
+                    lambda: self._run_limited(tool, policy, conversation_id, input_data)
+                )
+        return await self._run_limited(tool, policy, conversation_id, input_data)
+
+    async def _run_limited(self, tool: BaseTool, policy: Dict[str, Any], conversation_id: str,
+                           input_data: Dict[str, Any]) -> Any:
+        """Run a tool call under the policy's concurrency limit and timeout."""
+        if not policy["max_concurrency"]:
+            return await self._run_with_timeout(tool, policy, conversation_id, input_data)
+
+        semaphore = self._semaphore(tool.name, int(policy["max_concurrency"]))
+        start = time.perf_counter()
+        async with semaphore:
+            TOOL_QUEUE_WAIT.observe(time.perf_counter() - start, tool=tool.name)
+            return await self._run_with_timeout(tool, policy, conversation_id, input_data)
+
+    async def _run_with_timeout(self, tool: BaseTool, policy: Dict[str, Any], conversation_id: str,
+                                input_data: Dict[str, Any]) -> Any:
+        """Run a tool call, abandoning it after the policy's timeout."""
+        timeout = policy["timeout"] or None
+        try:
+            return await asyncio.wait_for(tool.execute(conversation_id, input_data), timeout)
+        except asyncio.TimeoutError:
+            TOOL_TIMEOUTS.inc(tool=tool.name)
+            logger.warning("Tool %s timed out after %ss", tool.name, timeout)
+            raise ToolTimeoutError(f"Tool {tool.name} timed out after {timeout} seconds")
+
+    async def run_blocking(self, tool: BaseTool, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Run a tool's blocking ``run`` method in the process pool if its
+        executor is "process", otherwise in the thread pool.
+
+        Process pool workers load the tool's module, from its file for
+        directory plugins and reloaded modules, and construct their own
+        instance of the tool, so the input and result must be picklable.
+
+        Args:
+            tool: The tool
+            conversation_id: The ID of the conversation
+            input_data: Input parameters for the tool
+
+        Returns:
+            Result of the tool's run method
+        """
+        loop = asyncio.get_running_loop()
+        if self.policy(tool)["executor"] == "process":
+            tool_class = type(tool)
+            source, version = tool_registry.modules.get(tool_class.__module__, (None, None))
+            call = functools.partial(
+                _run_in_process, tool_class.__module__, tool_class.__qualname__, source, version,
+                conversation_id, input_data
+            )
+            return await loop.run_in_executor(self._get_process_pool(), call)
+        return await loop.run_in_executor(self._get_thread_pool(), functools.partial(tool.run, conversation_id, input_data))
+
+    async def run_in_process(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a CPU-bound function in the process pool, off the event loop and the GIL.
+
+        Args:
+            function: A module-level function; it, its arguments and its result must be picklable
+            *args: Arguments of the function
+
+        Returns:
+            Result of the function
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._get_process_pool(), function, *args)
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=settings.TOOL_THREAD_POOL_SIZE, thread_name_prefix="tool")
+        return self._thread_pool
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # Spawn rather than fork: the server process has running threads
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=settings.TOOL_PROCESS_POOL_SIZE, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def shutdown(self) -> None:
+        """Shut down the executor pools without waiting for running calls."""
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
+
+
+# Create a singleton instance
+tool_dispatcher = ToolDispatcher()
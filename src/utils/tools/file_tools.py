@@ -1,10 +1,12 @@
 import os
-import sys
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Hashable
 from .base import BaseTool
 from ...models.chat import ToolParameter
 from ...core.conversation_manager import conversation_manager
+from ..logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class ReadFileTool(BaseTool):
@@ -13,6 +15,9 @@ class ReadFileTool(BaseTool):
     name = "read_file"
     description = "Read the contents of a file in the conversation workspace."
     
+    # Reused until the file changes
+    cacheable = True
+    
     def _get_parameters(self) -> List[ToolParameter]:
         """Define the parameters for this tool."""
         return [
@@ -24,6 +29,24 @@ class ReadFileTool(BaseTool):
             )
         ]
     
+    def cache_token(self, conversation_id: str, input_data: Dict[str, Any]) -> Optional[Hashable]:
+        """
+        Identify the current version of the file by its modification time and size.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the file path
+            
+        Returns:
+            Tuple of (mtime in ns, size), or None if the file cannot be read
+        """
+        try:
+            workspace_path = conversation_manager.get_workspace_path(conversation_id)
+            stat = (workspace_path / input_data["path"]).resolve().stat()
+        except (KeyError, TypeError, OSError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
     async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
         """
         Read a file from the conversation workspace.
@@ -78,7 +101,7 @@ class ReadFileTool(BaseTool):
             
             return content
         except Exception as e:
-            print(f"Error reading file {file_path}: {str(e)}", file=sys.stderr)
+            logger.error("Error reading file %s: %s", file_path, e)
             raise
 
 
@@ -154,5 +177,5 @@ class SaveFileTool(BaseTool):
             
             return f"File saved successfully: {file_path}"
         except Exception as e:
-            print(f"Error saving file {file_path}: {str(e)}", file=sys.stderr)
+            logger.error("Error saving file %s: %s", file_path, e)
             raise 
\ No newline at end of file
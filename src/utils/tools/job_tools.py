@@ -0,0 +1,166 @@
+import asyncio
+from typing import Dict, Any, List
+from .base import BaseTool
+from .command_tools import RunCommandTool
+from ...models.chat import ToolParameter
+from ...core.job_manager import job_manager
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StartJobTool(BaseTool):
+    """Tool for starting a long-running command in the background."""
+
+    name = "start_job"
+    description = (
+        "Start a long-running command (e.g. a build or data job) in the background of the conversation "
+        "workspace and return a job ID immediately. Use job_status to follow its output and cancel_job to stop it."
+    )
+
+    # Background jobs are subject to the same command restrictions as run_command
+    FORBIDDEN_COMMANDS = RunCommandTool.FORBIDDEN_COMMANDS
+    _validate_command = RunCommandTool._validate_command
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="command",
+                description="Command to run in the background",
+                required=True,
+                type="string"
+            )
+        ]
+
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Start a background job in the conversation workspace.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the command
+
+        Returns:
+            The job metadata including the job ID
+
+        Raises:
+            ValueError: If the command fails validation
+        """
+        # Validate the input
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        command = input_data["command"]
+
+        # Validate the command for security
+        security_error = self._validate_command(command)
+        if security_error:
+            raise ValueError(security_error)
+
+        return job_manager.start_job(conversation_id, command)
+
+
+class JobStatusTool(BaseTool):
+    """Tool for polling a background job and tailing its output."""
+
+    name = "job_status"
+    description = (
+        "Get the status of a background job and read its output starting at a byte offset. "
+        "Pass the returned next_offset on the next call to only receive new output."
+    )
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="job_id",
+                description="ID of the job returned by start_job",
+                required=True,
+                type="string"
+            ),
+            ToolParameter(
+                name="offset",
+                description="Byte offset in the job output to read from (default: 0)",
+                required=False,
+                type="integer"
+            )
+        ]
+
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Get the status and new output of a background job.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the job ID and offset
+
+        Returns:
+            The job metadata combined with the output read from the offset
+
+        Raises:
+            ValueError: If the job does not exist
+        """
+        # Validate the input
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        job_id = input_data["job_id"]
+        offset = input_data.get("offset", 0)
+        if not isinstance(offset, int) or offset < 0:
+            offset = 0
+
+        job = job_manager.get_job(conversation_id, job_id)
+        if job is None:
+            raise ValueError(f"Job not found: {job_id}")
+
+        output = job_manager.read_output(conversation_id, job_id, offset)
+        return {**job, **output}
+
+
+class CancelJobTool(BaseTool):
+    """Tool for cancelling a background job."""
+
+    name = "cancel_job"
+    description = "Cancel a running background job."
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="job_id",
+                description="ID of the job to cancel",
+                required=True,
+                type="string"
+            )
+        ]
+
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Cancel a background job.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the job ID
+
+        Returns:
+            The updated job metadata
+
+        Raises:
+            ValueError: If the job does not exist
+        """
+        # Validate the input
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        job_id = input_data["job_id"]
+        # Cancelling waits for the process group to exit, which must not block the loop
+        job = await asyncio.to_thread(job_manager.cancel_job, conversation_id, job_id)
+        if job is None:
+            raise ValueError(f"Job not found: {job_id}")
+
+        logger.debug("Job %s status after cancel: %s", job_id, job["status"])
+        return job
@@ -1,35 +1,54 @@
-import sys
 from .registry import tool_registry
-from .file_tools import ReadFileTool, SaveFileTool
-from .command_tools import RunCommandTool
-from .web_tools import WebSearchTool, ExtractContentTool
+from ...config import settings
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+# Built-in tools by import path; each is imported and constructed the first
+# time it is used, or when the tool schemas are first sent to the model
+DEFAULT_TOOLS = {
+    # File tools
+    "read_file": ".file_tools:ReadFileTool",
+    "save_file": ".file_tools:SaveFileTool",
+    # Command tools
+    "run_command": ".command_tools:RunCommandTool",
+    # Background job tools
+    "start_job": ".job_tools:StartJobTool",
+    "job_status": ".job_tools:JobStatusTool",
+    "cancel_job": ".job_tools:CancelJobTool",
+    # Package tools
+    "install_python_package": ".package_tools:InstallPythonPackageTool",
+    # Web tools
+    "web_search": ".web_tools:WebSearchTool",
+    "extract_content": ".web_tools:ExtractContentTool",
+    "research": ".research_tools:ResearchTool",
+    # Retrieval tools
+    "retrieve": ".retrieval_tools:RetrieveTool",
+    # Browser tools
+    "screenshot": ".screenshot_tools:ScreenshotTool",
+}
 
 
 def initialize_tools():
-    """Initialize and register all available tools."""
-    print("Initializing tools...", file=sys.stderr)
-    
+    """
+    Register all available tools.
+
+    The built-in tools and entry point plugins are registered for
+    construction on first use; plugin directories are imported now, since
+    their tools are only known once their files have run. A plugin tool
+    with the name of a built-in one replaces it.
+    """
+    for tool_name, target in DEFAULT_TOOLS.items():
+        tool_registry.register_lazy(tool_name, target)
+    logger.debug("Registered %d tools for lazy initialization", len(DEFAULT_TOOLS))
+
     try:
-        # Initialize and register file tools
-        tool_registry.register_tool(ReadFileTool())
-        tool_registry.register_tool(SaveFileTool())
-        
-        # Initialize and register command tools
-        tool_registry.register_tool(RunCommandTool())
-        
-        # Initialize and register web tools
-        tool_registry.register_tool(WebSearchTool())
-        tool_registry.register_tool(ExtractContentTool())
-        
-        print(f"Registered {len(tool_registry.get_all_tools())} tools", file=sys.stderr)
+        tool_registry.load_entry_points(settings.TOOL_ENTRY_POINT_GROUP)
     except Exception as e:
-        print(f"ERROR initializing tools: {e}", file=sys.stderr)
-        # Don't raise the exception to allow the application to continue
-        # but log it for debugging
+        logger.exception("Error reading tool entry points: %s", e)
+    for directory in settings.TOOL_PLUGIN_DIRS:
+        tool_registry.load_plugin_directory(directory)
 
 
-# Initialize tools at module import
-try:
-    initialize_tools()
-except Exception as e:
-    print(f"ERROR during tool initialization: {e}", file=sys.stderr) 
\ No newline at end of file
+# Register tools at module import; this only records their import paths
+initialize_tools()
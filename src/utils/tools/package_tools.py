@@ -0,0 +1,80 @@
+import re
+from typing import Dict, Any, List
+from .base import BaseTool
+from .python_env import python_env_manager
+from ...models.chat import ToolParameter
+from ...core.conversation_manager import conversation_manager
+from ...config import settings
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InstallPythonPackageTool(BaseTool):
+    """Tool for installing Python packages into the conversation virtualenv."""
+    
+    name = "install_python_package"
+    description = (
+        "Install Python packages into the conversation's virtualenv (.venv in the workspace). "
+        "Run Python afterwards with .venv/bin/python or `source .venv/bin/activate` in a persistent run_command."
+    )
+    
+    # Requirement specifiers such as "requests", "pandas>=2.0" or "uvicorn[standard]";
+    # leading dashes are rejected so pip options cannot be injected
+    REQUIREMENT_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._\-\[\],<>=!~*]*$")
+    
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="packages",
+                description="Space-separated requirement specifiers to install, e.g. 'requests pandas>=2.0'",
+                required=True,
+                type="string"
+            )
+        ]
+    
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Install packages into the conversation virtualenv.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the packages
+            
+        Returns:
+            Dictionary with the virtualenv path, installed packages and pip output
+            
+        Raises:
+            ValueError: If a requirement specifier is invalid
+            RuntimeError: If the installation fails
+        """
+        # Validate the input
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+        
+        packages = input_data["packages"].split()
+        if not packages:
+            raise ValueError("No packages specified")
+        for package in packages:
+            if not self.REQUIREMENT_PATTERN.match(package):
+                raise ValueError(f"Invalid package specifier: {package}")
+        
+        workspace_path = conversation_manager.get_workspace_path(conversation_id)
+        
+        try:
+            venv_path = await python_env_manager.ensure_env(conversation_id, workspace_path)
+            result = await python_env_manager.install(venv_path, packages, settings.PIP_INSTALL_TIMEOUT)
+            
+            logger.info("Installed %s into %s from %s", packages, venv_path, result["source"])
+            
+            return {
+                "venv": str(venv_path.relative_to(workspace_path)),
+                "packages": packages,
+                "source": result["source"],
+                "output": result["output"]
+            }
+        except Exception as e:
+            logger.error("Error installing packages %s: %s", packages, e)
+            raise
@@ -0,0 +1,197 @@
+import os
+import sys
+import shutil
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+from ...config import settings
+from ..telemetry import SUBPROCESS_SPAWNS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PythonEnvManager:
+    """
+    Creates per-conversation virtualenvs and installs packages into them.
+
+    - A template virtualenv (optionally with preinstalled packages) is built
+      once per Python version and package list, then cloned into each
+      workspace using hardlinks, which takes well under a second.
+    - Packages are installed from a wheelhouse shared by all workspaces.
+      Wheels are stored under their canonical filenames (name, version and
+      tags), so each distinct build is downloaded or built only once.
+    - In offline mode installs are resolved from the wheelhouse only.
+    """
+
+    VENV_DIR = ".venv"
+
+    def __init__(self):
+        """Initialize the environment manager."""
+        self.template_lock = asyncio.Lock()
+        # {conversation_id: asyncio.Lock}
+        self.env_locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def template_path(self) -> Path:
+        """Path of the template virtualenv for the current configuration."""
+        key = f"{sys.version}|{','.join(sorted(settings.VENV_TEMPLATE_PACKAGES))}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return settings.PYTHON_ENV_CACHE_DIR / "templates" / digest
+
+    def venv_path(self, workspace_path: Path) -> Path:
+        """Path of the virtualenv inside a workspace."""
+        return workspace_path / self.VENV_DIR
+
+    async def ensure_env(self, conversation_id: str, workspace_path: Path) -> Path:
+        """
+        Make sure the conversation has a virtualenv, cloning the template if needed.
+
+        Args:
+            conversation_id: The ID of the conversation
+            workspace_path: Path to the conversation workspace
+
+        Returns:
+            Path to the conversation virtualenv
+        """
+        lock = self.env_locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            venv_path = self.venv_path(workspace_path)
+            if (venv_path / "pyvenv.cfg").exists():
+                return venv_path
+
+            template_path = await self._ensure_template()
+            await asyncio.to_thread(self._clone_venv, template_path, venv_path)
+            logger.debug("Cloned virtualenv template into %s", venv_path)
+            return venv_path
+
+    async def install(self, venv_path: Path, packages: List[str], timeout: int) -> Dict[str, str]:
+        """
+        Install packages into a virtualenv through the shared wheelhouse.
+
+        The install is first attempted from the wheelhouse alone. If that fails
+        and offline mode is off, the missing wheels are downloaded or built into
+        the wheelhouse and the install is retried from it.
+
+        Args:
+            venv_path: Path to the virtualenv
+            packages: Requirement specifiers to install
+            timeout: Maximum time for the whole operation in seconds
+
+        Returns:
+            Dictionary with the installation source and pip output
+
+        Raises:
+            RuntimeError: If pip fails
+        """
+        wheelhouse = settings.PIP_WHEELHOUSE_DIR
+        os.makedirs(wheelhouse, exist_ok=True)
+        python = str(venv_path / "bin" / "python")
+        local_install = [python, "-m", "pip", "install", "--no-index", "--find-links", str(wheelhouse), *packages]
+
+        code, output = await self._run(local_install, timeout)
+        if code == 0:
+            return {"source": "wheelhouse", "output": output}
+
+        if settings.PIP_OFFLINE:
+            raise RuntimeError(f"Packages not available in the local wheelhouse (offline mode):\n{output}")
+
+        # Fill the wheelhouse from the index, then install from it
+        fetch = [python, "-m", "pip", "wheel", "--wheel-dir", str(wheelhouse), "--find-links", str(wheelhouse), *packages]
+        code, fetch_output = await self._run(fetch, timeout)
+        if code != 0:
+            raise RuntimeError(f"Failed to fetch packages:\n{fetch_output}")
+
+        code, output = await self._run(local_install, timeout)
+        if code != 0:
+            raise RuntimeError(f"Failed to install packages:\n{output}")
+        return {"source": "index", "output": output}
+
+    async def _ensure_template(self) -> Path:
+        """Build the template virtualenv if it does not exist yet."""
+        async with self.template_lock:
+            template_path = self.template_path
+            if (template_path / "pyvenv.cfg").exists():
+                return template_path
+
+            logger.info("Building virtualenv template at %s", template_path)
+            building_path = template_path.with_name(template_path.name + ".building")
+            shutil.rmtree(building_path, ignore_errors=True)
+            os.makedirs(building_path.parent, exist_ok=True)
+
+            code, output = await self._run([sys.executable, "-m", "venv", str(building_path)], settings.PIP_INSTALL_TIMEOUT)
+            if code != 0:
+                raise RuntimeError(f"Failed to create virtualenv template:\n{output}")
+
+            if settings.VENV_TEMPLATE_PACKAGES:
+                await self.install(building_path, settings.VENV_TEMPLATE_PACKAGES, settings.PIP_INSTALL_TIMEOUT)
+
+            # Scripts in the template refer to their own location, so the
+            # template is only published once it has reached its final path
+            self._rewrite_paths(building_path, building_path, template_path)
+            os.replace(building_path, template_path)
+            return template_path
+
+    def _clone_venv(self, template_path: Path, venv_path: Path) -> None:
+        """Clone the template into a workspace, hardlinking files where possible."""
+        tmp_path = venv_path.with_name(venv_path.name + ".cloning")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+        def link_or_copy(src: str, dst: str) -> None:
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+        shutil.copytree(template_path, tmp_path, symlinks=True, copy_function=link_or_copy)
+        self._rewrite_paths(tmp_path, template_path, venv_path)
+        os.replace(tmp_path, venv_path)
+
+    def _rewrite_paths(self, venv_path: Path, old_prefix: Path, new_prefix: Path) -> None:
+        """
+        Point the scripts and activation files of a virtualenv at a new location.
+
+        Rewritten files are replaced rather than edited in place so hardlinks
+        into the template are never modified.
+        """
+        old = str(old_prefix).encode()
+        new = str(new_prefix).encode()
+        candidates = list((venv_path / "bin").iterdir()) + [venv_path / "pyvenv.cfg"]
+        for path in candidates:
+            if path.is_symlink() or not path.is_file():
+                continue
+            data = path.read_bytes()
+            if old not in data:
+                continue
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(data.replace(old, new))
+            shutil.copymode(path, tmp)
+            os.replace(tmp, path)
+
+    async def _run(self, cmd: List[str], timeout: int) -> Tuple[int, str]:
+        """Run a subprocess with the shared pip cache and return its exit code and output."""
+        env = dict(os.environ)
+        env["PIP_CACHE_DIR"] = str(settings.PIP_CACHE_DIR)
+        env["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+        env.pop("PYTHONPATH", None)
+
+        logger.debug("Running: %s", " ".join(cmd))
+        SUBPROCESS_SPAWNS.inc(source="pip")
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=env
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return -1, f"Timed out after {timeout} seconds"
+        return process.returncode, stdout.decode("utf-8", errors="replace")
+
+
+# Create a singleton instance
+python_env_manager = PythonEnvManager()
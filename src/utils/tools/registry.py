@@ -1,61 +1,371 @@
-from typing import Dict, Type, List, Any
+from typing import Dict, Type, List, Any, Optional
+import os
 import sys
+import asyncio
+import inspect
+import importlib
+import importlib.util
+import threading
+from importlib import metadata
+from pathlib import Path
 from .base import BaseTool
+from ..logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class ToolRegistry:
-    """Registry for all available tools."""
-    
+    """
+    Registry for all available tools.
+
+    Tools can be registered as instances or lazily by import path. Lazy tools
+    are imported and constructed on first use, so importing the application
+    does not pay for tool modules (and their dependencies) that a process
+    never calls.
+
+    Tools can also come from plugins: entry points of an installed package or
+    Python files in a plugin directory. The module of every loaded tool is
+    watched, and a changed module can be reloaded in place. The tool and
+    schema tables are replaced, never mutated, so requests running during a
+    reload see either the old tools or the new ones.
+    """
+
     def __init__(self):
         """Initialize the tool registry."""
         self.tools: Dict[str, BaseTool] = {}
-    
+        # {tool_name: "module:ClassName"} for tools not constructed yet
+        self.lazy_tools: Dict[str, str] = {}
+        # Tool schemas sent with every model call, rebuilt when tools change
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+        # {module_name: (source file, mtime when loaded)} for modules defining loaded tools
+        self.modules: Dict[str, tuple] = {}
+        # Plugin directories scanned for new files by check_for_changes
+        self.plugin_dirs: List[Path] = []
+        # Serializes writers; readers use the current tables without locking
+        self._lock = threading.RLock()
+
     def register_tool(self, tool_instance: BaseTool) -> None:
         """
         Register a tool in the registry.
-        
+
         Args:
             tool_instance: Instance of the tool to register
         """
-        self.tools[tool_instance.name] = tool_instance
-        print(f"Registered tool: {tool_instance.name}", file=sys.stderr)
-    
+        self._swap({tool_instance.name: tool_instance})
+        self._track(type(tool_instance).__module__)
+        logger.debug("Registered tool: %s", tool_instance.name)
+
+    def register_lazy(self, tool_name: str, target: str) -> None:
+        """
+        Register a tool to be imported and constructed on first use.
+
+        Args:
+            tool_name: Name of the tool
+            target: Import path of the tool class as "module:ClassName";
+                relative modules are resolved against this package
+        """
+        with self._lock:
+            self.lazy_tools = dict(self.lazy_tools, **{tool_name: target})
+            self._schemas = None
+
+    def unregister_tool(self, tool_name: str) -> None:
+        """
+        Remove a tool from the registry.
+
+        Args:
+            tool_name: Name of the tool
+        """
+        self._swap({}, removed=[tool_name])
+
+    def _swap(self, added: Dict[str, BaseTool], removed: List[str] = ()) -> None:
+        """Replace the tool tables in one step and invalidate the schema cache."""
+        with self._lock:
+            tools = {name: tool for name, tool in self.tools.items() if name not in removed}
+            tools.update(added)
+            self.tools = tools
+            self.lazy_tools = {
+                name: target for name, target in self.lazy_tools.items()
+                if name not in added and name not in removed
+            }
+            self._schemas = None
+
+    def _track(self, module_name: str) -> None:
+        """Remember the source file of a tool module so changes can be detected."""
+        if module_name in self.modules:
+            return
+        source = getattr(sys.modules.get(module_name), "__file__", None)
+        if source and os.path.exists(source):
+            self.modules[module_name] = (source, os.stat(source).st_mtime)
+
+    def _load(self, tool_name: str) -> BaseTool:
+        """Import, construct and register a lazily registered tool."""
+        module_path, class_name = self.lazy_tools[tool_name].split(":")
+        module = importlib.import_module(module_path, package=__package__)
+        tool_class: Type[BaseTool] = getattr(module, class_name)
+        tool = tool_class()
+        if tool.name != tool_name:
+            logger.warning("Tool registered as %s is named %s", tool_name, tool.name)
+            self._swap({tool.name: tool}, removed=[tool_name])
+            self._track(tool_class.__module__)
+        else:
+            self.register_tool(tool)
+        return tool
+
     def get_tool(self, tool_name: str) -> BaseTool:
         """
         Get a tool by name.
-        
+
         Args:
             tool_name: Name of the tool
-            
+
         Returns:
             Tool instance
-            
+
         Raises:
             ValueError: If tool is not found
         """
-        if tool_name not in self.tools:
-            raise ValueError(f"Tool not found: {tool_name}")
-        
-        return self.tools[tool_name]
-    
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            if tool_name not in self.lazy_tools:
+                raise ValueError(f"Tool not found: {tool_name}")
+            return self._load(tool_name)
+
+        return tool
+
+    def get_tool_names(self) -> List[str]:
+        """
+        Get the names of all registered tools without constructing them.
+
+        Returns:
+            List of tool names
+        """
+        tools, lazy_tools = self.tools, self.lazy_tools
+        return list(tools) + [name for name in lazy_tools if name not in tools]
+
     def get_all_tools(self) -> List[BaseTool]:
         """
-        Get all registered tools.
-        
+        Get all registered tools, constructing any that are still lazy.
+
+        Tools that fail to load are logged and left out.
+
         Returns:
             List of all registered tool instances
         """
+        for tool_name in list(self.lazy_tools):
+            try:
+                self._load(tool_name)
+            except Exception as e:
+                # Drop the tool so a broken one is reported once, not on every call
+                logger.exception("Error loading tool %s: %s", tool_name, e)
+                self._swap({}, removed=[tool_name])
         return list(self.tools.values())
-    
+
     def get_tool_definitions(self) -> List[Dict[str, Any]]:
         """
         Get definitions for all tools in a format suitable for API responses.
-        
+
         Returns:
             List of tool definitions
         """
-        return [tool.to_dict() for tool in self.tools.values()]
+        return [tool.to_dict() for tool in self.get_all_tools()]
+
+    def get_tool_schemas(self) -> List[Dict[str, Any]]:
+        """
+        Get JSON schemas for all tools in the format expected by LLM APIs.
+
+        The list is built once and reused until the tools change. It is built
+        under the registry lock, so a reload cannot leave a stale list cached.
+
+        Returns:
+            List of tool schemas with name, description and input_schema
+        """
+        schemas = self._schemas
+        if schemas is None:
+            self.get_all_tools()
+            with self._lock:
+                if self._schemas is None:
+                    self._schemas = [tool.to_schema() for tool in self.tools.values()]
+                schemas = self._schemas
+        return schemas
+
+    def load_entry_points(self, group: str) -> List[str]:
+        """
+        Register the tools advertised by installed packages.
+
+        Each entry point in the group names a tool and points at its class,
+        e.g. ``my_tool = "my_package.tools:MyTool"`` under
+        ``[project.entry-points."<group>"]``. The tools are loaded lazily.
+
+        Args:
+            group: Entry point group name
+
+        Returns:
+            Names of the registered tools
+        """
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            entry_points = entry_points.select(group=group)
+        else:
+            entry_points = entry_points.get(group, [])
+
+        names = []
+        for entry_point in entry_points:
+            self.register_lazy(entry_point.name, entry_point.value)
+            names.append(entry_point.name)
+        if names:
+            logger.info("Registered %d tools from entry points: %s", len(names), ", ".join(names))
+        return names
+
+    def load_plugin_directory(self, directory: str) -> List[str]:
+        """
+        Import every plugin file in a directory and register its tools.
+
+        Each ``*.py`` file not starting with an underscore is imported as its
+        own module, and every concrete BaseTool subclass it defines is
+        registered. A file that fails to import is logged and skipped.
+
+        Args:
+            directory: Path to the plugin directory
+
+        Returns:
+            Names of the registered tools
+        """
+        path = Path(directory).resolve()
+        if path not in self.plugin_dirs:
+            self.plugin_dirs.append(path)
+        if not path.is_dir():
+            logger.warning("Tool plugin directory not found: %s", path)
+            return []
+
+        names = []
+        for plugin_file in sorted(path.glob("*.py")):
+            module_name = self._plugin_module_name(plugin_file)
+            if plugin_file.name.startswith("_") or module_name in self.modules:
+                continue
+            try:
+                names.extend(self.reload_module(module_name, str(plugin_file)))
+            except Exception as e:
+                logger.exception("Error loading tool plugin %s: %s", plugin_file, e)
+                # Remember the file so it is retried only once it changes
+                self.modules[module_name] = (str(plugin_file), plugin_file.stat().st_mtime)
+        return names
+
+    def _plugin_module_name(self, plugin_file: Path) -> str:
+        """Module name a plugin file is imported under."""
+        return f"tool_plugins.{plugin_file.parent.name}.{plugin_file.stem}"
+
+    def reload_module(self, module_name: str, source: Optional[str] = None) -> List[str]:
+        """
+        Import a fresh copy of a tool module and swap in its tools.
+
+        The module is executed into a new module object; only if that and
+        constructing its tools succeed are the tools it defines replaced.
+        Tools the module no longer defines are removed. Other modules,
+        including the ones it imports, are not re-imported, and conversations
+        are untouched. Calls already running keep the tool instance they
+        started with.
+
+        Args:
+            module_name: Name of the module
+            source: Path of the module file, for plugin files
+
+        Returns:
+            Names of the tools the module now defines
+
+        Raises:
+            ImportError: If the module cannot be found
+            Exception: Whatever the module or a tool constructor raises
+        """
+        if source is not None:
+            spec = importlib.util.spec_from_file_location(module_name, source)
+        else:
+            spec = importlib.util.find_spec(module_name)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot find tool module {module_name}")
+        mtime = os.stat(spec.origin).st_mtime
+
+        module = importlib.util.module_from_spec(spec)
+        # Like an import, the module is in sys.modules while it runs; put the old one back on failure
+        old_module = sys.modules.get(module_name)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+            tools = {
+                tool.name: tool for tool in (
+                    tool_class() for tool_class in vars(module).values()
+                    if inspect.isclass(tool_class) and issubclass(tool_class, BaseTool)
+                    and tool_class.__module__ == module_name and not inspect.isabstract(tool_class)
+                )
+            }
+        except BaseException:
+            if old_module is None:
+                sys.modules.pop(module_name, None)
+            else:
+                sys.modules[module_name] = old_module
+            raise
+
+        with self._lock:
+            previous = [name for name, tool in self.tools.items() if type(tool).__module__ == module_name]
+            self._swap(tools, removed=[name for name in previous if name not in tools])
+            self.modules[module_name] = (spec.origin, mtime)
+
+        logger.info("Loaded tool module %s: %s", module_name, ", ".join(tools) or "no tools")
+        return list(tools)
+
+    def check_for_changes(self) -> List[str]:
+        """
+        Reload tool modules whose source changed and load new plugin files.
+
+        A module that fails to reload is logged and keeps its current tools;
+        it is tried again once its file changes again. Tools of a deleted
+        plugin file are removed.
+
+        Returns:
+            Names of the modules that were reloaded or loaded
+        """
+        changed = []
+        for module_name, (source, mtime) in list(self.modules.items()):
+            try:
+                current = os.stat(source).st_mtime
+            except FileNotFoundError:
+                if module_name.startswith("tool_plugins."):
+                    with self._lock:
+                        removed = [name for name, tool in self.tools.items() if type(tool).__module__ == module_name]
+                        self._swap({}, removed=removed)
+                        self.modules.pop(module_name, None)
+                    logger.info("Removed tool plugin %s: %s", module_name, ", ".join(removed) or "no tools")
+                    changed.append(module_name)
+                continue
+            if current == mtime:
+                continue
+            try:
+                self.reload_module(module_name, source if module_name.startswith("tool_plugins.") else None)
+            except Exception as e:
+                logger.exception("Error reloading tool module %s: %s", module_name, e)
+                self.modules[module_name] = (source, current)
+                continue
+            changed.append(module_name)
+
+        for directory in self.plugin_dirs:
+            loaded = set(self.modules)
+            self.load_plugin_directory(str(directory))
+            changed.extend(name for name in self.modules if name not in loaded)
+        return changed
+
+    async def watch(self, interval: float) -> None:
+        """
+        Check for changed tool modules every ``interval`` seconds until cancelled.
+
+        Args:
+            interval: Seconds between checks
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.check_for_changes)
+            except Exception as e:
+                logger.exception("Error checking tool modules for changes: %s", e)
 
 
 # Create a singleton instance
-tool_registry = ToolRegistry() 
\ No newline at end of file
+tool_registry = ToolRegistry()
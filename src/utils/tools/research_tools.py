@@ -0,0 +1,112 @@
+from typing import Dict, Any, List
+from .base import BaseTool
+from ...models.chat import ToolParameter
+from ...core.conversation_manager import conversation_manager
+from ...config import settings
+from ..research import research_pipeline
+
+
+def _positive_int(value: Any, default: int, limit: int) -> int:
+    """Read an optional count parameter, falling back to the default and capping it."""
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return default
+    return min(value, limit)
+
+
+class ResearchTool(BaseTool):
+    """Tool for researching a question on the web in one call."""
+
+    name = "research"
+    description = (
+        "Research a question on the web: search it, read the top pages and return only the passages that "
+        "best answer it, with their sources. Prefer it to web_search followed by extract_content; the full "
+        "text of each page is saved to the workspace if more is needed."
+    )
+
+    # Searches and fetches run in worker threads, driven from the event loop
+    executor = "loop"
+    max_concurrency = 4
+    timeout = 90
+    cacheable = True
+    cache_ttl = 300
+    max_result_chars = 12000
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="query",
+                description="The question to research; it is searched and the passages are ranked against it",
+                required=True,
+                type="string"
+            ),
+            ToolParameter(
+                name="queries",
+                description=f"Further search queries (strings) for other angles on the question, at most {settings.SEARCH_MAX_QUERIES - 1}",
+                required=False,
+                type="array"
+            ),
+            ToolParameter(
+                name="max_pages",
+                description=f"Number of top search results to read (default: {settings.RESEARCH_MAX_PAGES})",
+                required=False,
+                type="integer"
+            ),
+            ToolParameter(
+                name="max_passages",
+                description=f"Number of passages to return (default: {settings.RESEARCH_MAX_PASSAGES})",
+                required=False,
+                type="integer"
+            )
+        ]
+
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Research a question on the web.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the question and optional queries and limits
+
+        Returns:
+            The sources read and the best passages as a formatted string
+
+        Raises:
+            ValueError: If the question or queries are invalid
+            Exception: If nothing could be found or fetched
+        """
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        question = str(input_data["query"]).strip()
+        if not question:
+            raise ValueError("Missing required parameter: query")
+        queries = input_data.get("queries") or []
+        if isinstance(queries, str):
+            queries = [queries]
+        queries = [q.strip() for q in queries if isinstance(q, str) and q.strip()]
+        if len(queries) >= settings.SEARCH_MAX_QUERIES:
+            raise ValueError(f"At most {settings.SEARCH_MAX_QUERIES - 1} further queries can be searched at once")
+        max_pages = _positive_int(input_data.get("max_pages"), settings.RESEARCH_MAX_PAGES, 20)
+        max_passages = _positive_int(input_data.get("max_passages"), settings.RESEARCH_MAX_PASSAGES, 30)
+
+        workspace_path = conversation_manager.get_workspace_path(conversation_id)
+        outcome = await research_pipeline.research(question, queries, max_pages, max_passages, workspace_path)
+        if not outcome["sources"]:
+            raise Exception("Research found no readable pages: " + ("; ".join(outcome["errors"]) or "no search results"))
+
+        lines = ["Sources:"]
+        for index, source in enumerate(outcome["sources"], 1):
+            lines.append(f"[{index}] {source['title']} - {source['url']} (full text: {source['file']})")
+        lines.append("")
+        if not outcome["passages"]:
+            lines.append("No passage of these pages matches the question.")
+        for index, passage in enumerate(outcome["passages"], 1):
+            lines.append(f"=== Passage {index} from [{passage['source']}] (score {passage['score']}) ===")
+            lines.append(passage["text"])
+            lines.append("")
+        if outcome["errors"]:
+            lines.append("Some searches or pages failed:")
+            lines.extend(outcome["errors"])
+        return "\n".join(lines).rstrip()
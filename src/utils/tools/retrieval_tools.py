@@ -0,0 +1,91 @@
+from typing import Dict, Any, List
+from .base import BaseTool
+from ...models.chat import ToolParameter
+from ...core.conversation_manager import conversation_manager
+from ...config import settings
+from ..retrieval import retrieval_indexes
+
+
+class RetrieveTool(BaseTool):
+    """Tool for finding relevant passages in the workspace files."""
+
+    name = "retrieve"
+    description = (
+        "Find the passages of the workspace files most relevant to a question, including pages saved by "
+        "extract_content and research and earlier search results. Use it instead of reading whole files "
+        "back with read_file; each passage names its file and lines."
+    )
+
+    # Indexing and ranking are CPU work on the workspace files
+    executor = "thread"
+    max_concurrency = 4
+    timeout = 60
+    max_result_chars = 12000
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="query",
+                description="The question or keywords to look for",
+                required=True,
+                type="string"
+            ),
+            ToolParameter(
+                name="top_k",
+                description=f"Number of passages to return (default: {settings.RETRIEVAL_TOP_K})",
+                required=False,
+                type="integer"
+            ),
+            ToolParameter(
+                name="path",
+                description="Only search files matching this pattern, relative to the workspace, e.g. 'extracted_content_*' or 'src/*.py'",
+                required=False,
+                type="string"
+            )
+        ]
+
+    def run(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Retrieve the passages of the workspace files that best match a question.
+
+        The workspace index is brought up to date first, reading only the
+        files that changed since the last call.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the question and optional limit and path pattern
+
+        Returns:
+            The passages with their files and lines as a formatted string
+
+        Raises:
+            ValueError: If the question is missing
+        """
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        question = str(input_data["query"]).strip()
+        if not question:
+            raise ValueError("Missing required parameter: query")
+        top_k = input_data.get("top_k")
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k <= 0:
+            top_k = settings.RETRIEVAL_TOP_K
+        top_k = min(top_k, 50)
+        pattern = input_data.get("path") or None
+
+        workspace_path = conversation_manager.get_workspace_path(conversation_id)
+        outcome = retrieval_indexes.retrieve(conversation_id, workspace_path, question, top_k, pattern)
+        if not outcome["results"]:
+            scope = f" matching {pattern}" if pattern else ""
+            return f"No passages found in {outcome['files']} workspace files{scope}."
+
+        blocks = []
+        for index, result in enumerate(outcome["results"], 1):
+            lines = f"line {result['start']}" if result["start"] == result["end"] else f"lines {result['start']}-{result['end']}"
+            header = f"=== [{index}] {result['path']} {lines} (score {result['score']}) ==="
+            if "source" in result:
+                header += f"\nSource: {result['source']}"
+            blocks.append(f"{header}\n{result['text']}\n")
+        return "\n".join(blocks).rstrip()
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+from .base import BaseTool
+from .browser_pool import browser_pool
+from .images import prepare_image, perceptual_hash, hash_distance
+from ...models.chat import ToolParameter
+from ...core.conversation_manager import conversation_manager
+from ...config import settings
+from ..telemetry import TOOL_CACHE_REQUESTS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+# Where screenshots are saved, relative to the workspace
+SCREENSHOT_DIR = ".screenshots"
+
+# Longest wait for the network to go quiet once the page has loaded, in milliseconds
+NETWORK_IDLE_WAIT_MS = 2000
+
+# Smallest viewport accepted, in CSS pixels
+MIN_VIEWPORT = (320, 240)
+
+
+class Screenshot:
+    """A screenshot prepared for the model and the content and perceptual hashes of its capture."""
+
+    __slots__ = ("digest", "phash", "data", "media_type", "width", "height", "page_height", "captured_at")
+
+    def __init__(self, digest: bytes, phash: int, data: bytes, media_type: str, width: int, height: int, page_height: int):
+        self.digest = digest
+        self.phash = phash
+        self.data = data
+        self.media_type = media_type
+        self.width = width
+        self.height = height
+        self.page_height = page_height
+        self.captured_at = time.monotonic()
+
+
+class ScreenshotCache:
+    """
+    Recent screenshots by URL and capture options, shared by all conversations.
+
+    A screenshot younger than SCREENSHOT_CACHE_TTL is returned without
+    opening the page. An older one is compared with a new capture; if the
+    capture is byte for byte the same, the prepared image is reused, so
+    resizing and encoding are skipped and the model gets identical images
+    for unchanged pages. Perceptual hashes only tell recaptures that look
+    alike apart from real misses in the metrics: a small text change can
+    leave the hash unchanged, so they never decide reuse.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of screenshots kept
+        """
+        self.max_entries = max_entries
+        # {(url, width, height, full_page): Screenshot}, least recently used first
+        self.entries: "OrderedDict[Tuple[str, int, int, bool], Screenshot]" = OrderedDict()
+
+    def get(self, key: Tuple[str, int, int, bool]) -> Optional[Screenshot]:
+        """Get the last screenshot taken with these options, if still kept."""
+        shot = self.entries.get(key)
+        if shot is not None:
+            self.entries.move_to_end(key)
+        return shot
+
+    def put(self, key: Tuple[str, int, int, bool], shot: Screenshot) -> None:
+        """Keep a screenshot, evicting the least recently used ones over the limit."""
+        self.entries[key] = shot
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class ScreenshotTool(BaseTool):
+    """Tool for taking screenshots of web pages."""
+
+    name = "screenshot"
+    description = (
+        "Take a screenshot of a web page and look at it. Use it when the layout or visual content of a "
+        "page matters; use extract_content to read its text."
+    )
+
+    # Runs on a pooled browser driven from the event loop
+    executor = "loop"
+    max_concurrency = 4
+    timeout = 60
+    # The image is sent to the model with the result
+    image_results = True
+
+    def _get_parameters(self) -> List[ToolParameter]:
+        """Define the parameters for this tool."""
+        return [
+            ToolParameter(
+                name="url",
+                description="URL of the web page (http or https)",
+                required=True,
+                type="string"
+            ),
+            ToolParameter(
+                name="full_page",
+                description="Capture the whole page instead of the viewport; very long pages are cut off (default: false)",
+                required=False,
+                type="boolean"
+            ),
+            ToolParameter(
+                name="width",
+                description=f"Viewport width in pixels (default: {settings.SCREENSHOT_VIEWPORT_WIDTH})",
+                required=False,
+                type="integer"
+            ),
+            ToolParameter(
+                name="height",
+                description=f"Viewport height in pixels (default: {settings.SCREENSHOT_VIEWPORT_HEIGHT})",
+                required=False,
+                type="integer"
+            ),
+            ToolParameter(
+                name="refresh",
+                description="Take a new screenshot even if the page was captured recently (default: false)",
+                required=False,
+                type="boolean"
+            )
+        ]
+
+    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+        """
+        Take a screenshot of a web page.
+
+        The image is scaled down and recompressed to the size the model uses
+        and saved to the workspace under ``.screenshots/``; the result names
+        it, and the image itself is added to the conversation with the
+        result.
+
+        Args:
+            conversation_id: The ID of the conversation
+            input_data: Input parameters containing the URL and capture options
+
+        Returns:
+            Dictionary with the URL, the image path relative to the workspace,
+            its media type, size and byte count, the height of the page and
+            where the image came from (capture, unchanged or cache)
+
+        Raises:
+            ValueError: If the URL or options are invalid
+        """
+        validation_error = self.validate_input(input_data)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        url = input_data["url"]
+        if urlparse(url).scheme not in ("http", "https"):
+            raise ValueError(f"Only http and https URLs can be captured: {url}")
+        try:
+            width = int(input_data.get("width") or settings.SCREENSHOT_VIEWPORT_WIDTH)
+            height = int(input_data.get("height") or settings.SCREENSHOT_VIEWPORT_HEIGHT)
+        except (TypeError, ValueError):
+            raise ValueError("width and height must be integers")
+        # Larger viewports only produce images that are scaled down again
+        width = min(max(width, MIN_VIEWPORT[0]), settings.SCREENSHOT_MAX_WIDTH)
+        height = min(max(height, MIN_VIEWPORT[1]), settings.SCREENSHOT_MAX_PAGE_HEIGHT)
+        full_page = bool(input_data.get("full_page", False))
+        key = (url, width, height, full_page)
+
+        shot = None if input_data.get("refresh") else screenshot_cache.get(key)
+        if shot is not None and time.monotonic() - shot.captured_at < settings.SCREENSHOT_CACHE_TTL:
+            TOOL_CACHE_REQUESTS.inc(tool=self.name, result="hit")
+            source = "cache"
+        else:
+            png, page_height = await self._capture(url, width, height, full_page)
+            digest = hashlib.sha256(png).digest()
+            if shot is not None and digest == shot.digest:
+                TOOL_CACHE_REQUESTS.inc(tool=self.name, result="unchanged")
+                shot.captured_at = time.monotonic()
+                shot.page_height = page_height
+                source = "unchanged"
+            else:
+                phash = await asyncio.to_thread(perceptual_hash, png)
+                # A page that changed but looks alike, e.g. a clock or a counter, is still a miss
+                similar = shot is not None and hash_distance(phash, shot.phash) <= settings.SCREENSHOT_HASH_DISTANCE
+                TOOL_CACHE_REQUESTS.inc(tool=self.name, result="similar" if similar else "miss")
+                data, media_type, image_width, image_height = await asyncio.to_thread(
+                    prepare_image, png, settings.SCREENSHOT_MAX_EDGE, settings.SCREENSHOT_MAX_PIXELS,
+                    settings.SCREENSHOT_FORMAT, settings.SCREENSHOT_QUALITY
+                )
+                logger.debug("Prepared screenshot of %s: %d -> %d bytes", url, len(png), len(data))
+                shot = Screenshot(digest, phash, data, media_type, image_width, image_height, page_height)
+                source = "capture"
+            screenshot_cache.put(key, shot)
+
+        image_path = await asyncio.to_thread(self._save, conversation_id, shot)
+        return {
+            "url": url,
+            "image": image_path,
+            "media_type": shot.media_type,
+            "width": shot.width,
+            "height": shot.height,
+            "page_height": shot.page_height,
+            "bytes": len(shot.data),
+            "source": source
+        }
+
+    async def _capture(self, url: str, width: int, height: int, full_page: bool) -> Tuple[bytes, int]:
+        """Capture a page as PNG; returns the image and the page's scroll height."""
+        async with browser_pool.page(width, height) as page:
+            await page.goto(url, wait_until="load")
+            try:
+                await page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_WAIT_MS)
+            except Exception:
+                # Pages that keep polling never go idle; capture what has loaded
+                pass
+            page_height = await page.evaluate("document.documentElement.scrollHeight")
+            if full_page:
+                clip = {"x": 0, "y": 0, "width": width, "height": min(page_height, settings.SCREENSHOT_MAX_PAGE_HEIGHT)}
+                png = await page.screenshot(full_page=True, clip=clip)
+            else:
+                png = await page.screenshot()
+        return png, page_height
+
+    def _save(self, conversation_id: str, shot: Screenshot) -> str:
+        """Write a screenshot to the workspace, named by its content; returns its relative path."""
+        suffix = "." + shot.media_type.split("/")[1]
+        relative_path = f"{SCREENSHOT_DIR}/{hashlib.sha1(shot.data).hexdigest()[:16]}{suffix}"
+        path = conversation_manager.get_workspace_path(conversation_id) / relative_path
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(shot.data)
+        return relative_path
+
+
+# Shared by all conversations of this worker
+screenshot_cache = ScreenshotCache(settings.SCREENSHOT_CACHE_ENTRIES)
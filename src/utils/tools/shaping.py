@@ -0,0 +1,245 @@
+import base64
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .registry import tool_registry
+from .dispatcher import tool_dispatcher
+from ...config import settings
+from ..telemetry import TOOL_RESULT_CHARS
+
+# Where results too large for the conversation are written, relative to the workspace
+SPILL_DIR = ".tool_results"
+
+# Budget given to each long string inside a structured result, at least
+MIN_FIELD_CHARS = 500
+
+# Image formats the model accepts, by file suffix
+IMAGE_MEDIA_TYPES = {".webp": "image/webp", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png",
+                     ".gif": "image/gif"}
+
+# Largest image sent to the model, in bytes
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+def compact_json(value: Any) -> str:
+    """Serialize a value as JSON without insignificant whitespace."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def dedupe_lines(text: str) -> str:
+    """
+    Collapse runs of identical lines and of blank lines.
+
+    Progress bars, retries and polling loops often print the same line many
+    times; a run of more than two identical lines becomes the line and a note
+    of how many times it was repeated. Trailing whitespace is dropped.
+    """
+    lines = [line.rstrip() for line in text.split("\n")]
+    result: List[str] = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        run = 1
+        while index + run < len(lines) and lines[index + run] == line:
+            run += 1
+        if line == "":
+            result.append("")
+        elif run > 2:
+            result.append(line)
+            result.append(f"[previous line repeated {run - 1} more times]")
+        else:
+            result.extend([line] * run)
+        index += run
+    return "\n".join(result)
+
+
+def truncate_middle(text: str, max_chars: int, note: str) -> Tuple[str, bool]:
+    """
+    Keep the head and tail of a text, cutting at line boundaries.
+
+    Two thirds of the budget go to the head, where commands print what they
+    are doing, and one third to the tail, where errors and summaries end up.
+
+    Args:
+        text: The text to shorten
+        max_chars: Maximum length of the result, marker included
+        note: Appended to the marker, e.g. where the full text is
+
+    Returns:
+        Tuple of (text, whether anything was cut)
+    """
+    if len(text) <= max_chars:
+        return text, False
+
+    budget = max(max_chars - 200, 0)
+    head_end = text.rfind("\n", 0, budget * 2 // 3)
+    if head_end < budget // 3:
+        head_end = budget * 2 // 3
+    tail_start = text.find("\n", len(text) - budget // 3)
+    if tail_start == -1 or tail_start - (len(text) - budget // 3) > budget // 6:
+        tail_start = len(text) - budget // 3
+    head, tail = text[:head_end], text[tail_start:]
+    omitted = text[head_end:tail_start]
+    marker = f"\n[... {omitted.count(chr(10))} lines ({len(omitted)} characters) omitted{note} ...]"
+    return head + marker + tail, True
+
+
+class ResultShaper:
+    """
+    Makes tool results compact before they are added to the conversation.
+
+    Every later model call resends the whole history, so a long stdout dump
+    or scraped page is paid for on every turn. Results are shaped in three
+    steps:
+
+    1. Structured results are serialized as compact JSON.
+    2. Runs of repeated lines are collapsed.
+    3. Text over the tool's ``max_result_chars`` keeps its head and tail.
+       Long string fields of structured results are shortened the same way,
+       so the JSON stays valid.
+
+    When anything is cut, the full result is written to the conversation
+    workspace under ``.tool_results/`` and the marker tells the model where
+    to find it.
+    """
+
+    def shape(self, tool_name: str, workspace_path: Optional[Path], tool_call_id: str, result: Any,
+              max_chars: int) -> str:
+        """
+        Shape a tool result for the conversation history.
+
+        Args:
+            tool_name: Name of the tool that produced the result
+            workspace_path: Workspace to spill the full result to, or None to not keep it
+            tool_call_id: ID of the tool call, used to name the spill file
+            result: The raw result
+            max_chars: Size limit of the shaped result in characters
+
+        Returns:
+            The shaped result as text
+        """
+        if isinstance(result, str):
+            result = self._parse_json(result)
+        raw = result if isinstance(result, str) else compact_json(result)
+
+        spill_path = f"{SPILL_DIR}/{tool_call_id}.txt"
+        note = ""
+        if workspace_path is not None:
+            note = f"; full output saved to {spill_path}, read parts of it with run_command and grep or sed"
+        if isinstance(result, str):
+            shaped, truncated = truncate_middle(dedupe_lines(result), max_chars, note)
+        else:
+            shaped, truncated = self._shape_structured(result, max_chars, note)
+
+        if truncated and workspace_path is not None:
+            self._spill(workspace_path / spill_path, result)
+
+        TOOL_RESULT_CHARS.inc(len(raw), tool=tool_name, stage="raw")
+        TOOL_RESULT_CHARS.inc(len(shaped), tool=tool_name, stage="shaped")
+        return shaped
+
+    def _parse_json(self, text: str) -> Any:
+        """Parse text that holds a JSON object or array, so it can be compacted."""
+        stripped = text.strip()
+        if stripped[:1] in ("{", "[") and stripped[-1:] in ("}", "]"):
+            try:
+                return json.loads(stripped)
+            except ValueError:
+                pass
+        return text
+
+    def _shape_structured(self, result: Any, max_chars: int, note: str) -> Tuple[str, bool]:
+        """Shorten the long strings of a structured result until its JSON fits."""
+        text = compact_json(result)
+        if len(text) <= max_chars:
+            return text, False
+
+        strings = sorted(self._strings(result), key=len, reverse=True)
+        if not strings:
+            return truncate_middle(text, max_chars, note)
+        # Share what the rest of the structure leaves between the long strings
+        overhead = len(text) - sum(len(compact_json(s)) for s in strings)
+        share = max((max_chars - overhead) // len(strings), MIN_FIELD_CHARS)
+        shaped = self._map_strings(result, lambda s: truncate_middle(dedupe_lines(s), share, note)[0])
+        text = compact_json(shaped)
+        if len(text) > max_chars:
+            # Too many fields to share the budget; fall back to cutting the JSON text
+            return truncate_middle(text, max_chars, note)
+        return text, True
+
+    def _strings(self, value: Any) -> List[str]:
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, dict):
+            return [s for item in value.values() for s in self._strings(item)]
+        if isinstance(value, (list, tuple)):
+            return [s for item in value for s in self._strings(item)]
+        return []
+
+    def _map_strings(self, value: Any, function) -> Any:
+        if isinstance(value, str):
+            return function(value)
+        if isinstance(value, dict):
+            return {key: self._map_strings(item, function) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._map_strings(item, function) for item in value]
+        return value
+
+    def _spill(self, path: Path, result: Any) -> None:
+        """Write the full result to the workspace."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = result if isinstance(result, str) else json.dumps(result, indent=2, ensure_ascii=False, default=str)
+        path.write_text(text, encoding="utf-8")
+
+
+def image_block(tool_name: str, workspace_path: Path, result: Any) -> Optional[Dict[str, Any]]:
+    """
+    Build the image content block for a tool result that names an image.
+
+    Only tools with ``image_results`` can name one, in the "image" key of a
+    structured result. The image must be a file in the workspace, in a
+    format the model accepts and no larger than MAX_IMAGE_BYTES.
+
+    Args:
+        tool_name: Name of the tool that produced the result
+        workspace_path: The conversation workspace
+        result: The raw result
+
+    Returns:
+        The base64 image block, or None if the result names no usable image
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("image"), str):
+        return None
+    try:
+        if not tool_registry.get_tool(tool_name).image_results:
+            return None
+    except ValueError:
+        return None
+
+    workspace = workspace_path.resolve()
+    path = (workspace / result["image"]).resolve()
+    media_type = IMAGE_MEDIA_TYPES.get(path.suffix.lower())
+    if media_type is None or not path.is_relative_to(workspace) or not path.is_file():
+        return None
+    if path.stat().st_size > MAX_IMAGE_BYTES:
+        return None
+    data = base64.b64encode(path.read_bytes()).decode("ascii")
+    return {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": data}}
+
+
+def max_result_chars(tool_name: str) -> int:
+    """
+    Get the result size limit of a tool.
+
+    Uses the tool's ``max_result_chars``, overridden by TOOL_LIMITS, and
+    TOOL_RESULT_MAX_CHARS for tools that set none or are not registered.
+    """
+    try:
+        limit = tool_dispatcher.policy(tool_registry.get_tool(tool_name)).get("max_result_chars")
+    except ValueError:
+        limit = settings.TOOL_LIMITS.get(tool_name, {}).get("max_result_chars")
+    return int(limit or settings.TOOL_RESULT_MAX_CHARS)
+
+
+# Create a singleton instance
+result_shaper = ResultShaper()
@@ -0,0 +1,298 @@
+import os
+import re
+import pty
+import time
+import uuid
+import fcntl
+import select
+import signal
+import termios
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, Optional
+from ...config import settings
+from ..telemetry import SUBPROCESS_SPAWNS, SHELL_SESSIONS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ShellSession:
+    """
+    A persistent PTY-backed bash process bound to one conversation workspace.
+
+    Commands are written to the shell followed by a sentinel line that carries
+    the exit status, so the boundaries between commands can be recovered from
+    the shared output stream. Working directory, exported variables and
+    activated virtualenvs therefore carry over between calls. Commands run
+    with stdin on /dev/null, so one that reads input (cat, read, grep without
+    a file) gets end of file instead of consuming the sentinel line.
+    """
+
+    # Bytes of trailing output kept once the output limit has been reached,
+    # so the sentinel can still be detected
+    TAIL_KEEP = 4096
+
+    def __init__(self, workspace_path: Path, max_output: int):
+        """
+        Start the shell process.
+
+        Args:
+            workspace_path: Directory the shell starts in
+            max_output: Maximum number of output bytes returned per command
+        """
+        self.workspace_path = workspace_path
+        self.max_output = max_output
+        self.marker = f"__CMD_DONE_{uuid.uuid4().hex}__"
+        # The sentinel starts with the newline printed before the marker
+        self._sentinel = re.compile(rb"\r?\n" + re.escape(self.marker).encode() + rb"(-?\d+)\r?\n")
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+        master_fd, slave_fd = pty.openpty()
+
+        # Disable echo so the command text does not show up in the output, and
+        # keep queued input on Ctrl-C so the sentinel survives an interrupt
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[3] &= ~termios.ECHO
+        attrs[3] |= termios.NOFLSH
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+
+        env = dict(os.environ)
+        env.update({"PS1": "", "PS2": "", "TERM": "dumb", "PAGER": "cat", "GIT_PAGER": "cat"})
+
+        SUBPROCESS_SPAWNS.inc(source="shell_session")
+        self.process = subprocess.Popen(
+            ["/bin/bash", "--noprofile", "--norc"],
+            stdin=slave_fd,
+            stdout=slave_fd,
+            stderr=slave_fd,
+            cwd=str(workspace_path),
+            env=env,
+            start_new_session=True,
+            # Make the PTY the controlling terminal so Ctrl-C reaches the
+            # foreground command
+            preexec_fn=lambda: fcntl.ioctl(0, termios.TIOCSCTTY, 0),
+            close_fds=True
+        )
+        os.close(slave_fd)
+        self.master_fd = master_fd
+        self.closed = False
+
+        logger.info("Started persistent shell (pid %d) in %s", self.process.pid, workspace_path)
+
+    def is_alive(self) -> bool:
+        """Return True if the shell process is still running."""
+        return not self.closed and self.process.poll() is None
+
+    def run(self, command: str, timeout: float) -> Dict[str, Any]:
+        """
+        Run a command in the shell and wait for its sentinel.
+
+        Args:
+            command: The command to run
+            timeout: Maximum time to wait for the command in seconds
+
+        Returns:
+            Dictionary with exit_code, stdout, stderr and truncated keys
+        """
+        with self.lock:
+            if not self.is_alive():
+                return self._result(-1, bytearray(), False, "Shell session exited")
+            self.last_used = time.monotonic()
+            self._drain()
+
+            # The group runs in the shell itself, so cd and exports persist; the
+            # newline before "}" ends a trailing comment. The newline printed
+            # before the marker terminates any partial output line so the
+            # sentinel always starts on its own line
+            script = f"{{ {command}\n}} </dev/null\nprintf '\\n{self.marker}%s\\n' \"$?\"\n"
+            os.write(self.master_fd, script.encode("utf-8"))
+
+            head = bytearray()
+            tail = bytearray()
+            truncated = False
+            deadline = time.monotonic() + timeout
+            interrupted = False
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if interrupted:
+                        # The shell ignored the interrupt, so it cannot be reused
+                        self.close()
+                        return self._result(-1, head, truncated, f"Command timed out after {timeout} seconds")
+                    # Interrupt the running command and give the shell a moment
+                    # to print the sentinel for the interrupted command
+                    os.write(self.master_fd, b"\x03")
+                    interrupted = True
+                    deadline = time.monotonic() + 2
+                    continue
+
+                chunk = self._read(remaining)
+                if chunk is None:
+                    return self._result(-1, head, truncated, "Shell session exited")
+                if not chunk:
+                    continue
+
+                exit_code = None
+                if not truncated:
+                    head += chunk
+                    match = self._sentinel.search(head)
+                    if match:
+                        exit_code = int(match.group(1))
+                        del head[match.start():]
+                    if len(head) > self.max_output:
+                        # Keep an overlapping window so a sentinel straddling
+                        # the limit is still found
+                        tail = head[-self.TAIL_KEEP:]
+                        del head[self.max_output:]
+                        truncated = True
+                else:
+                    tail += chunk
+                    del tail[:-self.TAIL_KEEP]
+
+                if truncated and exit_code is None:
+                    match = self._sentinel.search(tail)
+                    if match:
+                        exit_code = int(match.group(1))
+                        # The limit may have cut the sentinel in half
+                        partial = b"\r\n" + self.marker.encode()
+                        for size in range(len(partial), 0, -1):
+                            if head.endswith(partial[:size]):
+                                del head[-size:]
+                                break
+
+                if exit_code is not None:
+                    self.last_used = time.monotonic()
+                    if interrupted:
+                        return self._result(-1, head, truncated, f"Command timed out after {timeout} seconds")
+                    return self._result(exit_code, head, truncated)
+
+    def close(self) -> None:
+        """Terminate the shell process and release the PTY."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self.process.wait()
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+
+    def _read(self, timeout: float) -> Optional[bytes]:
+        """
+        Read available output from the PTY.
+
+        Returns:
+            The bytes read, b"" if nothing arrived in time, or None on EOF
+        """
+        ready, _, _ = select.select([self.master_fd], [], [], min(timeout, 0.5))
+        if not ready:
+            return None if not self.is_alive() else b""
+        try:
+            data = os.read(self.master_fd, 65536)
+        except OSError:
+            return None
+        return data or None
+
+    def _drain(self) -> None:
+        """Discard output left over from previous commands (e.g. background jobs)."""
+        while True:
+            ready, _, _ = select.select([self.master_fd], [], [], 0)
+            if not ready:
+                return
+            try:
+                if not os.read(self.master_fd, 65536):
+                    return
+            except OSError:
+                return
+
+    def _result(self, exit_code: int, output: bytearray, truncated: bool, error: str = "") -> Dict[str, Any]:
+        """Build the tool result dictionary for a command."""
+        text = output.decode("utf-8", errors="replace").replace("\r\n", "\n")
+        if truncated:
+            text += f"\n... [output truncated at {self.max_output} bytes]"
+        return {
+            "exit_code": exit_code,
+            "stdout": text,
+            "stderr": error,
+            "truncated": truncated
+        }
+
+
+class ShellSessionManager:
+    """
+    Keeps one persistent shell per conversation and reclaims idle ones.
+    """
+
+    def __init__(self):
+        """Initialize the shell session manager."""
+        # {conversation_id: ShellSession}
+        self.sessions: Dict[str, ShellSession] = {}
+        self.lock = threading.Lock()
+
+    def get_session(self, conversation_id: str, workspace_path: Path) -> ShellSession:
+        """
+        Get the shell session for a conversation, starting one if needed.
+
+        Args:
+            conversation_id: The ID of the conversation
+            workspace_path: The conversation workspace the shell starts in
+
+        Returns:
+            The live shell session
+        """
+        self.reap_idle()
+        with self.lock:
+            session = self.sessions.get(conversation_id)
+            if session is None or not session.is_alive():
+                if session is not None:
+                    session.close()
+                session = ShellSession(workspace_path, settings.SHELL_SESSION_MAX_OUTPUT)
+                self.sessions[conversation_id] = session
+            return session
+
+    def close_session(self, conversation_id: str) -> None:
+        """
+        Close the shell session for a conversation, if any.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+        with self.lock:
+            session = self.sessions.pop(conversation_id, None)
+        if session is not None:
+            session.close()
+
+    def reap_idle(self) -> None:
+        """Close sessions that have been idle longer than the configured timeout."""
+        now = time.monotonic()
+        with self.lock:
+            idle = [
+                conversation_id for conversation_id, session in self.sessions.items()
+                if not session.lock.locked() and now - session.last_used > settings.SHELL_SESSION_IDLE_TIMEOUT
+            ]
+            expired = [self.sessions.pop(conversation_id) for conversation_id in idle]
+        for session in expired:
+            logger.info("Closing idle shell session (pid %d)", session.process.pid)
+            session.close()
+
+    def close_all(self) -> None:
+        """Close every shell session."""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+# Create a singleton instance
+shell_session_manager = ShellSessionManager()
+SHELL_SESSIONS.set_function(lambda: len(shell_session_manager.sessions))
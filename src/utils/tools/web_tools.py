@@ -7,13 +7,41 @@ from pathlib import Path
 from .base import BaseTool
 from ...models.chat import ToolParameter
 from ...core.conversation_manager import conversation_manager
+from ...config import settings
+from ..search import search_service
+from ..telemetry import SUBPROCESS_SPAWNS
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _communicate(process: subprocess.Popen, timeout: float):
+    """Wait for a subprocess's output, killing it if it runs past the timeout."""
+    try:
+        return process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise TimeoutError(f"Subprocess timed out after {timeout} seconds")
 
 
 class WebSearchTool(BaseTool):
-    """Tool for searching the web using DuckDuckGo."""
+    """Tool for searching the web with one or several queries."""
     
     name = "web_search"
-    description = "Search the web for information using DuckDuckGo."
+    description = (
+        "Search the web for information. To look at a topic from several angles, pass the queries "
+        "together in 'queries': they are searched at once and their results merged into one ranked list."
+    )
+    
+    # Provider calls run in worker threads, driven from the event loop
+    executor = "loop"
+    max_concurrency = 8
+    timeout = 60
+    # Repeated searches within a few minutes return the same results
+    cacheable = True
+    cache_ttl = 300
+    max_result_chars = 8000
     
     def _get_parameters(self) -> List[ToolParameter]:
         """Define the parameters for this tool."""
@@ -21,9 +49,15 @@ class WebSearchTool(BaseTool):
             ToolParameter(
                 name="query",
                 description="The search query to look up on the web",
-                required=True,
+                required=False,
                 type="string"
             ),
+            ToolParameter(
+                name="queries",
+                description=f"Several search queries (strings) run together, at most {settings.SEARCH_MAX_QUERIES}",
+                required=False,
+                type="array"
+            ),
             ToolParameter(
                 name="max_results",
                 description="Maximum number of results to return (default: 10)",
@@ -34,79 +68,58 @@ class WebSearchTool(BaseTool):
     
     async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
         """
-        Search the web using DuckDuckGo.
+        Search the web with every configured provider.
         
         Args:
             conversation_id: The ID of the conversation
-            input_data: Input parameters containing the search query
+            input_data: Input parameters containing the query or queries
             
         Returns:
             Search results as a formatted string
             
         Raises:
-            ValueError: If the query is invalid
-            Exception: If the search fails
+            ValueError: If no valid query is given
+            Exception: If every provider failed
         """
-        # Validate the input
-        validation_error = self.validate_input(input_data)
-        if validation_error:
-            raise ValueError(validation_error)
+        queries = input_data.get("queries") or []
+        if isinstance(queries, str):
+            queries = [queries]
+        if input_data.get("query"):
+            queries = [input_data["query"]] + list(queries)
+        queries = list(dict.fromkeys(q.strip() for q in queries if isinstance(q, str) and q.strip()))
+        if not queries:
+            raise ValueError("Missing required parameter: query or queries")
+        if len(queries) > settings.SEARCH_MAX_QUERIES:
+            raise ValueError(f"At most {settings.SEARCH_MAX_QUERIES} queries can be searched at once")
         
-        # Get the search query
-        query = input_data["query"]
         max_results = input_data.get("max_results", 10)
-        
-        # Validate max_results
         if not isinstance(max_results, int) or max_results <= 0:
             max_results = 10
         
-        try:
-            # Get the path to the search_engine.py script
-            script_path = Path(os.path.abspath(__file__)).parent.parent.parent.parent / "tools" / "search_engine.py"
-            
-            if not script_path.exists():
-                raise FileNotFoundError(f"Search engine script not found: {script_path}")
-            
-            # Prepare the command
-            cmd = [
-                sys.executable, 
-                str(script_path), 
-                query,
-                "--max-results", str(max_results)
-            ]
-            
-            # Execute the search script
-            print(f"Executing search command: {' '.join(cmd)}", file=sys.stderr)
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Get output and error
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                print(f"Search command failed with error: {stderr}", file=sys.stderr)
-                raise Exception(f"Search failed: {stderr}")
-            
-            # Parse the results
-            results = stdout.strip()
-            
-            # Save the search results to a file in the conversation workspace
-            workspace_path = conversation_manager.get_workspace_path(conversation_id)
-            results_path = workspace_path / f"search_results_{query[:30].replace(' ', '_')}.txt"
-            
-            with open(results_path, "w", encoding="utf-8") as f:
-                f.write(f"Search Query: {query}\n\n")
-                f.write(results)
-            
-            return results
-            
-        except Exception as e:
-            print(f"Error executing web search: {str(e)}", file=sys.stderr)
-            raise
+        outcome = await search_service.search(queries, max_results)
+        errors = [f'{error["provider"]} failed for "{error["query"]}": {error["error"]}' for error in outcome["errors"]]
+        if not outcome["results"] and errors:
+            logger.error("Search failed: %s", "; ".join(errors))
+            raise Exception(f"Search failed: {'; '.join(errors)}")
+        
+        blocks = []
+        for index, result in enumerate(outcome["results"], 1):
+            block = f"=== Result {index} ===\nURL: {result['href']}\nTitle: {result['title']}\nSnippet: {result['body']}\n"
+            if len(queries) > 1:
+                block += f"Queries: {'; '.join(result['queries'])}\n"
+            blocks.append(block)
+        if errors:
+            blocks.append("Some searches returned nothing:\n" + "\n".join(errors))
+        results = "\n".join(blocks) if blocks else "No results found"
+        
+        # Save the search results to a file in the conversation workspace
+        workspace_path = conversation_manager.get_workspace_path(conversation_id)
+        results_path = workspace_path / f"search_results_{queries[0][:30].replace(' ', '_')}.txt"
+        with open(results_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"Search Query: {query}\n" for query in queries) + "\n")
+            f.write(results)
+        
+        return results
 
 
 class ExtractContentTool(BaseTool):
@@ -115,6 +128,14 @@ class ExtractContentTool(BaseTool):
     name = "extract_content"
     description = "Extract and parse content from a website URL."
     
+    # Each call starts a browser and parses the page in a subprocess
+    executor = "thread"
+    max_concurrency = 4
+    timeout = 120
+    cacheable = True
+    cache_ttl = 300
+    max_result_chars = 12000
+    
     def _get_parameters(self) -> List[ToolParameter]:
         """Define the parameters for this tool."""
         return [
@@ -126,7 +147,7 @@ class ExtractContentTool(BaseTool):
             )
         ]
     
-    async def execute(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
+    def run(self, conversation_id: str, input_data: Dict[str, Any]) -> Any:
         """
         Extract content from a web page.
         
@@ -164,7 +185,8 @@ class ExtractContentTool(BaseTool):
             ]
             
             # Execute the scraper script
-            print(f"Executing scraper command: {' '.join(cmd)}", file=sys.stderr)
+            logger.debug("Executing scraper command: %s", " ".join(cmd))
+            SUBPROCESS_SPAWNS.inc(source="extract_content")
             process = subprocess.Popen(
                 cmd, 
                 stdout=subprocess.PIPE, 
@@ -173,10 +195,10 @@ class ExtractContentTool(BaseTool):
             )
             
             # Get output and error
-            stdout, stderr = process.communicate()
+            stdout, stderr = _communicate(process, self.timeout)
             
             if process.returncode != 0:
-                print(f"Scraper command failed with error: {stderr}", file=sys.stderr)
+                logger.error("Scraper command failed with error: %s", stderr)
                 raise Exception(f"Content extraction failed: {stderr}")
             
             # Get the extracted content
@@ -199,5 +221,5 @@ class ExtractContentTool(BaseTool):
             return content
             
         except Exception as e:
-            print(f"Error extracting content: {str(e)}", file=sys.stderr)
+            logger.error("Error extracting content: %s", e)
             raise 
\ No newline at end of file
@@ -1,16 +1,18 @@
 #!/usr/bin/env /workspace/tmp_windsurf/venv/bin/python3
 
-import google.generativeai as genai
-from openai import OpenAI, AzureOpenAI
-from anthropic import Anthropic
 import argparse
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 import sys
 import base64
-from typing import Optional, Union, List
+import hashlib
+import json
+import time
+import threading
+from typing import Dict, Optional, Union, List, Tuple
 import mimetypes
+from functools import lru_cache
 
 def load_environment():
     """Load environment variables from .env files in order of precedence"""
@@ -46,27 +48,235 @@ def load_environment():
 # Load environment variables at module import
 load_environment()
 
-def encode_image_file(image_path: str) -> tuple[str, str]:
+# Default model for each provider
+DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "azure": None,  # Resolved from AZURE_OPENAI_MODEL_DEPLOYMENT at call time
+    "deepseek": "deepseek-chat",
+    "siliconflow": "deepseek-ai/DeepSeek-R1",
+    "anthropic": "claude-3-7-sonnet-20250219",
+    "gemini": "gemini-2.0-flash-exp",
+    "local": "Qwen/Qwen2.5-32B-Instruct-AWQ",
+}
+
+def get_default_model(provider: str) -> Optional[str]:
+    """Return the default model name for a provider."""
+    if provider == "azure":
+        return os.getenv('AZURE_OPENAI_MODEL_DEPLOYMENT', 'gpt-4o-ms')  # Get from env with fallback
+    return DEFAULT_MODELS.get(provider)
+
+# Largest image each provider works with, as (longest side, shortest side,
+# pixels); 0 is no limit. Larger images are scaled down by the provider
+# anyway, so sending them at this size only saves upload time and tokens.
+IMAGE_LIMITS = {
+    "anthropic": (1568, 0, 1_150_000),
+    "openai": (2048, 768, 0),
+    "azure": (2048, 768, 0),
+    "gemini": (3072, 0, 0),
+}
+DEFAULT_IMAGE_LIMITS = (2048, 768, 0)
+
+# Prepared images and Gemini upload handles are kept here between runs
+CACHE_DIR = Path(os.getenv('LLM_API_CACHE_DIR', str(Path.home() / '.cache' / 'llm_api')))
+
+# Files uploaded to Gemini are deleted after 48 hours; reuse them for a bit less
+GEMINI_UPLOAD_TTL = 46 * 3600
+
+# Read size when hashing and encoding; a multiple of 3, so base64 chunks join without padding
+CHUNK_SIZE = 3 * 256 * 1024
+
+# Encoded images kept in memory; the oldest is dropped first
+MAX_ENCODED_IMAGES = 32
+
+# {(path, mtime_ns, size): sha256 of the contents}
+_digests: Dict[Tuple[str, int, int], str] = {}
+# {(sha256, provider limits): (base64 data, mime type)}
+_encoded_images: Dict[Tuple[str, Tuple[int, int, int]], Tuple[str, str]] = {}
+# {sha256 of the uploaded image: (Gemini file, time to stop reusing it)}
+_gemini_files: Dict[str, Tuple[object, float]] = {}
+# Serializes updates of the Gemini upload index
+_uploads_lock = threading.Lock()
+
+def file_digest(image_path: str) -> str:
     """
-    Encode an image file to base64 and determine its MIME type.
+    Hash a file's contents, reading it in chunks.
+    
+    The digest is remembered by path, modification time and size, so
+    asking again for an unchanged file does not read it.
+    
+    Args:
+        image_path (str): Path to the file
+        
+    Returns:
+        str: Hex SHA-256 of the contents
+    """
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(image_path, "rb") as image_file:
+            for chunk in iter(lambda: image_file.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = _digests[key] = sha.hexdigest()
+    return digest
+
+def prepare_image(image_path: str, provider: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Scale an image down to the size a provider works with.
+    
+    Images within the provider's limits are used as they are. Larger ones
+    are resized and saved under CACHE_DIR by content hash, so the same
+    image is resized only once. Without Pillow, images are used as they are.
     
     Args:
         image_path (str): Path to the image file
+        provider (str, optional): The API provider the image is sent to
         
     Returns:
-        tuple: (base64_encoded_string, mime_type)
+        tuple: (path of the image to send, mime_type)
     """
     mime_type, _ = mimetypes.guess_type(image_path)
     if not mime_type:
         mime_type = 'image/png'  # Default to PNG if type cannot be determined
+    if provider is None:
+        return image_path, mime_type
+    
+    max_edge, max_short_edge, max_pixels = IMAGE_LIMITS.get(provider, DEFAULT_IMAGE_LIMITS)
+    digest = file_digest(image_path)
+    limits = f"{max_edge}x{max_short_edge}x{max_pixels}"
+    for suffix, prepared_type in (('.png', 'image/png'), ('.jpg', 'image/jpeg')):
+        prepared = CACHE_DIR / 'images' / f"{digest}-{limits}{suffix}"
+        if prepared.exists():
+            return str(prepared), prepared_type
+    
+    try:
+        from PIL import Image
+    except ImportError:
+        return image_path, mime_type
+    
+    with Image.open(image_path) as image:
+        width, height = image.size
+        scale = 1.0
+        if max_edge:
+            scale = min(scale, max_edge / max(width, height))
+        if max_short_edge:
+            scale = min(scale, max_short_edge / min(width, height))
+        if max_pixels:
+            scale = min(scale, (max_pixels / (width * height)) ** 0.5)
+        if scale >= 1.0:
+            return image_path, mime_type
+        
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        resized = image.resize(size, Image.LANCZOS)
+        # Keep transparency in PNG; everything else becomes JPEG
+        if resized.mode in ('RGBA', 'LA', 'P'):
+            suffix, prepared_type, options = '.png', 'image/png', {'optimize': True}
+        else:
+            suffix, prepared_type, options = '.jpg', 'image/jpeg', {'quality': 85, 'optimize': True}
+            resized = resized.convert('RGB')
+        prepared = CACHE_DIR / 'images' / f"{digest}-{limits}{suffix}"
+        prepared.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name first, so a concurrent run never reads a partial file
+        partial = prepared.with_name(f"{prepared.name}.{os.getpid()}.tmp")
+        resized.save(partial, format='PNG' if suffix == '.png' else 'JPEG', **options)
+        os.replace(partial, prepared)
+    print(f"Resized {image_path} from {width}x{height} to {size[0]}x{size[1]} for {provider}", file=sys.stderr)
+    return str(prepared), prepared_type
+
+def encode_image_file(image_path: str, provider: Optional[str] = None) -> tuple[str, str]:
+    """
+    Encode an image file to base64 and determine its MIME type.
+    
+    With a provider, the image is first scaled down to the size the
+    provider works with (see prepare_image). Encoded images are remembered
+    by content hash, so repeated prompts over the same image skip resizing
+    and encoding.
+    
+    Args:
+        image_path (str): Path to the image file
+        provider (str, optional): The API provider the image is sent to
         
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+    Returns:
+        tuple: (base64_encoded_string, mime_type)
+    """
+    limits = IMAGE_LIMITS.get(provider, DEFAULT_IMAGE_LIMITS) if provider else (0, 0, 0)
+    key = (file_digest(image_path), limits)
+    encoded = _encoded_images.get(key)
+    if encoded is not None:
+        return encoded
+    
+    prepared_path, mime_type = prepare_image(image_path, provider)
+    chunks = []
+    with open(prepared_path, "rb") as image_file:
+        for chunk in iter(lambda: image_file.read(CHUNK_SIZE), b""):
+            chunks.append(base64.b64encode(chunk).decode('ascii'))
+    encoded = ("".join(chunks), mime_type)
+    
+    while len(_encoded_images) >= MAX_ENCODED_IMAGES:
+        _encoded_images.pop(next(iter(_encoded_images)), None)
+    _encoded_images[key] = encoded
+    return encoded
+
+def upload_gemini_file(client, image_path: str):
+    """
+    Upload an image to Gemini, reusing an earlier upload of the same image.
+    
+    Upload handles are remembered by content hash in memory and in
+    CACHE_DIR/gemini_uploads.json, so separate runs reuse them too, until
+    shortly before Gemini deletes the file.
+    
+    Args:
+        client: The configured google.generativeai module
+        image_path (str): Path to the image file
         
-    return encoded_string, mime_type
+    Returns:
+        The uploaded file
+    """
+    prepared_path, mime_type = prepare_image(image_path, "gemini")
+    digest = file_digest(prepared_path)
+    cached = _gemini_files.get(digest)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+    
+    file = None
+    index_path = CACHE_DIR / 'gemini_uploads.json'
+    try:
+        uploads = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        uploads = {}
+    entry = uploads.get(digest)
+    if entry and entry["expires"] > time.time():
+        try:
+            file = client.get_file(entry["name"])
+            expires = entry["expires"]
+        except Exception as e:
+            print(f"Uploaded file {entry['name']} is gone, uploading again: {e}", file=sys.stderr)
+    
+    if file is None:
+        file = client.upload_file(prepared_path, mime_type=mime_type)
+        with _uploads_lock:
+            try:
+                uploads = json.loads(index_path.read_text())
+            except (OSError, ValueError):
+                uploads = {}
+            now = time.time()
+            expires = now + GEMINI_UPLOAD_TTL
+            uploads = {key: value for key, value in uploads.items() if value["expires"] > now}
+            uploads[digest] = {"name": file.name, "expires": expires}
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+            partial.write_text(json.dumps(uploads))
+            os.replace(partial, index_path)
+    
+    _gemini_files[digest] = (file, expires)
+    return file
 
 def create_llm_client(provider="openai"):
+    # SDKs are imported per provider: each takes hundreds of milliseconds to
+    # import and a process usually talks to only one or two providers
     if provider == "openai":
+        from openai import OpenAI
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
@@ -74,6 +284,7 @@ def create_llm_client(provider="openai"):
             api_key=api_key
         )
     elif provider == "azure":
+        from openai import AzureOpenAI
         api_key = os.getenv('AZURE_OPENAI_API_KEY')
         if not api_key:
             raise ValueError("AZURE_OPENAI_API_KEY not found in environment variables")
@@ -83,6 +294,7 @@ def create_llm_client(provider="openai"):
             azure_endpoint="https://msopenai.openai.azure.com"
         )
     elif provider == "deepseek":
+        from openai import OpenAI
         api_key = os.getenv('DEEPSEEK_API_KEY')
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
@@ -91,6 +303,7 @@ def create_llm_client(provider="openai"):
             base_url="https://api.deepseek.com/v1",
         )
     elif provider == "siliconflow":
+        from openai import OpenAI
         api_key = os.getenv('SILICONFLOW_API_KEY')
         if not api_key:
             raise ValueError("SILICONFLOW_API_KEY not found in environment variables")
@@ -99,6 +312,7 @@ def create_llm_client(provider="openai"):
             base_url="https://api.siliconflow.cn/v1"
         )
     elif provider == "anthropic":
+        from anthropic import Anthropic
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
@@ -106,19 +320,31 @@ def create_llm_client(provider="openai"):
             api_key=api_key
         )
     elif provider == "gemini":
+        import google.generativeai as genai
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         genai.configure(api_key=api_key)
         return genai
     elif provider == "local":
+        from openai import OpenAI
         return OpenAI(
-            base_url="http://192.168.180.137:8006/v1",
+            base_url=os.getenv('LOCAL_LLM_BASE_URL', "http://192.168.180.137:8006/v1"),
             api_key="not-needed"
         )
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
+@lru_cache(maxsize=None)
+def get_llm_client(provider="openai"):
+    """
+    Return a shared client for a provider, creating it on first use.
+    
+    SDK clients hold connection pools, so reusing them avoids a new TLS
+    handshake and client setup on every query.
+    """
+    return create_llm_client(provider)
+
 def query_llm(prompt: str, client=None, model=None, provider="openai", image_path: Optional[str] = None) -> Optional[str]:
     """
     Query an LLM with a prompt and optional image attachment.
@@ -134,25 +360,12 @@ def query_llm(prompt: str, client=None, model=None, provider="openai", image_pat
         Optional[str]: The LLM's response or None if there was an error
     """
     if client is None:
-        client = create_llm_client(provider)
+        client = get_llm_client(provider)
     
     try:
         # Set default model
         if model is None:
-            if provider == "openai":
-                model = "gpt-4o"
-            elif provider == "azure":
-                model = os.getenv('AZURE_OPENAI_MODEL_DEPLOYMENT', 'gpt-4o-ms')  # Get from env with fallback
-            elif provider == "deepseek":
-                model = "deepseek-chat"
-            elif provider == "siliconflow":
-                model = "deepseek-ai/DeepSeek-R1"
-            elif provider == "anthropic":
-                model = "claude-3-7-sonnet-20250219"
-            elif provider == "gemini":
-                model = "gemini-2.0-flash-exp"
-            elif provider == "local":
-                model = "Qwen/Qwen2.5-32B-Instruct-AWQ"
+            model = get_default_model(provider)
         
         if provider in ["openai", "local", "deepseek", "azure", "siliconflow"]:
             messages = [{"role": "user", "content": []}]
@@ -166,7 +379,7 @@ def query_llm(prompt: str, client=None, model=None, provider="openai", image_pat
             # Add image content if provided
             if image_path:
                 if provider == "openai":
-                    encoded_image, mime_type = encode_image_file(image_path)
+                    encoded_image, mime_type = encode_image_file(image_path, provider)
                     messages[0]["content"] = [
                         {"type": "text", "text": prompt},
                         {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_image}"}}
@@ -198,7 +411,7 @@ def query_llm(prompt: str, client=None, model=None, provider="openai", image_pat
             
             # Add image content if provided
             if image_path:
-                encoded_image, mime_type = encode_image_file(image_path)
+                encoded_image, mime_type = encode_image_file(image_path, provider)
                 messages[0]["content"].append({
                     "type": "image",
                     "source": {
@@ -218,7 +431,7 @@ def query_llm(prompt: str, client=None, model=None, provider="openai", image_pat
         elif provider == "gemini":
             model = client.GenerativeModel(model)
             if image_path:
-                file = genai.upload_file(image_path, mime_type="image/png")
+                file = upload_gemini_file(client, image_path)
                 chat_session = model.start_chat(
                     history=[{
                         "role": "user",
@@ -248,20 +461,9 @@ def main():
     args = parser.parse_args()
 
     if not args.model:
-        if args.provider == 'openai':
-            args.model = "gpt-4o" 
-        elif args.provider == "deepseek":
-            args.model = "deepseek-chat"
-        elif args.provider == "siliconflow":
-            args.model = "deepseek-ai/DeepSeek-R1"
-        elif args.provider == 'anthropic':
-            args.model = "claude-3-7-sonnet-20250219"
-        elif args.provider == 'gemini':
-            args.model = "gemini-2.0-flash-exp"
-        elif args.provider == 'azure':
-            args.model = os.getenv('AZURE_OPENAI_MODEL_DEPLOYMENT', 'gpt-4o-ms')  # Get from env with fallback
+        args.model = get_default_model(args.provider)
 
-    client = create_llm_client(args.provider)
+    client = get_llm_client(args.provider)
     response = query_llm(args.prompt, client, model=args.model, provider=args.provider, image_path=args.image)
     if response:
         print(response)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the Anthropic Messages API with fault injection.
+
+Point the backend at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8089 and any
+ANTHROPIC_API_KEY. Responses echo the last user message; faults are injected
+according to the command line options:
+
+    --error-rate 0.3 --error-status 529 --retry-after 1   overload errors
+    --latency 0.2 --slow-rate 0.05 --slow-latency 5       tail latency
+    --fail-first 2                                        fail the first N requests
+    --tool-use-rate 0.5                                   randomly request the first tool
+
+A user message containing ``[[tool:NAME {"arg": "value"}]]`` gets a tool_use
+block for that tool with that input, if the tool was offered; load tests use
+this to script agent loops. Requests with ``"stream": true`` are answered as
+server-sent events, one text delta per word (--stream-chunk-delay apart).
+
+The Message Batches endpoints (/v1/messages/batches) are also served; a batch
+ends --batch-delay seconds after it is created and --error-rate applies per
+request. Batches are kept in memory only.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FaultConfig:
+    """Fault injection settings shared by all request handlers."""
+
+    def __init__(self, args):
+        self.latency = args.latency
+        self.slow_rate = args.slow_rate
+        self.slow_latency = args.slow_latency
+        self.error_rate = args.error_rate
+        self.error_status = args.error_status
+        self.retry_after = args.retry_after
+        self.fail_first = args.fail_first
+        self.tool_use_rate = args.tool_use_rate
+        self.batch_delay = args.batch_delay
+        self.stream_chunk_delay = args.stream_chunk_delay
+        self.requests = 0
+        # {batch_id: {"created_at", "canceled_at", "results": [...]}}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def next_request(self) -> int:
+        """Count a request and return its 1-based number."""
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+
+# [[tool:NAME {json input}]] in a user message requests that tool call
+TOOL_DIRECTIVE = re.compile(r"\[\[tool:(\w+)\s*(\{.*?\})?\]\]", re.DOTALL)
+
+
+def last_user_text(messages) -> str:
+    """Return the text of the last user message."""
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        for block in content or []:
+            if block.get("type") == "text":
+                return block.get("text", "")
+            if block.get("type") == "tool_result":
+                return "tool result received"
+    return ""
+
+
+def requested_tool(body, use_tool: bool):
+    """
+    Pick the tool call to answer with, if any.
+
+    A directive in the last user message wins; otherwise the first offered
+    tool is used when use_tool is set.
+
+    Returns:
+        Tuple of (tool name, tool input), or None
+    """
+    tools = {tool["name"]: tool for tool in body.get("tools") or []}
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {}
+    # Only follow a directive on the turn it was sent, not after its tool result
+    if last.get("role") == "user" and isinstance(last.get("content"), str):
+        for name, arguments in TOOL_DIRECTIVE.findall(last["content"]):
+            if name in tools:
+                return name, json.loads(arguments) if arguments else {}
+    if use_tool and tools:
+        tool = next(iter(tools.values()))
+        return tool["name"], {name: "mock" for name in tool.get("input_schema", {}).get("required", [])}
+    return None
+
+
+def build_message(body, use_tool: bool):
+    """Build an Anthropic Messages API response for a request body."""
+    text = f"Mock reply to: {TOOL_DIRECTIVE.sub('', last_user_text(body.get('messages', []))).strip()}"
+    content = [{"type": "text", "text": text}]
+    stop_reason = "end_turn"
+
+    tool_call = requested_tool(body, use_tool)
+    if tool_call:
+        content.append({
+            "type": "tool_use",
+            "id": f"toolu_{uuid.uuid4().hex[:24]}",
+            "name": tool_call[0],
+            "input": tool_call[1]
+        })
+        stop_reason = "tool_use"
+
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(text) // 4}
+    }
+
+
+def stream_events(message):
+    """
+    Split a message into Messages API streaming events.
+
+    Yields:
+        Tuples of (event name, event data)
+    """
+    start = dict(message, content=[], stop_reason=None)
+    start["usage"] = dict(message["usage"], output_tokens=1)
+    yield "message_start", {"type": "message_start", "message": start}
+    for index, block in enumerate(message["content"]):
+        if block["type"] == "text":
+            yield "content_block_start", {"type": "content_block_start", "index": index,
+                                          "content_block": {"type": "text", "text": ""}}
+            for word in re.findall(r"\S+\s*", block["text"]):
+                yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                              "delta": {"type": "text_delta", "text": word}}
+        else:
+            yield "content_block_start", {"type": "content_block_start", "index": index,
+                                          "content_block": dict(block, input={})}
+            yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                          "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": index}
+    yield "message_delta", {"type": "message_delta",
+                            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                            "usage": {"output_tokens": message["usage"]["output_tokens"]}}
+    yield "message_stop", {"type": "message_stop"}
+
+
+def format_time(timestamp) -> str:
+    """Format a UNIX timestamp as RFC 3339, as the API does."""
+    if timestamp is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def build_batch(batch_id: str, batch, base_url: str):
+    """Build a Message Batches API batch object from its stored state."""
+    now = time.time()
+    ended = batch["canceled_at"] is not None or now - batch["created_at"] >= batch["delay"]
+    counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+    for result in batch["results"]:
+        if not ended:
+            counts["processing"] += 1
+        elif batch["canceled_at"] is not None:
+            counts["canceled"] += 1
+        else:
+            counts[result["result"]["type"]] += 1
+
+    return {
+        "id": batch_id,
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": counts,
+        "created_at": format_time(batch["created_at"]),
+        "expires_at": format_time(batch["created_at"] + 86400),
+        "ended_at": format_time(now) if ended else None,
+        "cancel_initiated_at": format_time(batch["canceled_at"]),
+        "archived_at": None,
+        "results_url": f"{base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Request handler for the stand-in server."""
+
+    config: FaultConfig = None
+
+    def log_message(self, format, *args):
+        print(f"DEBUG: {self.address_string()} {format % args}", file=sys.stderr)
+
+    def _send_json(self, status: int, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, message):
+        """Send a message as server-sent events, one event per write."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event, data in stream_events(message):
+            if event == "content_block_delta" and self.config.stream_chunk_delay:
+                time.sleep(self.config.stream_chunk_delay)
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    def _not_found(self):
+        self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('Host', '%s:%s' % self.server.server_address[:2])}"
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5):
+            self._not_found()
+            return
+
+        batch = self.config.batches.get(parts[3])
+        if batch is None:
+            self._not_found()
+            return
+
+        if len(parts) == 4:
+            self._send_json(200, build_batch(parts[3], batch, self._base_url()))
+            return
+
+        if parts[4] != "results" or build_batch(parts[3], batch, "")["processing_status"] != "ended":
+            self._not_found()
+            return
+        lines = []
+        for result in batch["results"]:
+            if batch["canceled_at"] is not None:
+                result = {"custom_id": result["custom_id"], "result": {"type": "canceled"}}
+            lines.append(json.dumps(result))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle_batches(self, parts, body):
+        """Create or cancel a message batch."""
+        config = self.config
+        if len(parts) == 3:
+            results = []
+            for request in body.get("requests", []):
+                if random.random() < config.error_rate:
+                    result = {"type": "errored", "error": {"type": "error", "error": {
+                        "type": "overloaded_error", "message": "Injected fault"}}}
+                else:
+                    result = {"type": "succeeded", "message": build_message(request["params"], False)}
+                results.append({"custom_id": request["custom_id"], "result": result})
+            batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+            with config.lock:
+                config.batches[batch_id] = {
+                    "created_at": time.time(), "delay": config.batch_delay, "canceled_at": None, "results": results
+                }
+            self._send_json(200, build_batch(batch_id, config.batches[batch_id], self._base_url()))
+            return
+
+        batch = config.batches.get(parts[3])
+        if batch is None or len(parts) != 5 or parts[4] != "cancel":
+            self._not_found()
+            return
+        if build_batch(parts[3], batch, "")["processing_status"] != "ended":
+            batch["canceled_at"] = time.time()
+        self._send_json(200, build_batch(parts[3], batch, self._base_url()))
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        parts = path.strip("/").split("/")
+        length = int(self.headers.get("Content-Length", "0"))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if parts[:3] == ["v1", "messages", "batches"]:
+            self._handle_batches(parts, body)
+            return
+        if path != "/v1/messages":
+            self._not_found()
+            return
+
+        config = self.config
+        number = config.next_request()
+
+        delay = config.latency
+        if random.random() < config.slow_rate:
+            delay = config.slow_latency
+        if delay:
+            time.sleep(delay)
+
+        if number <= config.fail_first or random.random() < config.error_rate:
+            headers = {}
+            if config.retry_after is not None:
+                headers["retry-after"] = str(config.retry_after)
+            error_type = "overloaded_error" if config.error_status == 529 else "api_error"
+            if config.error_status == 429:
+                error_type = "rate_limit_error"
+            self._send_json(
+                config.error_status,
+                {"type": "error", "error": {"type": error_type, "message": f"Injected fault on request {number}"}},
+                headers
+            )
+            return
+
+        message = build_message(body, random.random() < config.tool_use_rate)
+        if body.get("stream"):
+            self._send_stream(message)
+        else:
+            self._send_json(200, message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injecting stand-in for the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8089, help="Port to bind (default: 8089)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Base response latency in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="Latency of slow requests in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=529, help="HTTP status of injected errors (default: 529)")
+    parser.add_argument("--retry-after", type=float, default=None, help="retry-after header sent with errors")
+    parser.add_argument("--fail-first", type=int, default=0, help="Fail the first N requests")
+    parser.add_argument("--tool-use-rate", type=float, default=0.0, help="Fraction of responses that request a tool")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.0,
+                        help="Seconds between text deltas of streamed responses")
+    parser.add_argument("--batch-delay", type=float, default=5.0, help="Seconds until a message batch ends (default: 5)")
+    args = parser.parse_args()
+
+    MockHandler.config = FaultConfig(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"Mock Anthropic server listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
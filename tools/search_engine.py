@@ -1,9 +1,25 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
+import os
 import sys
 import time
-from duckduckgo_search import DDGS
+import urllib.parse
+import urllib.request
+
+def search_api(api_url, query, max_results=10):
+    """
+    Search using a JSON search endpoint instead of DuckDuckGo.
+    
+    Used with SEARCH_API_URL to point the search tool at a local stand-in
+    (see benchmarks/stand_ins.py). The endpoint is called as
+    ``GET <api_url>?q=<query>&max_results=<n>`` and returns a JSON list of
+    results with href, title and body.
+    """
+    params = urllib.parse.urlencode({"q": query, "max_results": max_results})
+    with urllib.request.urlopen(f"{api_url}?{params}", timeout=30) as response:
+        return json.loads(response.read().decode("utf-8"))
 
 def search_with_retry(query, max_results=10, max_retries=3):
     """
@@ -19,8 +35,13 @@ def search_with_retry(query, max_results=10, max_retries=3):
             print(f"DEBUG: Searching for query: {query} (attempt {attempt + 1}/{max_retries})", 
                   file=sys.stderr)
             
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
+            api_url = os.getenv("SEARCH_API_URL")
+            if api_url:
+                results = search_api(api_url, query, max_results)
+            else:
+                from duckduckgo_search import DDGS
+                with DDGS() as ddgs:
+                    results = list(ddgs.text(query, max_results=max_results))
                 
             if not results:
                 print("DEBUG: No results found", file=sys.stderr)